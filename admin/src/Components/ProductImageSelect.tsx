@@ -37,7 +37,11 @@ const ProductImageSelect: React.FC<ProductImageSelectProps> = (props) => {
         if (props.nullOption) {
             newOptions = [props.nullOption];
         }
-        get({ url: "/webshop/product_image", params: { page_size: 0 } }).then(
+        // Image data is left out of lists unless asked for, the options show it as thumbnails.
+        get({
+            url: "/webshop/product_image",
+            params: { page_size: 0, fields: "id,name,type,data" },
+        }).then(
             (data) => setOptions([UPLOAD_OPTION, ...newOptions, ...data.data]),
             () => null,
         );
@@ -7,6 +7,7 @@ import { get, post } from "../gateway";
 // pageSize: size of pages when pagination is enabled (0 = infinite = pagination turned off).
 // url: override url, useful for collection of grops on member for example
 // expand: expand to include related model in request
+// fields: comma separated list of attributes to fetch, needed to get columns the server leaves out of lists by default
 // idListName: used for add and remove if collection supports it by pushing id list to to <url>/remove or <url>/add,
 //             this could be simpler if server handled removes in a better way
 export default class Collection<T extends { saved: { [key: string]: any } }> {
@@ -20,6 +21,7 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
     sort: { key?: string; order?: string };
     search: string | null;
     expand: string | null;
+    fields: string | null;
 
     subscribers: {
         [key: number]: (data: {
@@ -38,6 +40,7 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
         type,
         pageSize = 25,
         expand = null,
+        fields = null,
         sort = {},
         url = null,
         idListName = null,
@@ -50,6 +53,7 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
         type: { new (data?: T | null): T; model: { root?: string } };
         pageSize?: number;
         expand?: string | null;
+        fields?: string | null;
         sort?: { key?: string; order?: string };
         url?: string | null;
         idListName?: string | null;
@@ -74,6 +78,7 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
         this.sort = sort;
         this.search = search;
         this.expand = expand;
+        this.fields = fields;
 
         this.subscribers = {};
         this.subscriberId = 0;
@@ -171,6 +176,7 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
             sort_by?: string;
             sort_order?: string;
             expand?: string;
+            fields?: string;
             search?: string;
         } = {};
 
@@ -191,6 +197,10 @@ export default class Collection<T extends { saved: { [key: string]: any } }> {
             params.expand = this.expand;
         }
 
+        if (this.fields) {
+            params.fields = this.fields;
+        }
+
         if (this.search) {
             params.search = this.search.trim();
         }
@@ -12,7 +12,12 @@ class ImageList extends CollectionNavigation {
         super(props);
 
         const { page, search } = this.state;
-        this.collection = new Collection({ type: ProductImage, search, page });
+        this.collection = new Collection({
+            type: ProductImage,
+            search,
+            page,
+            fields: "id,name,type,data,created_at,updated_at,deleted_at",
+        });
     }
 
     upload(event) {
@@ -14,11 +14,19 @@ function watch_locales() {
 
 GUNICORN_FLAGS=""
 GUNICORN_WORKERS="8"
+# One request at a time per worker by default. Set GUNICORN_WORKER_CLASS=gthread and GUNICORN_THREADS=4 to run
+# threads per worker, then requests waiting on Accessy, Stripe, Slack or Trello only block their own thread.
+GUNICORN_WORKER_CLASS="${GUNICORN_WORKER_CLASS:-sync}"
+GUNICORN_THREADS="${GUNICORN_THREADS:-1}"
+# Set to true to boot the app once in the master and fork the workers from it.
+GUNICORN_PRELOAD="${GUNICORN_PRELOAD:-false}"
 
 if [ "$DEV_RUN" = "true" ]; then
     echo "running in devel mode"
     GUNICORN_FLAGS=" --reload"
     GUNICORN_WORKERS="2"
+    # Code reloading restarts the workers only, it does not work with preload.
+    GUNICORN_PRELOAD="false"
     watch_locales &
 fi
 
@@ -27,7 +35,11 @@ if [ "$TEST" = "true" ]; then
     GUNICORN_WORKERS="2"
 fi
 
+if [ "$GUNICORN_PRELOAD" = "true" ]; then
+    GUNICORN_FLAGS="${GUNICORN_FLAGS} --preload"
+fi
+
 echo "initializing and migrating db"
 python3 ./init_db.py
 
-exec gunicorn ${GUNICORN_FLAGS} --access-logfile - --log-level info --error-logfile - --worker-class sync --workers=${GUNICORN_WORKERS} -b :80 api:app
+exec gunicorn ${GUNICORN_FLAGS} --access-logfile - --log-level info --error-logfile - --worker-class ${GUNICORN_WORKER_CLASS} --threads=${GUNICORN_THREADS} --workers=${GUNICORN_WORKERS} -b :80 api:app
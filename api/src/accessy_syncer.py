@@ -3,11 +3,14 @@ import time
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from datetime import datetime
 from logging import getLogger
+from statistics.statistics_daily import update_statistics_daily
 from threading import Event
 from typing import Any
 
 import schedule
+from membership.membership_status import refresh_membership_status
 from multiaccessy.accessy import accessy_session
+from multiaccessy.physical_access_daily import update_physical_access_daily
 from multiaccessy.sync import sync
 from redis_cache import redis_connection
 from rocky.process import log_exception, stoppable
@@ -22,6 +25,8 @@ COMMAND_SCHEDULED = "sheduled"
 COMMAND_SHIP = "ship"
 COMMAND_SYNC = "sync"
 COMMAND_DELEGATE = "delegate"
+COMMAND_PHYSICAL_ACCESS_DAILY = "physical_access_daily"
+COMMAND_STATISTICS_DAILY = "statistics_daily"
 
 REDIS_COMMAND_QUEUE = "accessy_commands_zset"
 
@@ -70,9 +75,47 @@ def scheduled_sync() -> None:
     logger.info("finished syncing accessy")
 
 
+def scheduled_membership_status_refresh() -> None:
+    logger.info("refreshing membership status")
+    try:
+        refresh_membership_status(db_session.connection())
+        db_session.commit()
+    except Exception as e:
+        logger.exception(f"failed to refresh membership status: {e}")
+    finally:
+        db_session.remove()
+    logger.info("finished refreshing membership status")
+
+
+def scheduled_statistics_update() -> None:
+    logger.info("updating daily statistics")
+    try:
+        update_statistics_daily()
+        db_session.commit()
+    except Exception as e:
+        logger.exception(f"failed to update daily statistics: {e}")
+    finally:
+        db_session.remove()
+    logger.info("finished updating daily statistics")
+
+
+def scheduled_physical_access_daily_update() -> None:
+    logger.info("updating physical access daily rollup")
+    try:
+        update_physical_access_daily()
+        db_session.commit()
+    except Exception as e:
+        logger.exception(f"failed to update physical access daily rollup: {e}")
+    finally:
+        db_session.remove()
+    logger.info("finished updating physical access daily rollup")
+
+
 def daily_job() -> None:
     scheduled_ship()
     scheduled_sync()
+    scheduled_statistics_update()
+    scheduled_physical_access_daily_update()
 
 
 def hourly_job() -> None:
@@ -122,7 +165,9 @@ def main(exit: Event) -> None:
             help=f"The command to run"
             f", {COMMAND_SCHEDULED}: run forever according to schedule"
             f", {COMMAND_SHIP}: ship once (no sync after) then exit"
-            f", {COMMAND_SYNC}: sync",
+            f", {COMMAND_SYNC}: sync"
+            f", {COMMAND_PHYSICAL_ACCESS_DAILY}: rebuild the physical access daily rollup from the whole log"
+            f", {COMMAND_STATISTICS_DAILY}: rebuild the daily statistics from all spans and transactions",
         )
         args = parser.parse_args()
 
@@ -141,10 +186,27 @@ def main(exit: Event) -> None:
                 sync()
                 return
 
+            case x if x == COMMAND_PHYSICAL_ACCESS_DAILY:
+                update_physical_access_daily(rebuild_all=True)
+                db_session.commit()
+                return
+
+            case x if x == COMMAND_STATISTICS_DAILY:
+                update_statistics_daily(rebuild_all=True)
+                db_session.commit()
+                return
+
             case x if x == COMMAND_SCHEDULED:
                 schedule.every().day.at("04:00").do(daily_job)
+                # The active flags in the membership status are for a date, refresh them when the date changes.
+                schedule.every().day.at("00:00:10").do(scheduled_membership_status_refresh)
                 schedule.every().hour.do(hourly_job)
 
+                # Fill in the days missed while not running, the public statistics endpoints only read the snapshots.
+                scheduled_statistics_update()
+                # Backfills the whole log the first time.
+                scheduled_physical_access_daily_update()
+
                 # Join all public Slack channels at startup so the bot can respond to @theSpace mentions
                 try:
                     from slack.util import get_slack_client, join_all_public_channels
@@ -1,11 +1,22 @@
+from service.boot import BootTimer
+
+boot_timer = BootTimer()
+
 import flask_cors
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask.wrappers import Response as FlaskResponse
 from membership.permissions import register_permissions
 from multiaccessy.accessy import initialize_accessy
 from service.api_definition import ALL_PERMISSIONS
-from service.config import config, debug_mode, get_mysql_config
-from service.db import create_mysql_engine, populate_fields_by_index, shutdown_session
+from service.compression import compress_response
+from service.config import config, debug_mode, get_mysql_config, get_mysql_replica_config
+from service.db import (
+    create_mysql_engine,
+    create_mysql_replica_engine,
+    db_session,
+    populate_fields_by_index,
+    shutdown_session,
+)
 from service.error import (
     ApiError,
     error_handler_400,
@@ -15,12 +26,16 @@ from service.error import (
     error_handler_api,
     error_handler_db,
 )
+from service.json_provider import init_json_provider
 from service.traffic_logger import traffic_logger_commit, traffic_logger_init
 from services import services
 from shop.stripe_setup import are_stripe_keys_live, are_stripe_keys_set, setup_stripe
 from sqlalchemy.exc import OperationalError
 
+boot_timer.done("imports")
+
 app = Flask(__name__, static_folder=None)
+init_json_provider(app)
 
 
 flask_cors.CORS(
@@ -49,7 +64,7 @@ def before_request_functions():
 def after_request_functions(response: FlaskResponse):
     response.direct_passthrough = False
     traffic_logger_commit(response)
-    return response
+    return compress_response(request, response)
 
 
 app.register_error_handler(OperationalError, error_handler_db)
@@ -62,9 +77,16 @@ app.teardown_appcontext(shutdown_session)
 app.before_request(before_request_functions)
 app.after_request(after_request_functions)
 
+boot_timer.done("app")
 
 engine = create_mysql_engine(**get_mysql_config())
 
+replica_config = get_mysql_replica_config()
+if replica_config:
+    create_mysql_replica_engine(**replica_config)
+
+boot_timer.done("db connect")
+
 if are_stripe_keys_set():
     if are_stripe_keys_live() and debug_mode():
         while True:
@@ -78,9 +100,21 @@ if are_stripe_keys_set():
                 break
     setup_stripe(private=True)
 
-populate_fields_by_index(engine)
+boot_timer.done("stripe")
+
+populate_fields_by_index(engine, cache_filename=config.get("DB_INDEX_CACHE_FILE"))
+boot_timer.done("index metadata")
+
 register_permissions(ALL_PERMISSIONS)
+boot_timer.done("permissions")
+
 initialize_accessy()
+boot_timer.done("accessy")
+
+# Don't leave a connection checked out in the boot session, gunicorn workers are forked from here with --preload.
+db_session.remove()
+
+boot_timer.log()
 
 
 @app.route("/")
@@ -0,0 +1,44 @@
+"""
+Benchmark of response compression, size against cpu time for gzip levels and brotli qualities, on the json of a member
+list.
+
+Run from api/src: python -m benchmarks.compression [rows] [repeat] [mbit/s]
+"""
+
+import gzip
+import json
+import sys
+from timeit import repeat
+
+import brotli
+from membership.views import member_entity
+
+from benchmarks.entity_serialization import setup, tuple_path
+
+
+def compressors():
+    yield "identity", lambda data: data
+    for level in (1, 6, 9):
+        yield f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0)
+    for quality in (1, 4, 6, 11):
+        yield f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)
+
+
+def main(rows=5000, number=5, mbit=10):
+    setup(rows)
+    data = json.dumps({"status": "ok", "data": tuple_path(member_entity, rows)}).encode()
+
+    print(f"{len(data) / 1024:.0f} KiB of json, transfer time at {mbit} Mbit/s")
+    for name, compress in compressors():
+        size = len(compress(data))
+        cpu = min(repeat(lambda: compress(data), number=1, repeat=number))
+        transfer = size * 8 / (mbit * 1_000_000)
+        print(
+            f"{name:>9}: {size / 1024:8.0f} KiB {size / len(data):6.1%}  cpu {cpu * 1000:7.2f} ms "
+            f"({len(data) / cpu / 1_000_000:6.1f} MB/s)  transfer {transfer * 1000:7.1f} ms"
+            f"  total {(cpu + transfer) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of Entity.list serialization, orm instances with to_obj compared to row tuples with row_converter.
+
+Run from api/src: python -m benchmarks.entity_serialization [rows] [repeat]
+"""
+
+import sys
+from timeit import repeat
+
+import membership.models
+from membership.models import Member
+from membership.views import member_entity
+from service.db import db_session, db_session_factory
+from sqlalchemy import create_engine
+from test_aid.obj import ObjFactory
+from test_aid.test_base import TestBase
+
+
+def setup(rows):
+    engine = create_engine("sqlite:///:memory:")
+    membership.models.Base.metadata.create_all(engine)
+    db_session_factory.init_with_engine(engine)
+
+    TestBase.setUpClass()
+    obj = ObjFactory(TestBase)
+    db_session.add_all(Member(**obj.create_member(), member_number=10000 + i) for i in range(rows))
+    db_session.commit()
+
+
+def orm_path(entity, rows):
+    return [entity.to_obj(e) for e in db_session.query(entity.model).limit(rows)]
+
+
+def tuple_path(entity, rows):
+    keys = list(entity.cols_to_obj)
+    to_obj = entity.row_converter(keys, [entity.cols_to_obj[k] for k in keys])
+    return [to_obj(row) for row in db_session.query(*[getattr(entity.model, k) for k in keys]).limit(rows)]
+
+
+def main(rows=1000, number=20):
+    setup(rows)
+    entity = member_entity
+
+    assert orm_path(entity, rows) == tuple_path(entity, rows), "paths should give identical output"
+
+    for name, path in (("orm", orm_path), ("tuple", tuple_path)):
+
+        def run():
+            result = path(entity, rows)
+            # Expunge so the orm path hydrates instances every run, as it would in a new request.
+            db_session.expunge_all()
+            return result
+
+        best = min(repeat(run, number=1, repeat=number))
+        print(f"{name:>6}: {best * 1000:8.2f} ms for {rows} rows, {rows / best:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,145 @@
+"""
+Benchmark of membership summaries for 1, 50, 1000 and all members: the previous six aggregate queries over the spans,
+one grouped query with conditional aggregates, and reading the materialized member_membership_status.
+
+Run from api/src: python -m benchmarks.membership_summaries [members] [repeat]
+"""
+
+import sys
+from datetime import date, timedelta
+from random import choice, randint, sample, seed
+from timeit import repeat
+
+import membership.models
+from membership.membership import (
+    MAX_FILTERED_MEMBER_IDS,
+    MembershipData,
+    get_membership_summaries,
+    max_or_none,
+    membership_summaries_from_spans,
+)
+from membership.membership_status import refresh_membership_status
+from membership.models import Member, Span
+from service.db import db_session, db_session_factory
+from sqlalchemy import Index, create_engine, func
+from test_aid.obj import ObjFactory
+from test_aid.test_base import TestBase
+
+SPAN_TYPES = (Span.MEMBERSHIP, Span.LABACCESS, Span.SPECIAL_LABACESS)
+
+
+def setup(members):
+    seed(1)
+    engine = create_engine("sqlite:///:memory:")
+    membership.models.Base.metadata.create_all(engine)
+    # Like membership_spans_member_id_foreign in MySQL.
+    Index("membership_spans_member_id", Span.member_id).create(engine)
+    db_session_factory.init_with_engine(engine)
+
+    TestBase.setUpClass()
+    obj = ObjFactory(TestBase)
+    db_session.add_all(Member(**obj.create_member(), member_number=10000 + i) for i in range(members))
+    db_session.flush()
+
+    today = date.today()
+    rows = []
+    for member_id in range(1, members + 1):
+        start = today - timedelta(days=randint(0, 2000))
+        for _ in range(randint(0, 8)):
+            end = start + timedelta(days=randint(28, 365))
+            rows.append(
+                dict(
+                    member_id=member_id,
+                    type=choice(SPAN_TYPES),
+                    startdate=start,
+                    enddate=end,
+                    creation_reason=f"benchmark-{len(rows)}",
+                )
+            )
+            start = end + timedelta(days=randint(0, 200))
+    db_session.execute(Span.__table__.insert(), rows)
+    refresh_membership_status(db_session.connection())
+    db_session.commit()
+    return len(rows)
+
+
+def six_queries(member_ids, at_date):
+    """The previous implementation, an active and an end query per span type."""
+    if len(member_ids) == 1:
+        span_filter = Span.member_id == member_ids[0]
+    elif len(member_ids) <= MAX_FILTERED_MEMBER_IDS:
+        span_filter = Span.member_id.in_(member_ids)
+    else:
+        span_filter = True
+
+    result = {}
+    for span_type in SPAN_TYPES:
+        active = {
+            member_id
+            for (member_id,) in db_session.query(Span.member_id)
+            .filter(
+                span_filter,
+                Span.type == span_type,
+                Span.startdate <= at_date,
+                Span.enddate >= at_date,
+                Span.deleted_at == None,
+            )
+            .group_by(Span.member_id)
+        }
+        end = dict(
+            db_session.query(Span.member_id, func.max(Span.enddate))
+            .filter(span_filter, Span.type == span_type, Span.deleted_at == None)
+            .group_by(Span.member_id)
+        )
+        result[span_type] = active, end
+
+    (membership_active, membership_end), (labaccess_active, labaccess_end), (special_active, special_end) = (
+        result[span_type] for span_type in SPAN_TYPES
+    )
+    return [
+        MembershipData(
+            labaccess_end=labaccess_end.get(id),
+            labaccess_active=id in labaccess_active,
+            special_labaccess_end=special_end.get(id),
+            special_labaccess_active=id in special_active,
+            membership_end=membership_end.get(id),
+            membership_active=id in membership_active,
+            effective_labaccess_end=max_or_none(labaccess_end.get(id), special_end.get(id)),
+            effective_labaccess_active=(id in labaccess_active) or (id in special_active),
+        )
+        for id in member_ids
+    ]
+
+
+def grouped_query(member_ids, at_date):
+    summaries = membership_summaries_from_spans(
+        member_ids if len(member_ids) <= MAX_FILTERED_MEMBER_IDS else None, at_date
+    )
+    return [summaries.get(id) for id in member_ids]
+
+
+def materialized(member_ids, at_date):
+    return get_membership_summaries(member_ids, at_date)
+
+
+def main(members=5000, number=20):
+    spans = setup(members)
+    today = date.today()
+    all_ids = list(range(1, members + 1))
+
+    print(f"{members} members with {spans} spans")
+    for size in (1, 50, 1000, members):
+        member_ids = sample(all_ids, size)
+        timings = []
+        for name, summaries in (
+            ("six queries", six_queries),
+            ("grouped query", grouped_query),
+            ("materialized", materialized),
+        ):
+            best = min(repeat(lambda: summaries(member_ids, today), number=1, repeat=number))
+            timings.append(f"{name} {best * 1000:7.2f} ms")
+        print(f"{size:>6} members: " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
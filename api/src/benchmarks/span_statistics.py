@@ -0,0 +1,139 @@
+"""
+Benchmark of the span statistics over 10 years of synthetic spans: active members per day (the previous event sort in
+spans_by_date against SpanTimeline.active_counts) and active days per member in the last year (the previous loop in
+membership_number_months against SpanTimeline.days_covered_by_member), with and without numpy.
+
+Spans are generated in memory, the time to load them from the db is not included. The results with and without numpy
+are checked to be the same, and the active members per day against spans_by_date.
+
+Run from api/src: python -m benchmarks.span_statistics [members] [repeat]
+"""
+
+import sys
+from datetime import date, timedelta
+from random import randint, random, seed
+from timeit import repeat
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+from membership import span_timeline
+from membership.span_timeline import SpanTimeline
+
+YEARS = 10
+
+
+def generate_spans(members: int) -> List[Tuple[int, date, date]]:
+    """Members joining over the years, renewing monthly or yearly with gaps, and some overlapping purchases."""
+    seed(1)
+    first_day = date.today() - timedelta(days=365 * YEARS)
+    spans = []
+    for member_id in range(1, members + 1):
+        start = first_day + timedelta(days=randint(0, 365 * YEARS))
+        length = 30 if random() < 0.7 else 365
+        while start < date.today() and random() < 0.95:
+            end = start + timedelta(days=length - 1)
+            spans.append((member_id, start, end))
+            if random() < 0.05:
+                spans.append((member_id, start + timedelta(days=10), end + timedelta(days=30)))
+            start = end + timedelta(days=1 if random() < 0.8 else randint(2, 400))
+    return spans
+
+
+def spans_by_date(spans: List[Tuple[int, date, date]]) -> List[Tuple[date, int]]:
+    """The previous implementation of active members by date."""
+    events = []
+    for member_id, startdate, enddate in spans:
+        events.append((startdate - timedelta(days=1), 0, member_id))
+        events.append((startdate, 1, member_id))
+        events.append((enddate, 0, member_id))
+        events.append((enddate + timedelta(days=1), -1, member_id))
+    events.sort(key=lambda x: x[0])
+
+    counter = 0
+    active_members: Dict[int, int] = dict()
+    result: List[Tuple[date, int]] = []
+    current_date = events[0][0]
+    for d, delta, member_id in events:
+        if current_date < d:
+            result.append((current_date, counter))
+            current_date = d
+        new_count = active_members.get(member_id, 0) + delta
+        active_members[member_id] = new_count
+        if delta == 1 and new_count == 1:
+            counter += 1
+        elif delta == -1 and new_count == 0:
+            counter -= 1
+    result.append((current_date, counter))
+    return result
+
+
+def months_loop(spans: List[Tuple[int, date, date]], member_ids: List[int], startdate: date, enddate: date) -> Dict:
+    """The previous implementation of active time per member in membership_number_months."""
+    amount_by_member = {member_id: timedelta(days=0) for member_id in member_ids}
+    for member_id, span_startdate, span_enddate in spans:
+        if span_startdate < enddate and span_enddate > startdate:
+            amount_by_member[member_id] += min(span_enddate, enddate) - max(span_startdate, startdate)
+    return amount_by_member
+
+
+def check(spans, member_ids, first: date, last: date) -> None:
+    timeline = SpanTimeline.from_spans(spans)
+    counts = timeline.active_counts(first, last)
+    days = timeline.days_covered_by_member(member_ids, last - timedelta(days=364), last)
+    with patch.object(span_timeline, "np", None):
+        python_timeline = SpanTimeline.from_spans(spans)
+        assert python_timeline.member_ids == timeline.member_ids
+        assert python_timeline.active_counts(first, last) == counts
+        assert python_timeline.days_covered_by_member(member_ids, last - timedelta(days=364), last) == days
+
+    for day, count in spans_by_date(spans):
+        if first <= day <= last:
+            assert counts[(day - first).days] == count, (day, count)
+
+
+def main(members=20000, number=5):
+    spans = generate_spans(members)
+    member_ids = list(range(1, members + 1))
+    first = min(start for _, start, _ in spans)
+    last = date.today()
+    year_start = last - timedelta(days=364)
+    print(f"{members} members with {len(spans)} spans over {YEARS} years")
+
+    check(spans, member_ids, first, last)
+
+    def timelines():
+        timeline = SpanTimeline.from_spans(spans)
+        return [
+            ("merge", lambda: SpanTimeline.from_spans(spans)),
+            ("active per day", lambda: timeline.active_counts(first, last)),
+            ("days per member", lambda: timeline.days_covered_by_member(member_ids, year_start, last)),
+        ]
+
+    rows = {
+        "previous": [
+            ("merge", None),
+            ("active per day", lambda: spans_by_date(spans)),
+            ("days per member", lambda: months_loop(spans, member_ids, year_start, last + timedelta(days=1))),
+        ]
+    }
+    with patch.object(span_timeline, "np", None):
+        rows["python"] = timelines()
+    rows["numpy"] = timelines()
+
+    for name, cases in rows.items():
+        timings = []
+        for case, fn in cases:
+            if fn is None:
+                timings.append(f"{case} {'-':>9}")
+                continue
+            if name == "python":
+                with patch.object(span_timeline, "np", None):
+                    best = min(repeat(fn, number=1, repeat=number))
+            else:
+                best = min(repeat(fn, number=1, repeat=number))
+            timings.append(f"{case} {best * 1000:6.1f} ms")
+        print(f"{name:>8}: " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
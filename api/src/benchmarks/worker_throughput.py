@@ -0,0 +1,145 @@
+"""
+Load test of gunicorn worker modes with slow upstream calls (like Accessy or Stripe) mixed with fast db reads.
+
+For each worker mode gunicorn is started with a small app on a sqlite db, with one route that sleeps to simulate a
+slow upstream call and one that lists members from the db. Requests are sent concurrently and the throughput and
+latency of the fast requests is reported, with sync workers the fast requests queue behind the slow ones.
+
+Run from api/src: python -m benchmarks.worker_throughput [requests] [concurrency] [slow percent] [slow ms]
+"""
+
+import os
+import socket
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+from urllib.request import urlopen
+
+import membership.models
+from flask import Flask, jsonify
+from membership.models import Member
+from membership.views import member_entity
+from service.db import db_session, db_session_factory, shutdown_session
+from sqlalchemy import create_engine
+from test_aid.obj import ObjFactory
+from test_aid.test_base import TestBase
+
+WORKERS = 2
+
+MODES = (("sync", 1), ("gthread", 4), ("gthread", 8))
+
+
+def create_app() -> Flask:
+    """App run by gunicorn, configured with the environment set by main."""
+    db_session_factory.init_with_engine(create_engine(f"sqlite:///{os.environ['BENCHMARK_DB']}"))
+    slow_seconds = int(os.environ["BENCHMARK_SLOW_MS"]) / 1000
+
+    app = Flask(__name__)
+    app.teardown_appcontext(shutdown_session)
+
+    @app.route("/slow")
+    def slow():
+        sleep(slow_seconds)
+        return jsonify(status="ok")
+
+    @app.route("/fast")
+    def fast():
+        return jsonify(status="ok", data=[member_entity.to_obj(m) for m in db_session.query(Member).limit(20)])
+
+    return app
+
+
+def create_db(filename: str, rows: int = 100) -> None:
+    engine = create_engine(f"sqlite:///{filename}")
+    membership.models.Base.metadata.create_all(engine)
+    db_session_factory.init_with_engine(engine)
+
+    TestBase.setUpClass()
+    obj = ObjFactory(TestBase)
+    db_session.add_all(Member(**obj.create_member(), member_number=10000 + i) for i in range(rows))
+    db_session.commit()
+    db_session.remove()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(url: str, timeout: float = 20) -> None:
+    started = perf_counter()
+    while perf_counter() - started < timeout:
+        try:
+            urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            sleep(0.1)
+    raise Exception(f"server at {url} did not start")
+
+
+def timed_get(url: str) -> float:
+    started = perf_counter()
+    with urlopen(url, timeout=60) as response:
+        response.read()
+    return perf_counter() - started
+
+
+def run_mode(worker_class, threads, env, requests, concurrency, slow_percent):
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            f"--worker-class={worker_class}",
+            f"--threads={threads}",
+            f"--workers={WORKERS}",
+            f"--bind=127.0.0.1:{port}",
+            "--log-level=warning",
+            "benchmarks.worker_throughput:create_app()",
+        ],
+        env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for_server(base + "/fast")
+
+        # Spread the slow requests evenly among the fast ones.
+        paths = ["/slow" if (i * slow_percent) % 100 < slow_percent else "/fast" for i in range(requests)]
+
+        started = perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(lambda path: (path, timed_get(base + path)), paths))
+        elapsed = perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    fast = sorted(seconds for path, seconds in latencies if path == "/fast")
+    median = fast[len(fast) // 2]
+    p95 = fast[int(len(fast) * 0.95)]
+    print(
+        f"{worker_class:>8} x{threads}: {requests / elapsed:7.1f} req/s, fast requests median {median * 1000:7.1f} ms"
+        f" p95 {p95 * 1000:7.1f} ms, total {elapsed:5.1f} s"
+    )
+
+
+def main(requests=400, concurrency=16, slow_percent=10, slow_ms=1000):
+    with TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "benchmark.db")
+        create_db(filename)
+        env = dict(os.environ, BENCHMARK_DB=filename, BENCHMARK_SLOW_MS=str(slow_ms))
+
+        print(
+            f"{requests} requests from {concurrency} clients, {slow_percent}% waiting {slow_ms} ms on upstream,"
+            f" {WORKERS} workers"
+        )
+        for worker_class, threads in MODES:
+            run_mode(worker_class, threads, env, requests, concurrency, slow_percent)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -1,5 +1,10 @@
+from unittest.mock import patch
+
 import membership
+import membership.member_auth
 from flask import g, request
+from membership.member_auth import get_member_permissions, invalidate_member_permissions
+from service.access_token_cache import AccessTokenCache, CachedToken, access_token_cache
 from service.api_definition import ALL_PERMISSIONS, GET, PUBLIC, USER
 from service.auth import authenticate_request
 from service.db import db_session
@@ -16,6 +21,10 @@ from core.service_users import TEST_SERVICE_USER_ID
 class Test(FlaskTestBase):
     models = [core.models, membership.models]
 
+    def setUp(self) -> None:
+        db_session.query(AccessToken).delete()
+        db_session.commit()
+
     def test_user_id_and_permission_is_set_even_if_there_is_no_auth_header(self) -> None:
         with self.app.test_request_context():
             self.assertFalse(hasattr(g, "user_id"))
@@ -95,6 +104,61 @@ class Test(FlaskTestBase):
 
         self.assertCountEqual([USER, permission.permission], access_token.permissions.split(","))
 
+    def test_permission_change_takes_effect_for_existing_token_after_invalidation(self) -> None:
+        permission = self.db.create_permission()
+        member = self.db.create_member()
+        group = self.db.create_group()
+        group.members.append(member)
+
+        access_token = self.db.create_access_token(user_id=member.member_id, expires=self.datetime(days=1))
+        headers = dict(Authorization=f"Bearer {access_token.access_token}")
+        environ_base = {"REMOTE_ADDR": "127.0.0.1"}
+
+        with self.app.test_request_context(headers=headers, environ_base=environ_base):
+            authenticate_request()
+            self.assertCountEqual([USER], g.permissions)
+
+        group.permissions.append(permission)
+        invalidate_member_permissions([member.member_id])
+        db_session.commit()
+
+        with self.app.test_request_context(headers=headers, environ_base=environ_base):
+            authenticate_request()
+            self.assertCountEqual([USER, permission.permission], g.permissions)
+
+    @patch.object(access_token_cache, "ttl", 30)
+    def test_permission_change_only_invalidates_tokens_of_the_members(self) -> None:
+        changed, other = self.db.create_member(), self.db.create_member()
+        tokens = [
+            self.db.create_access_token(user_id=member.member_id, expires=self.datetime(days=1)).access_token
+            for member in (changed, other)
+        ]
+        environ_base = {"REMOTE_ADDR": "127.0.0.1"}
+        for token in tokens:
+            with self.app.test_request_context(
+                headers=dict(Authorization=f"Bearer {token}"), environ_base=environ_base
+            ):
+                authenticate_request()
+
+        invalidate_member_permissions([changed.member_id])
+        db_session.commit()
+
+        changed_token, other_token = tokens
+        with self.app.test_request_context(headers=dict(Authorization=f"Bearer {other_token}")):
+            with patch.object(db_session, "get", side_effect=AssertionError("db should not be used")):
+                authenticate_request()
+        with patch.object(membership.member_auth, "get_member_permissions", wraps=get_member_permissions) as read:
+            with self.app.test_request_context(
+                headers=dict(Authorization=f"Bearer {changed_token}"), environ_base=environ_base
+            ):
+                authenticate_request()
+                self.assertEqual(changed.member_id, g.user_id)
+            read.assert_called_once_with(changed.member_id)
+
+            # The permission index entry of the other member is kept.
+            membership.member_auth.get_member_permission_names(other.member_id)
+            read.assert_called_once_with(changed.member_id)
+
     def test_valid_service_auth_updates_access_token_and_sets_user_id_and_permission(self) -> None:
         access_token = self.db.create_access_token(user_id=TEST_SERVICE_USER_ID, expires=self.datetime(days=1))
 
@@ -110,6 +174,112 @@ class Test(FlaskTestBase):
 
         self.assertCountEqual(ALL_PERMISSIONS, access_token.permissions.split(","))
 
+    @patch.object(access_token_cache, "ttl", 30)
+    def test_cached_token_is_validated_without_db_and_last_seen_is_written_in_batch(self) -> None:
+        access_token = self.db.create_access_token(user_id=TEST_SERVICE_USER_ID, expires=self.datetime(days=1))
+        token = access_token.access_token
+        headers = dict(Authorization=f"Bearer {token}")
+
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.1"}):
+            authenticate_request()
+
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.2"}):
+            with patch.object(db_session, "get", side_effect=AssertionError("db should not be used")):
+                authenticate_request()
+
+            self.assertEqual(TEST_SERVICE_USER_ID, g.user_id)
+            self.assertCountEqual(ALL_PERMISSIONS, g.permissions)
+
+        db_session.refresh(access_token)
+        self.assertEqual("127.0.0.1", access_token.ip)
+
+        access_token_cache.flush()
+
+        db_session.refresh(access_token)
+        self.assertEqual("127.0.0.2", access_token.ip)
+
+        db_session.delete(access_token)
+        db_session.commit()
+
+    @patch.object(access_token_cache, "ttl", 30)
+    def test_revoked_token_is_not_accepted_from_cache(self) -> None:
+        access_token = self.db.create_access_token(user_id=TEST_SERVICE_USER_ID, expires=self.datetime(days=1))
+        token = access_token.access_token
+        headers = dict(Authorization=f"Bearer {token}")
+
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.1"}):
+            authenticate_request()
+
+        db_session.delete(access_token)
+        db_session.commit()
+
+        with self.app.test_request_context(headers=headers):
+            with self.assertRaises(Unauthorized):
+                authenticate_request()
+
+    @patch.object(access_token_cache, "ttl", 30)
+    def test_token_changed_through_the_session_is_not_accepted_from_cache(self) -> None:
+        access_token = self.db.create_access_token(user_id=TEST_SERVICE_USER_ID, expires=self.datetime(days=1))
+        headers = dict(Authorization=f"Bearer {access_token.access_token}")
+
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.1"}):
+            authenticate_request()
+            self.assertCountEqual(ALL_PERMISSIONS, g.permissions)
+
+        access_token.permissions = USER
+        db_session.commit()
+
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.1"}):
+            authenticate_request()
+            self.assertEqual([USER], g.permissions)
+
+        # Last seen data does not make the cached token stale.
+        access_token.ip = "127.0.0.3"
+        db_session.commit()
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "127.0.0.1"}):
+            with patch.object(db_session, "get", side_effect=AssertionError("db should not be used")):
+                authenticate_request()
+
+        db_session.query(AccessToken).filter(AccessToken.access_token == access_token.access_token).update(
+            {AccessToken.expires: self.datetime(days=-1)}
+        )
+        db_session.commit()
+
+        with self.app.test_request_context(headers=headers):
+            with self.assertRaises(Unauthorized):
+                authenticate_request()
+
+    @patch.object(access_token_cache, "ttl", 30)
+    def test_bulk_delete_of_tokens_only_makes_the_deleted_tokens_stale(self) -> None:
+        tokens = [self.db.create_access_token(user_id=TEST_SERVICE_USER_ID) for _ in range(2)]
+        deleted, kept = [t.access_token for t in tokens]
+        for token in (deleted, kept):
+            with self.app.test_request_context(
+                headers=dict(Authorization=f"Bearer {token}"), environ_base={"REMOTE_ADDR": "127.0.0.1"}
+            ):
+                authenticate_request()
+
+        db_session.query(AccessToken).filter(AccessToken.access_token == deleted).delete()
+        db_session.commit()
+
+        with self.app.test_request_context(headers=dict(Authorization=f"Bearer {deleted}")):
+            with self.assertRaises(Unauthorized):
+                authenticate_request()
+        with self.app.test_request_context(headers=dict(Authorization=f"Bearer {kept}")):
+            with patch.object(db_session, "get", side_effect=AssertionError("db should not be used")):
+                authenticate_request()
+
+    def test_revoking_a_token_in_one_worker_only_makes_that_token_stale_in_others(self) -> None:
+        worker, other_worker = AccessTokenCache(ttl=30), AccessTokenCache(ttl=30)
+        cached = CachedToken(user_id=1, permissions=(USER,), expires=self.datetime(days=1), lifetime=3600)
+        for token in ("revoked", "kept"):
+            worker.put(token, worker.generation(token), cached)
+
+        other_worker.invalidate("revoked")
+
+        self.assertIsNone(worker.get("revoked"))
+        self.assertEqual(cached, worker.get("kept"))
+
     def test_permission_is_required_for_view(self) -> None:
         with self.assertRaises(AssertionError):
 
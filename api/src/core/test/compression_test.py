@@ -0,0 +1,69 @@
+import gzip
+import json
+from unittest import TestCase
+
+import brotli
+from flask import Flask, Response, jsonify, request
+from service.compression import compress_response
+
+LARGE = [{"member_id": i, "firstname": "Firstname", "lastname": "Lastname"} for i in range(200)]
+
+
+class Test(TestCase):
+    def setUp(self) -> None:
+        app = Flask(__name__)
+
+        @app.route("/large")
+        def large():
+            response = jsonify(LARGE)
+            response.add_etag()
+            return response
+
+        @app.route("/small")
+        def small():
+            return jsonify({"status": "ok"})
+
+        @app.route("/stream")
+        def stream():
+            return Response((json.dumps(row) + "\n" for row in LARGE), mimetype="application/x-ndjson")
+
+        @app.route("/image")
+        def image():
+            return Response(b"\x89PNG" * 1000, mimetype="image/png")
+
+        app.after_request(lambda response: compress_response(request, response))
+        self.client = app.test_client()
+
+    def test_large_response_is_gzipped_when_accepted(self) -> None:
+        response = self.client.get("/large", headers={"Accept-Encoding": "gzip, deflate"})
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertIn("Accept-Encoding", response.vary)
+        self.assertEqual(LARGE, json.loads(gzip.decompress(response.data)))
+        self.assertEqual(len(response.data), int(response.headers["Content-Length"]))
+        self.assertTrue(response.get_etag()[1], "etag of compressed body should be weak")
+
+    def test_response_is_not_compressed_if_small_not_accepted_or_not_compressible(self) -> None:
+        for path, accept_encoding in (
+            ("/small", "gzip"),
+            ("/large", "identity"),
+            ("/large", "gzip;q=0"),
+            ("/image", "gzip"),
+        ):
+            response = self.client.get(path, headers={"Accept-Encoding": accept_encoding})
+            self.assertNotIn("Content-Encoding", response.headers, path)
+
+        self.assertEqual(LARGE, self.client.get("/large").json)
+
+    def test_streamed_response_is_compressed_while_streaming(self) -> None:
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertNotIn("Content-Length", response.headers)
+        self.assertEqual(LARGE, [json.loads(line) for line in gzip.decompress(response.data).splitlines()])
+
+    def test_brotli_is_preferred_when_accepted(self) -> None:
+        response = self.client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+        self.assertEqual("br", response.headers["Content-Encoding"])
+        self.assertEqual(LARGE, json.loads(brotli.decompress(response.data)))
@@ -0,0 +1,58 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from service.db import fields_by_index, populate_fields_by_index
+from sqlalchemy import create_engine, text
+
+
+class Test(TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:")
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE migrations (id INTEGER NOT NULL PRIMARY KEY)"))
+            connection.execute(text("INSERT INTO migrations (id) VALUES (1)"))
+            connection.execute(text("CREATE TABLE box (id INTEGER, member_id INTEGER, name TEXT)"))
+            connection.execute(text("CREATE UNIQUE INDEX box_member_name ON box (member_id, name)"))
+
+        tmp_dir = TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.filename = os.path.join(tmp_dir.name, "fields_by_index.json")
+
+        patcher = patch.dict(fields_by_index, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tamper_cache(self) -> None:
+        with open(self.filename) as f:
+            cache = json.load(f)
+        cache["fields_by_index"] = {"from_cache": "a,b"}
+        with open(self.filename, "w") as f:
+            json.dump(cache, f)
+
+    def test_index_fields_are_read_from_cache_written_for_current_migration(self) -> None:
+        populate_fields_by_index(self.engine, cache_filename=self.filename)
+        self.assertEqual("member_id,name", fields_by_index["box_member_name"])
+        self.assertEqual("member_id,name", fields_by_index["box.box_member_name"])
+
+        self.tamper_cache()
+        fields_by_index.clear()
+        populate_fields_by_index(self.engine, cache_filename=self.filename)
+        self.assertEqual({"from_cache": "a,b"}, fields_by_index)
+
+    def test_cache_is_replaced_after_migration(self) -> None:
+        populate_fields_by_index(self.engine, cache_filename=self.filename)
+        self.tamper_cache()
+
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO migrations (id) VALUES (2)"))
+            connection.execute(text("CREATE INDEX box_name ON box (name)"))
+        fields_by_index.clear()
+        populate_fields_by_index(self.engine, cache_filename=self.filename)
+
+        self.assertEqual("name", fields_by_index["box_name"])
+        self.assertNotIn("from_cache", fields_by_index)
+        with open(self.filename) as f:
+            self.assertEqual(2, json.load(f)["migration_id"])
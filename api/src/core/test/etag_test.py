@@ -0,0 +1,93 @@
+import membership
+from membership.models import Permission
+from redis_cache import redis_connection
+from service.api_definition import GET, PUBLIC
+from service.db import db_session
+from service.etag import ModelVersion
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from test_aid.test_base import FlaskTestBase
+from test_aid.test_util import random_str
+
+import core
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def setUp(self) -> None:
+        self.calls = 0
+
+    def get(self, view, etag=None):
+        headers = {"If-None-Match": f'"{etag}"'} if etag else {}
+        with self.app.test_request_context(headers=headers):
+            return view()
+
+    def test_etag_is_hash_of_body_and_matching_request_gets_304(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC, cacheable=True)
+        def view():
+            self.calls += 1
+            return {"value": 1}
+
+        response = self.get(view)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("no-cache", response.headers["Cache-Control"])
+        etag, weak = response.get_etag()
+        self.assertFalse(weak)
+
+        response = self.get(view, etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.get_etag()[0])
+
+        response = self.get(view, "other")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, self.calls)
+
+    def test_view_is_not_called_when_version_matches(self) -> None:
+        version = {"value": "1"}
+
+        @self.service.route("/", method=GET, permission=PUBLIC, cacheable=True, version=lambda: version["value"])
+        def view():
+            self.calls += 1
+            return {"value": 1}
+
+        etag = self.get(view).get_etag()[0]
+        self.assertEqual(1, self.calls)
+
+        response = self.get(view, etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(1, self.calls)
+
+        version["value"] = "2"
+        response = self.get(view, etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.get_etag()[0])
+        self.assertEqual(2, self.calls)
+
+    def test_model_version_is_bumped_by_orm_changes(self) -> None:
+        model_version = ModelVersion(random_str(), Permission)
+        self.addCleanup(event.remove, Session, "after_flush", model_version._after_flush)
+        self.addCleanup(event.remove, Session, "do_orm_execute", model_version._do_orm_execute)
+        self.addCleanup(redis_connection.delete, model_version.key)
+
+        versions = [model_version.get()]
+
+        permission = Permission(permission=random_str())
+        db_session.add(permission)
+        db_session.commit()
+        versions.append(model_version.get())
+
+        db_session.execute(
+            update(Permission)
+            .where(Permission.permission_id == permission.permission_id)
+            .values(permission=random_str())
+        )
+        db_session.commit()
+        versions.append(model_version.get())
+
+        db_session.query(Permission).all()
+        db_session.commit()
+        versions.append(model_version.get())
+
+        self.assertEqual(3, len(set(versions)))
+        self.assertEqual(versions[2], versions[3])
@@ -0,0 +1,80 @@
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+import membership
+import shop
+from flask.json.provider import DefaultJSONProvider
+from membership.views import member_entity, span_entity
+from service.db import db_session
+from service.json_provider import NativeJson, OrjsonProvider, json_response
+from shop.entities import product_entity
+from test_aid.test_base import FlaskTestBase
+
+import core
+
+
+class Color(str, Enum):
+    RED = "red"
+
+
+@dataclass
+class Stat:
+    when: date
+    amount: Decimal
+    values: list
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models, shop.models]
+
+    def assert_same_response(self, payload) -> None:
+        expected = DefaultJSONProvider(self.app).response(payload).get_data()
+        actual = OrjsonProvider(self.app).response(payload).get_data()
+        self.assertEqual(expected, actual)
+
+    def test_response_is_byte_for_byte_compatible_with_default_provider(self) -> None:
+        for payload in (
+            {"status": "ok", "data": None},
+            {"z": 1, "a": [1, 2.5, 0.1, -3, True, False, None], "m": {"y": "x", "b": ""}},
+            [{"price": Decimal("12.50"), "count": 3}, {"price": Decimal("0")}],
+            {"created_at": datetime(2024, 1, 2, 3, 4, 5, 123456), "day": date(2024, 2, 29)},
+            {"color": Color.RED, "text": 'quote " backslash \\ newline \n tab \t'},
+            {"stat": Stat(date(2024, 1, 1), Decimal("1.5"), [Stat(date(2024, 1, 2), Decimal("2"), [])])},
+            [],
+            "plain string",
+            12345678901234,
+        ):
+            with self.subTest(payload=payload):
+                self.assert_same_response(payload)
+
+    def test_non_ascii_is_utf8_but_decodes_to_same_data(self) -> None:
+        payload = {"name": "Åsa Öberg", "emoji": "\U0001f527"}
+        expected = DefaultJSONProvider(self.app).response(payload).get_data()
+        actual = OrjsonProvider(self.app).response(payload).get_data()
+        self.assertEqual(json.loads(expected), json.loads(actual))
+        self.assertIn("Åsa Öberg".encode(), actual)
+
+    def test_native_list_data_is_byte_for_byte_compatible_with_to_obj(self) -> None:
+        member = self.db.create_member(firstname="Anna", lastname="Lind")
+        member.updated_at = datetime(2024, 1, 2, 3, 4, 5, 123456)
+        self.db.create_span(startdate=date(2024, 3, 1), enddate=date(2024, 3, 31))
+        self.db.create_category()
+        self.db.create_product(price=Decimal("99.90"))
+        db_session.commit()
+
+        for entity in (member_entity, span_entity, product_entity):
+            keys = list(entity.cols_to_obj)
+            to_obj = entity.row_converter(keys, [entity.cols_to_native[k] for k in keys])
+            rows = db_session.query(*[getattr(entity.model, k) for k in keys]).all()
+            with self.subTest(entity=entity.name), self.app.test_request_context():
+                # Faker data is not ascii, which the default provider would escape.
+                legacy = DefaultJSONProvider(self.app)
+                legacy.ensure_ascii = False
+                expected = legacy.response(
+                    {"status": "ok", "data": [entity.to_obj(e) for e in db_session.query(entity.model)]}
+                ).get_data()
+                actual = json_response(NativeJson(status="ok", data=[to_obj(row) for row in rows])).get_data()
+                self.assertEqual(expected, actual)
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import membership
+from flask import g
+from redis_cache import redis_connection
+from service import metrics as metrics_module
+from service.api_definition import GET, PUBLIC
+from service.db import db_session
+from service.error import NotFound
+from service.metrics import Metrics
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from test_aid.test_base import FlaskTestBase
+from test_aid.test_util import random_str
+
+import core
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def setUp(self) -> None:
+        self.metrics = Metrics(key=f"metrics_test:{random_str()}")
+        patcher = patch.object(metrics_module, "metrics", self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(redis_connection.delete, self.metrics.key)
+
+    def test_route_records_latency_and_sql_statements(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC)
+        def view() -> str:
+            db_session.execute(text("SELECT 1"))
+            db_session.execute(text("SELECT 2"))
+            return ""
+
+        with self.app.test_request_context():
+            view()
+            self.assertEqual(2, g.request_stats.sql_statements)
+
+        labels = 'endpoint="None",method="GET"'
+        pending = self.metrics._pending
+        self.assertEqual(1, pending[f'makeradmin_request_duration_seconds_count{{{labels},status="200"}}'])
+        self.assertEqual(2, pending[f"makeradmin_request_sql_statements_sum{{{labels}}}"])
+        self.assertEqual(0, pending[f'makeradmin_request_sql_statements_bucket{{{labels},le="1"}}'])
+        self.assertEqual(1, pending[f'makeradmin_request_sql_statements_bucket{{{labels},le="2"}}'])
+
+    def test_failing_statement_does_not_affect_the_timing_of_later_statements(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC)
+        def view() -> str:
+            with self.assertRaises(OperationalError):
+                db_session.execute(text("SELECT * FROM no_such_table"))
+            db_session.rollback()
+            db_session.execute(text("SELECT 1"))
+            return ""
+
+        with self.app.test_request_context():
+            view()
+            self.assertEqual(1, g.request_stats.sql_statements)
+            self.assertNotIn("query_start_time", db_session.connection().info)
+
+    def test_failing_route_is_recorded_with_error_status(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC)
+        def view() -> str:
+            raise NotFound()
+
+        with self.app.test_request_context():
+            with self.assertRaises(NotFound):
+                view()
+
+        labels = 'endpoint="None",method="GET",status="404"'
+        self.assertEqual(1, self.metrics._pending[f"makeradmin_request_duration_seconds_count{{{labels}}}"])
+
+    def test_render_sums_observations_in_prometheus_text_format(self) -> None:
+        stats = metrics_module.RequestStats(sql_statements=3)
+        self.metrics.observe_request("core.view", "GET", 200, 0.02, stats)
+        self.metrics.flush()
+        self.metrics.observe_request("core.view", "GET", 200, 0.2, stats)
+
+        lines = self.metrics.render().splitlines()
+
+        labels = 'endpoint="core.view",method="GET",status="200"'
+        self.assertIn("# TYPE makeradmin_request_duration_seconds histogram", lines)
+        self.assertIn(f'makeradmin_request_duration_seconds_bucket{{{labels},le="0.025"}} 1', lines)
+        self.assertIn(f'makeradmin_request_duration_seconds_bucket{{{labels},le="0.25"}} 2', lines)
+        self.assertIn(f'makeradmin_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertIn(f"makeradmin_request_duration_seconds_count{{{labels}}} 2", lines)
+        self.assertIn('makeradmin_request_sql_statements_sum{endpoint="core.view",method="GET"} 6', lines)
+
+        buckets = [line for line in lines if line.startswith(f"makeradmin_request_duration_seconds_bucket{{{labels}")]
+        self.assertTrue(buckets[-1].startswith(f'makeradmin_request_duration_seconds_bucket{{{labels},le="+Inf"}}'))
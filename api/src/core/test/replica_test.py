@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import membership
+import pymysql
+import service.db
+from membership.models import Permission
+from service.api_definition import GET, POST, PUBLIC
+from service.db import SLAVE_STATUS, Replica, db_session, replica
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from test_aid.test_base import FlaskTestBase
+
+import core
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def setUp(self) -> None:
+        self.replica_engine = create_engine("sqlite:///:memory:")
+        membership.models.Base.metadata.create_all(self.replica_engine)
+        with self.replica_engine.begin() as connection:
+            connection.execute(Permission.__table__.insert().values(permission="from_replica"))
+
+        db_session.query(Permission).delete()
+        db_session.add(Permission(permission="from_primary"))
+        db_session.commit()
+
+        replica.init_with_engine(self.replica_engine, max_lag=5)
+        self.addCleanup(replica.init_with_engine, None)
+
+        self.lag = 0.0
+        patcher = patch.object(replica, "lag", side_effect=lambda: self.lag)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, view):
+        with self.app.test_request_context():
+            response, code = view()
+            return response.json["data"]
+
+    def test_read_only_route_reads_from_replica(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC, read_only=True)
+        def view():
+            return [p.permission for p in db_session.query(Permission)] + list(
+                db_session.execute(text("SELECT permission FROM membership_permissions")).scalars()
+            )
+
+        self.assertEqual(["from_replica", "from_replica"], self.call(view))
+
+    def test_get_route_without_commit_is_read_only_by_default(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC, commit=False)
+        def view():
+            return db_session.scalars(select(Permission.permission)).all()
+
+        self.assertEqual(["from_replica"], self.call(view))
+
+    def test_other_routes_read_from_primary(self) -> None:
+        @self.service.route("/get", method=GET, permission=PUBLIC)
+        def get_view():
+            return db_session.scalars(select(Permission.permission)).all()
+
+        @self.service.route("/post", method=POST, permission=PUBLIC, commit=False)
+        def post_view():
+            return db_session.scalars(select(Permission.permission)).all()
+
+        self.assertEqual(["from_primary"], self.call(get_view))
+        self.assertEqual(["from_primary"], self.call(post_view))
+
+    def test_primary_is_used_when_replica_lags(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC, read_only=True)
+        def view():
+            return db_session.scalars(select(Permission.permission)).all()
+
+        self.lag = 60.0
+        self.assertEqual(["from_primary"], self.call(view))
+
+        self.lag = None
+        replica._checked_at = None
+        self.assertEqual(["from_primary"], self.call(view))
+
+        self.lag = 1.0
+        replica._checked_at = None
+        self.assertEqual(["from_replica"], self.call(view))
+
+    def test_reads_after_write_in_transaction_use_primary(self) -> None:
+        @self.service.route("/", method=GET, permission=PUBLIC, read_only=True, commit=False)
+        def view():
+            db_session.add(Permission(permission="written"))
+            db_session.flush()
+            result = db_session.scalars(select(Permission.permission).order_by(Permission.permission)).all()
+            db_session.rollback()
+            return result
+
+        self.assertEqual(["from_primary", "written"], self.call(view))
+
+    def test_lag_falls_back_to_show_slave_status(self) -> None:
+        def execute(statement):
+            if statement.text == "SHOW REPLICA STATUS":
+                raise ProgrammingError(statement.text, {}, pymysql.err.ProgrammingError(1064, "syntax error"))
+            result = MagicMock()
+            result.mappings.return_value.first.return_value = {"Seconds_Behind_Master": 3}
+            return result
+
+        engine = MagicMock()
+        engine.connect.return_value.__enter__.return_value.execute.side_effect = execute
+        mysql_replica = Replica()
+        mysql_replica.init_with_engine(engine)
+
+        self.assertEqual(3.0, mysql_replica.lag())
+        self.assertEqual(SLAVE_STATUS, mysql_replica._status)
+        self.assertEqual(3.0, mysql_replica.lag())
+
+    def test_missing_privilege_makes_replica_unusable_with_one_warning(self) -> None:
+        denied = pymysql.err.OperationalError(1227, "Access denied; you need the REPLICATION CLIENT privilege")
+        replica.lag.side_effect = OperationalError("SHOW REPLICA STATUS", {}, denied)
+
+        with patch.object(service.db.logger, "warning") as warning:
+            for _ in range(3):
+                replica._checked_at = None
+                self.assertIsNone(replica.usable_engine())
+
+        self.assertEqual(1, warning.call_count)
+        self.assertIn("REPLICATION CLIENT privilege", warning.call_args[0][0])
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import membership
+from redis_cache import redis_connection
+from service.api_definition import GET, PUBLIC
+from service.response_cache import ResponseCache
+from test_aid.test_base import FlaskTestBase
+
+import core
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def setUp(self) -> None:
+        for key in redis_connection.scan_iter("response_cache:*"):
+            redis_connection.delete(key)
+
+        self.calls = 0
+        self.now = 1000.0
+        self.background = []
+        for name, replacement in (("time", lambda: self.now), ("run_in_background", self.background.append)):
+            patcher = patch(f"service.response_cache.{name}", replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def cached_view(self, cache: ResponseCache):
+        @self.service.route("/", method=GET, permission=PUBLIC, read_only=True, response_cache=cache)
+        def view():
+            self.calls += 1
+            return {"calls": self.calls}
+
+        return view
+
+    def get(self, view, query_string=None):
+        with self.app.test_request_context(query_string=query_string):
+            response, _ = view()
+            return response.get_json()["data"]["calls"]
+
+    def test_data_is_cached_per_normalized_query_until_ttl(self) -> None:
+        view = self.cached_view(ResponseCache(ttl=60))
+
+        self.assertEqual(1, self.get(view, "a=1&b=2"))
+        self.assertEqual(1, self.get(view, "b=2&a=1"))
+        self.assertEqual(2, self.get(view, "a=2&b=2"))
+
+        self.now += 59
+        self.assertEqual(1, self.get(view, "a=1&b=2"))
+
+        self.now += 1
+        self.assertEqual(3, self.get(view, "a=1&b=2"))
+        self.assertEqual(3, self.calls)
+
+    def test_stale_data_is_served_while_one_background_refresh_runs(self) -> None:
+        view = self.cached_view(ResponseCache(ttl=60, stale_while_revalidate=600))
+
+        self.assertEqual(1, self.get(view))
+
+        self.now += 100
+        self.assertEqual(1, self.get(view))
+        self.assertEqual(1, self.get(view))
+        self.assertEqual(1, len(self.background), "only one refresh while locked")
+        self.assertEqual(1, self.calls)
+
+        self.background.pop()()
+        self.assertEqual(2, self.get(view))
+        self.assertEqual(2, self.calls)
+
+        self.now += 100
+        self.assertEqual(2, self.get(view))
+        self.assertEqual(1, len(self.background), "lock is released after refresh")
+
+    def test_expired_entry_is_computed_in_request(self) -> None:
+        view = self.cached_view(ResponseCache(ttl=60, stale_while_revalidate=600))
+
+        self.assertEqual(1, self.get(view))
+        self.now += 661
+        self.assertEqual(2, self.get(view))
+        self.assertEqual([], self.background)
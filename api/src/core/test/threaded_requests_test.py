@@ -0,0 +1,40 @@
+from threading import Barrier, Thread
+from unittest import TestCase
+
+from flask import Flask
+from service.db import db_session, db_session_factory, shutdown_session
+from sqlalchemy import create_engine
+
+
+class Test(TestCase):
+    def test_concurrent_requests_get_their_own_session_which_is_removed_on_teardown(self) -> None:
+        db_session_factory.init_with_engine(create_engine("sqlite://"))
+        db_session.remove()
+
+        app = Flask(__name__)
+        removed = []
+        # Teardown functions are called in reverse order, so this is called after shutdown_session.
+        app.teardown_appcontext(lambda exception: removed.append(not db_session.registry.has()))
+        app.teardown_appcontext(shutdown_session)
+
+        concurrent_requests = 4
+        barrier = Barrier(concurrent_requests)
+        sessions = []
+
+        @app.route("/")
+        def view():
+            sessions.append(db_session())
+            # All requests are in progress at the same time.
+            barrier.wait(timeout=5)
+            return "ok"
+
+        client = app.test_client()
+        threads = [Thread(target=client.get, args=("/",)) for _ in range(concurrent_requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(concurrent_requests, len({id(session) for session in sessions}))
+        self.assertEqual([True] * concurrent_requests, removed)
+        self.assertNotIn(db_session(), sessions)
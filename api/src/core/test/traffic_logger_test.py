@@ -0,0 +1,120 @@
+import json
+import os
+from datetime import timedelta
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+from flask import Flask, Response, g
+from service import traffic_logger
+from service.traffic_logger import (
+    REDACTED,
+    TrafficLogWriter,
+    log_traffic,
+    traffic_logger_commit,
+    traffic_logger_init,
+)
+
+
+class Test(TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.writer = TrafficLogWriter(self.directory.name, max_file_bytes=1024 * 1024, rotate_seconds=3600)
+        # Records are written by calling write_pending in the test instead of by the background thread.
+        self.writer._writer_pid = os.getpid()
+        self.addCleanup(self.writer.close)
+
+        for patcher in (
+            patch.object(traffic_logger, "traffic_log_writer", self.writer),
+            patch.object(traffic_logger, "LOGGING_ENABLED", True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def log_request(self, **kwargs) -> None:
+        with self.app.test_request_context(**kwargs):
+            traffic_logger_init()
+            traffic_logger_commit(Response('{"status": "ok"}', mimetype="application/json"))
+
+    def read_records(self):
+        records = []
+        for filename in sorted(os.listdir(self.directory.name)):
+            with open(os.path.join(self.directory.name, filename)) as f:
+                records += [json.loads(line) for line in f]
+        return records
+
+    def test_request_only_queues_and_writer_redacts_and_writes_ndjson(self) -> None:
+        self.log_request(
+            path="/member/current/set_pin_code",
+            method="POST",
+            json={"pin_code": "1234", "comment": "hello"},
+            headers={"Authorization": "Bearer secret-token"},
+            query_string={"access_token": "secret", "page": "2"},
+        )
+
+        self.assertEqual(1, self.writer.queue.qsize())
+        self.assertEqual([], os.listdir(self.directory.name))
+
+        self.writer.write_pending()
+
+        (record,) = self.read_records()
+        self.assertEqual("/member/current/set_pin_code", record["request"]["url"])
+        self.assertEqual(REDACTED, record["request"]["headers"]["Authorization"])
+        self.assertEqual({"access_token": REDACTED, "page": "2"}, record["request"]["query"])
+        self.assertEqual({"pin_code": REDACTED, "comment": "hello"}, json.loads(record["request"]["data"]))
+        self.assertEqual(200, record["response"]["status"])
+
+    def test_service_traffic_is_redacted_by_the_writer(self) -> None:
+        service_response = requests.Response()
+        service_response.status_code = 200
+        service_response._content = b'{"id": 1}'
+        service_response.elapsed = timedelta(milliseconds=5)
+        service_response.request = requests.Request(
+            "POST", "https://api.example.com/login", json={"password": "secret", "user": "me"}
+        ).prepare()
+
+        with patch.object(traffic_logger, "redact_body", side_effect=AssertionError("redacted in request")):
+            with self.app.test_request_context(path="/member", method="GET"):
+                traffic_logger_init()
+                log_traffic(service_response)
+                traffic_logger_commit(Response('{"status": "ok"}', mimetype="application/json"))
+
+        self.writer.write_pending()
+
+        ((traffic,),) = [record["service_traffic"] for record in self.read_records()]
+        self.assertEqual({"password": REDACTED, "user": "me"}, json.loads(traffic["request"]["body"]))
+        self.assertEqual('{"id": 1}', traffic["response"]["data"])
+
+    def test_requests_outside_sample_are_not_logged(self) -> None:
+        with patch.object(traffic_logger, "SAMPLE_RATE", 0.0):
+            with self.app.test_request_context():
+                traffic_logger_init()
+                self.assertIsNone(g.get("traffic_logger"))
+
+        self.assertEqual(0, self.writer.queue.qsize())
+
+    def test_full_queue_drops_records(self) -> None:
+        self.writer.queue.maxsize = 2
+
+        for _ in range(3):
+            self.log_request(path="/member")
+
+        self.assertEqual(2, self.writer.queue.qsize())
+        self.assertEqual(1, self.writer.dropped)
+
+    def test_files_are_rotated_on_size(self) -> None:
+        self.writer.max_file_bytes = 1
+        self.writer.batch_size = 1
+
+        for i in range(3):
+            self.log_request(path=f"/member/{i}")
+            with patch("service.traffic_logger.datetime") as datetime_mock:
+                datetime_mock.now.return_value.strftime.return_value = f"file{i}"
+                self.writer.write_pending()
+
+        self.assertEqual(3, len(os.listdir(self.directory.name)))
+        self.assertEqual(["/member/0", "/member/1", "/member/2"], [r["request"]["url"] for r in self.read_records()])
@@ -1,6 +1,18 @@
-from flask import g, request
-from service.api_definition import DELETE, GET, PERMISSION_MANAGE, POST, PUBLIC, USER, Arg, Enum, non_empty_str
+from flask import Response, g, request
+from service.api_definition import (
+    DELETE,
+    GET,
+    METRICS_VIEW,
+    PERMISSION_MANAGE,
+    POST,
+    PUBLIC,
+    USER,
+    Arg,
+    Enum,
+    non_empty_str,
+)
 from service.error import BadRequest
+from service.metrics import PROMETHEUS_CONTENT_TYPE, metrics
 
 from core import auth, service
 
@@ -64,3 +76,9 @@ def roll_service_token(user_id=None):
 def list_permissions() -> list[str]:
     """List all permissions that the caller has"""
     return g.permissions
+
+
+@service.route("/metrics", method=GET, permission=METRICS_VIEW, commit=False)
+def metrics_view():
+    """Route latency, sql statement and http call metrics for all workers in prometheus text format."""
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
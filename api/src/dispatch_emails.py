@@ -18,6 +18,7 @@ from core.auth import create_access_token
 from dispatch_sms import send_sms
 from membership.membership import get_members_and_membership, get_membership_summaries, get_membership_summary
 from membership.models import Member, Span
+from membership.span_timeline import SpanTimeline
 from messages.message import send_message
 from messages.models import Message, MessageTemplate
 from multiaccess.label_data import (
@@ -450,24 +451,21 @@ def labaccess_reminder() -> None:
 
     end_date_reminder_target = now.date() + timedelta(days=LABACCESS_REMINDER_DAYS_BEFORE)
 
-    query = db_session.query(Member)
-    query = query.join(Span)
-    query = query.filter(
-        Member.deleted_at.is_(None),
+    candidate_ids = select(Span.member_id).filter(
         Span.type == Span.LABACCESS,
         Span.deleted_at.is_(None),
         Span.enddate == end_date_reminder_target,
     )
+    labaccess = SpanTimeline.load(Span.LABACCESS, candidate_ids)
+
+    query = db_session.query(Member)
+    query = query.filter(Member.deleted_at.is_(None), Member.member_id.in_(candidate_ids))
 
     for member in query:
         # We have a candidate, now check if we should send a reminder.
 
         # First double check the end date so we don't send reminder if there is another span further in the future.
-        end_date = (
-            db_session.query(func.max(Span.enddate))
-            .filter(Span.member == member, Span.type == Span.LABACCESS, Span.deleted_at.is_(None))
-            .scalar()
-        )
+        end_date = labaccess.last_end(member.member_id)
         if end_date != end_date_reminder_target:
             continue
 
@@ -7,10 +7,13 @@ from datetime import datetime, timedelta, timezone
 from core.auth import generate_token
 from core.models import AccessToken
 from core.service_users import SERVICE_USERS
+from membership.member_auth import bump_permission_index_version
+from membership.membership_status import refresh_membership_status
 from migrate import ensure_migrations_table, run_migrations
 from rocky.process import log_exception
-from service.config import get_mysql_config
-from service.db import create_mysql_engine
+from service.access_token_cache import access_token_cache
+from service.config import config, get_mysql_config
+from service.db import create_mysql_engine, write_fields_by_index_cache
 from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
@@ -21,6 +24,8 @@ def clear_permission_cache(session_factory):
     with closing(session_factory()) as session:
         session.execute(text("UPDATE access_tokens SET permissions = NULL"))
         session.commit()
+    bump_permission_index_version()
+    access_token_cache.invalidate_all()
 
 
 def refresh_service_access_tokens(session_factory):
@@ -54,6 +59,13 @@ def refresh_service_access_tokens(session_factory):
             session.commit()
 
 
+def refresh_all_membership_status(session_factory):
+    """Fill the membership status from the spans, in case spans were changed outside the api."""
+    with closing(session_factory()) as session:
+        refresh_membership_status(session.connection())
+        session.commit()
+
+
 def init_db():
     engine = create_mysql_engine(**get_mysql_config())
     session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -62,10 +74,15 @@ def init_db():
 
     run_migrations(session_factory)
 
+    # Cached for the api workers, so they don't have to inspect the db on every boot.
+    write_fields_by_index_cache(engine, config.get("DB_INDEX_CACHE_FILE"))
+
     clear_permission_cache(session_factory)
 
     refresh_service_access_tokens(session_factory)
 
+    refresh_all_membership_status(session_factory)
+
 
 if __name__ == "__main__":
     with log_exception(status=1):
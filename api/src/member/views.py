@@ -1,7 +1,7 @@
 import serde
 from change_phone_request import change_phone_request, change_phone_validate
 from flask import g, request
-from membership.member_auth import get_member_permissions
+from membership.member_auth import get_member_permission_names
 from membership.membership import get_access_summary, get_membership_summary
 from membership.models import Member, SlackEmailOverride
 from membership.views import member_entity
@@ -37,7 +37,7 @@ def send_updated_member_info(member_id: int = Arg(int), msg_swe: str = Arg(str),
     return send_updated_member_info_email(member_id, msg_swe, msg_en)
 
 
-@service.route("/current", method=GET, permission=USER)
+@service.route("/current", method=GET, permission=USER, cacheable=True)
 def current_member():
     """Get current member."""
     m = member_entity.read(g.user_id)
@@ -51,36 +51,36 @@ def current_member():
     return m
 
 
-@service.route("/current/permissions", method=GET, permission=USER)
+@service.route("/current/permissions", method=GET, permission=USER, cacheable=True)
 def current_permissions():
     """Get current member permissions."""
-    return {"permissions": [p for _, p in get_member_permissions(g.user_id)]}
+    return {"permissions": get_member_permission_names(g.user_id)}
 
 
-@service.route("/current/membership", method=GET, permission=USER)
+@service.route("/current/membership", method=GET, permission=USER, cacheable=True)
 def current_membership_info():
     """Get current user membership information."""
     return get_membership_summary(g.user_id).as_json()
 
 
-@service.route("/current/access", method=GET, permission=USER)
+@service.route("/current/access", method=GET, permission=USER, cacheable=True)
 def current_access_info():
     """Get current user accessy information."""
     return get_access_summary(g.user_id)
 
 
-@service.route("/current/groups", method=GET, permission=USER)
+@service.route("/current/groups", method=GET, permission=USER, cacheable=True)
 def current_membership_groups():
     return get_member_groups(g.user_id)
 
 
-@service.route("/current/quizzes", method=GET, permission=USER)
+@service.route("/current/quizzes", method=GET, permission=USER, cacheable=True)
 def current_member_quiz_info():
     """Get info about which quizzes the current user has completed."""
     return member_quiz_statistics(g.user_id)
 
 
-@service.route("/current/labels", method=GET, permission=USER)
+@service.route("/current/labels", method=GET, permission=USER, cacheable=True)
 def current_member_labels() -> dict:
     """Get info about which labels the current user has."""
     return serde.to_dict(get_member_labels(g.user_id))
@@ -98,7 +98,7 @@ def request_change_phone_number(member_id: int | None = Arg(int, required=False)
     return change_phone_request(member_id, phone)
 
 
-@service.route("/current/slack_status", method=GET, permission=USER)
+@service.route("/current/slack_status", method=GET, permission=USER, cacheable=True)
 def get_slack_status():
     """Get Slack account status and task delegation preference for the current member."""
     from service.config import config
@@ -148,7 +148,7 @@ def set_task_delegation_enabled(enabled: bool = Arg(bool)):
     return {"enabled": enabled}
 
 
-@service.route("/current/slack_email", method=GET, permission=USER)
+@service.route("/current/slack_email", method=GET, permission=USER, cacheable=True)
 def get_slack_email():
     """Get the current member's Slack email override, if any, plus their Slack account info."""
     from service.config import config
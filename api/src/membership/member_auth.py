@@ -1,12 +1,21 @@
-from typing import List, Optional, Tuple
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
 
 import bcrypt
 import sqlalchemy
+from redis import RedisError
+from redis_cache import redis_connection
+from service.access_token_cache import access_token_cache
 from service.api_definition import BAD_VALUE
-from service.db import db_session
+from service.db import call_after_transaction, db_session
 from service.error import Unauthorized
+from service.logging import logger
+from sqlalchemy import bindparam, text
 
-from membership.models import Group, Member, Permission
+from membership.models import Group, Member, Permission, member_group
+
+PERMISSION_INDEX_VERSION_KEY = "member_permissions:version"
+PERMISSION_INDEX_TTL = timedelta(days=1)
 
 FORBIDDEN_SUB_SEQUENCES = [
     ("abcdefghijklmnopqrstuvwxyzåäö", 4),
@@ -74,6 +83,97 @@ def get_member_permissions(member_id: Optional[int] = None) -> List[Tuple[int, s
     )
 
 
+def permission_index_key(member_id: int) -> str:
+    return f"member_permissions:{member_id}"
+
+
+def member_permission_version_key(member_id: int) -> str:
+    return f"member_permissions:version:{member_id}"
+
+
+def get_member_permission_names(member_id: int) -> List[str]:
+    """Return permission names for a member from the permission index in redis, the index entry is computed from the
+    db on miss. Entries are stored together with the index version (global and of the member) they were computed for,
+    bumping the global version invalidates all entries and bumping the member version the entry of the member."""
+    try:
+        global_version, member_version, cached = redis_connection.mget(
+            PERMISSION_INDEX_VERSION_KEY, member_permission_version_key(member_id), permission_index_key(member_id)
+        )
+        version = ".".join((v or b"0").decode() for v in (global_version, member_version))
+    except RedisError as e:
+        logger.warning(f"permission index unavailable, falling back to db: {e}")
+        return [p for _, p in get_member_permissions(member_id)]
+
+    if cached is not None:
+        cached_version, _, permissions = cached.decode().partition(":")
+        if cached_version == version:
+            return permissions.split(",") if permissions else []
+
+    permissions = [p for _, p in get_member_permissions(member_id)]
+
+    try:
+        redis_connection.set(
+            permission_index_key(member_id), f"{version}:{','.join(permissions)}", ex=PERMISSION_INDEX_TTL
+        )
+    except RedisError as e:
+        logger.warning(f"failed to store member permissions in index: {e}")
+
+    return permissions
+
+
+def get_group_member_ids(group_id: int) -> List[int]:
+    return [
+        member_id
+        for (member_id,) in db_session.query(member_group.c.member_id).filter(member_group.c.group_id == group_id)
+    ]
+
+
+def bump_permission_index_version() -> None:
+    try:
+        redis_connection.incr(PERMISSION_INDEX_VERSION_KEY)
+    except RedisError as e:
+        logger.error(f"failed to invalidate permission index: {e}")
+
+
+def bump_member_permission_versions(member_ids: List[int]) -> None:
+    try:
+        with redis_connection.pipeline() as pipe:
+            for member_id in member_ids:
+                pipe.incr(member_permission_version_key(member_id))
+            pipe.execute()
+    except RedisError as e:
+        logger.error(f"failed to invalidate permission index for members: {e}")
+        bump_permission_index_version()
+
+
+def invalidate_member_permissions(member_ids: Iterable[int]) -> None:
+    """Invalidate permissions of members after a change of group members or group permissions. Cached permissions on
+    access tokens of the members are cleared in the current transaction, the permission index entries and the cached
+    access tokens of the members are invalidated now and when the transaction ends."""
+    member_ids = list(member_ids)
+    if not member_ids:
+        return
+
+    member_ids_param = {"member_ids": member_ids}
+    tokens = db_session.scalars(
+        text("SELECT access_token FROM access_tokens WHERE user_id IN :member_ids").bindparams(
+            bindparam("member_ids", expanding=True)
+        ),
+        member_ids_param,
+    ).all()
+    db_session.execute(
+        text("UPDATE access_tokens SET permissions = NULL WHERE user_id IN :member_ids").bindparams(
+            bindparam("member_ids", expanding=True)
+        ),
+        member_ids_param,
+    )
+
+    bump_member_permission_versions(member_ids)
+    call_after_transaction(db_session, lambda: bump_member_permission_versions(member_ids))
+    if tokens:
+        access_token_cache.invalidate_after_commit(db_session, *tokens)
+
+
 def authenticate(username: Optional[str] = None, password: Optional[str] = None) -> int:
     """Authenticate a member trough email/member number and password, returns member_id if authenticated, used from core."""
     member: Optional[Member] = (
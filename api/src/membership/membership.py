@@ -2,7 +2,7 @@ import logging
 import time
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, TypeVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypeVar
 
 from dataclasses_json import DataClassJsonMixin
 from service.api_definition import NOT_UNIQUE
@@ -11,6 +11,7 @@ from service.error import NotFound, PreconditionFailed, UnprocessableEntity
 from service.util import date_to_str
 from sqlalchemy import func
 
+from membership.membership_status import MemberIds, read_membership_status, status_select
 from membership.models import Member, Span
 
 logger = logging.getLogger("makeradmin")
@@ -42,8 +43,22 @@ class MembershipData(DataClassJsonMixin):
         )
 
 
+NO_MEMBERSHIP = MembershipData(
+    membership_end=None,
+    membership_active=False,
+    labaccess_end=None,
+    labaccess_active=False,
+    special_labaccess_end=None,
+    special_labaccess_active=False,
+    effective_labaccess_end=None,
+    effective_labaccess_active=False,
+)
+
 T = TypeVar("T")
 
+# Max number of member ids to filter on in get_membership_summaries, all members are read for longer lists.
+MAX_FILTERED_MEMBER_IDS = 1000
+
 
 def max_or_none(*args: T) -> Optional[T]:
     items = [i for i in args if i is not None]
@@ -58,105 +73,64 @@ def get_membership_summary(member_id: int, at_date: Optional[date] = None) -> Me
 
 def get_membership_summaries(member_ids: Sequence[int], at_date: Optional[date] = None) -> List[MembershipData]:
     """Returns a list of MembershipData for each member in member_ids."""
-
-    # Speed up the database query for the common special case that member_ids is a list with exactly 1 element.
-    # In other cases we will extract information about every member.
-    # Since the method is only used with either 1 member or all members in the database this is reasonable.
-    span_filter = Span.member_id == member_ids[0] if len(member_ids) == 1 else True
-
-    if at_date is None:
-        at_date = date.today()
-
-    # Converts a list of rows of IDs to a set of them
-    def setify(rows: List[Any]) -> Set[Any]:
-        return set(r[0] for r in rows)
-
-    # Converts a list of rows of IDs and values to a map from id to value
-    def mapify(rows: List[Any]) -> Dict[Any, Any]:
-        return {r[0]: r[1] for r in rows}
-
-    labaccess_active: Set[int] = setify(
-        db_session.query(Span.member_id)
-        .filter(
-            span_filter,
-            Span.type == Span.LABACCESS,
-            Span.startdate <= at_date,
-            Span.enddate >= at_date,
-            Span.deleted_at == None,
+    summaries = get_membership_summaries_by_member(member_ids, at_date)
+    return [summaries.get(id, NO_MEMBERSHIP) for id in member_ids]
+
+
+def get_membership_summaries_by_member(
+    member_ids: MemberIds, at_date: Optional[date] = None
+) -> Dict[int, MembershipData]:
+    """Returns MembershipData by member id for member_ids, a list of any size or a select of member ids (all members
+    if None). Members without any spans are not included, they have NO_MEMBERSHIP."""
+
+    # For very long lists it is cheaper to read every member than to send a huge IN clause.
+    if isinstance(member_ids, Sequence) and len(member_ids) > MAX_FILTERED_MEMBER_IDS:
+        member_ids = None
+
+    today = date.today()
+    if at_date is not None and at_date != today:
+        return membership_summaries_from_spans(member_ids, at_date)
+
+    # Read the materialized status, rows not refreshed since the date changed are computed from the spans.
+    statuses = read_membership_status(db_session, member_ids)
+    summaries = {id: membership_data(status) for id, status in statuses.items()}
+    stale_ids = [id for id, status in statuses.items() if status.status_date != today]
+    if stale_ids:
+        summaries.update(
+            membership_summaries_from_spans(stale_ids if len(stale_ids) <= MAX_FILTERED_MEMBER_IDS else None, today)
         )
-        .group_by(Span.member_id)
-        .all()
-    )
-
-    labaccess_end: Dict[int, date] = mapify(
-        db_session.query(Span.member_id, func.max(Span.enddate))
-        .filter(span_filter, Span.type == Span.LABACCESS, Span.deleted_at == None)
-        .group_by(Span.member_id)
-        .all()
+    return summaries
+
+
+def get_membership_summaries_from_spans(member_ids: Sequence[int], at_date: date) -> List[MembershipData]:
+    """Returns a list of MembershipData for each member in member_ids, aggregated from the spans."""
+    summaries = membership_summaries_from_spans(member_ids, at_date)
+    return [summaries.get(id, NO_MEMBERSHIP) for id in member_ids]
+
+
+def membership_summaries_from_spans(member_ids: MemberIds, at_date: date) -> Dict[int, MembershipData]:
+    """MembershipData by member id aggregated from the spans in one grouped query, see status_select."""
+    return {row.member_id: membership_data(row) for row in db_session.execute(status_select(at_date, member_ids))}
+
+
+def membership_data(status: Any) -> MembershipData:
+    """MembershipData from a row with the columns of the membership status table."""
+    return MembershipData(
+        labaccess_end=status.labaccess_end,
+        labaccess_active=bool(status.labaccess_active),
+        special_labaccess_end=status.special_labaccess_end,
+        special_labaccess_active=bool(status.special_labaccess_active),
+        membership_end=status.membership_end,
+        membership_active=bool(status.membership_active),
+        effective_labaccess_end=max_or_none(status.labaccess_end, status.special_labaccess_end),
+        # The effective labaccess is active if the member has normal or special labaccess
+        # The membership agreement does not matter here.
+        # If the user has the appropriate spans, then they get access.
+        # However, the spans are typically not added until the membership agreement is signed,
+        # as labaccess order actions will stay pending.
+        effective_labaccess_active=bool(status.labaccess_active or status.special_labaccess_active),
     )
 
-    membership_active: Set[int] = setify(
-        db_session.query(Span.member_id)
-        .filter(
-            span_filter,
-            Span.type == Span.MEMBERSHIP,
-            Span.startdate <= at_date,
-            Span.enddate >= at_date,
-            Span.deleted_at == None,
-        )
-        .all()
-    )
-
-    membership_end: Dict[int, date] = mapify(
-        db_session.query(Span.member_id, func.max(Span.enddate))
-        .filter(span_filter, Span.type == Span.MEMBERSHIP, Span.deleted_at == None)
-        .group_by(Span.member_id)
-        .all()
-    )
-
-    special_labaccess_active = setify(
-        db_session.query(Span.member_id)
-        .filter(
-            span_filter,
-            Span.type == Span.SPECIAL_LABACESS,
-            Span.startdate <= at_date,
-            Span.enddate >= at_date,
-            Span.deleted_at == None,
-        )
-        .group_by(Span.member_id)
-        .all()
-    )
-
-    special_labaccess_end: Dict[int, date] = mapify(
-        db_session.query(Span.member_id, func.max(Span.enddate))
-        .filter(span_filter, Span.type == Span.SPECIAL_LABACESS, Span.deleted_at == None)
-        .group_by(Span.member_id)
-        .all()
-    )
-
-    memberships: List[MembershipData] = []
-    for id in member_ids:
-        # Create the MembershipData structure
-        # Note that the dict.get method returns None if the key doesn't exist in the map
-        memberships.append(
-            MembershipData(
-                labaccess_end=labaccess_end.get(id),
-                labaccess_active=id in labaccess_active,
-                special_labaccess_end=special_labaccess_end.get(id),
-                special_labaccess_active=id in special_labaccess_active,
-                membership_end=membership_end.get(id),
-                membership_active=id in membership_active,
-                effective_labaccess_end=max_or_none(labaccess_end.get(id), special_labaccess_end.get(id)),
-                # The effective labaccess is active if the member has normal or special labaccess
-                # The membership agreement does not matter here.
-                # If the user has the appropriate spans, then they get access.
-                # However, the spans are typically not added until the membership agreement is signed,
-                # as labaccess order actions will stay pending.
-                effective_labaccess_active=(id in labaccess_active) or (id in special_labaccess_active),
-            )
-        )
-    return memberships
-
 
 def get_members_and_membership(at_date: Optional[date] = None) -> Tuple[List[Member], List[MembershipData]]:
     members: List[Member] = db_session.query(Member).filter(Member.deleted_at == None).all()
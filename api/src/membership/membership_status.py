@@ -0,0 +1,157 @@
+"""Materialized membership status per member in member_membership_status, so that summaries for many members can be
+read with one indexed query instead of aggregating the spans.
+
+Rows are refreshed in the same transaction as the span changes: on flush for spans changed through the orm, and for
+the members of the changed spans after bulk statements on spans (all members if they can't be found). The active flags
+are only valid for status_date, all rows are refreshed nightly (and by init_db.py) for the date rollover, rows for
+another date are not used.
+"""
+
+from datetime import date
+from typing import Collection, Dict, List, Optional, Union
+
+from service.db import insert_or_update
+from sqlalchemy import ColumnElement, Connection, Date, Row, Select, and_, case, event, func, inspect, literal, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from membership.models import MemberMembershipStatus, Span
+
+status_table = MemberMembershipStatus.__table__
+
+spans = Span.__table__
+
+# A list of member ids, a select of member ids or None for all members.
+MemberIds = Union[Collection[int], Select, None]
+
+
+def _end(span_type: str):
+    return func.max(case((spans.c.type == span_type, spans.c.enddate)))
+
+
+def _active(span_type: str, at_date: date):
+    covers = and_(spans.c.type == span_type, spans.c.startdate <= at_date, spans.c.enddate >= at_date)
+    return func.max(case((covers, 1), else_=0))
+
+
+def status_select(at_date: date, member_ids: MemberIds = None) -> Select:
+    """One grouped query with conditional aggregates over the spans, giving rows with the columns of the status table
+    for member_ids (a list of any size or a select of member ids), all members if None."""
+    query = (
+        select(
+            spans.c.member_id,
+            _end(Span.MEMBERSHIP).label("membership_end"),
+            _active(Span.MEMBERSHIP, at_date).label("membership_active"),
+            _end(Span.LABACCESS).label("labaccess_end"),
+            _active(Span.LABACCESS, at_date).label("labaccess_active"),
+            _end(Span.SPECIAL_LABACESS).label("special_labaccess_end"),
+            _active(Span.SPECIAL_LABACESS, at_date).label("special_labaccess_active"),
+            literal(at_date, Date).label("status_date"),
+        )
+        .where(spans.c.deleted_at.is_(None))
+        .group_by(spans.c.member_id)
+    )
+    if member_ids is not None:
+        query = query.where(spans.c.member_id.in_(member_ids))
+    return query
+
+
+def refresh_membership_status(
+    connection: Connection, member_ids: MemberIds = None, at_date: Optional[date] = None
+) -> None:
+    """Recompute the status rows of member_ids from the spans, all members if None."""
+    if isinstance(member_ids, Collection) and not member_ids:
+        return
+
+    if at_date is None:
+        at_date = date.today()
+
+    # Upsert instead of delete and insert, a delete of members without a row would take gap locks in MySQL, that
+    # deadlock concurrent span changes for other new members.
+    connection.execute(
+        insert_or_update(
+            connection.dialect.name,
+            status_table,
+            [status_table.c.member_id],
+            lambda inserted: {c.name: inserted[c.name] for c in status_table.c if not c.primary_key},
+            from_select=status_select(at_date, member_ids),
+        )
+    )
+
+    # Rows of members that no longer have any spans, found with a plain read so only existing rows are deleted.
+    gone = select(status_table.c.member_id).where(
+        ~select(spans.c.span_id)
+        .where(spans.c.member_id == status_table.c.member_id, spans.c.deleted_at.is_(None))
+        .exists()
+    )
+    if member_ids is not None:
+        gone = gone.where(status_table.c.member_id.in_(member_ids))
+    gone_ids = connection.scalars(gone).all()
+    if gone_ids:
+        connection.execute(status_table.delete().where(status_table.c.member_id.in_(gone_ids)))
+
+
+def read_membership_status(session: Session, member_ids: MemberIds = None) -> Dict[int, Row]:
+    """Status rows by member id, for member_ids or all members if None. Plain rows are returned (not orm instances
+    that could be stale in the identity map after a refresh)."""
+    query = select(status_table)
+    if member_ids is not None:
+        query = query.where(status_table.c.member_id.in_(member_ids))
+    return {row.member_id: row for row in session.execute(query)}
+
+
+@event.listens_for(Session, "after_flush")
+def refresh_after_flush(session: Session, flush_context) -> None:
+    member_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Span):
+            member_ids.add(obj.member_id)
+            # The span may have been moved from another member.
+            member_ids.update(inspect(obj).attrs.member_id.history.deleted)
+    member_ids.discard(None)
+    if member_ids:
+        refresh_membership_status(session.connection(), member_ids)
+
+
+def _bulk_statement_spans(state: ORMExecuteState, parameters: List[Dict]) -> Optional[ColumnElement]:
+    """Condition for the spans changed by a bulk update or delete, the primary keys of an update by primary key or
+    the where clause of the statement, None if all spans or not known."""
+    if state.statement.whereclause is None:
+        span_ids = [row.get(Span.span_id.key) for row in parameters]
+        return None if None in span_ids else Span.span_id.in_(span_ids)
+    if len(parameters) > 1:
+        return None
+    return state.statement.whereclause
+
+
+@event.listens_for(Session, "do_orm_execute")
+def refresh_after_bulk_statement(state: ORMExecuteState):
+    if state.is_select or state.bind_mapper is None or not issubclass(state.bind_mapper.class_, Span):
+        return None
+
+    connection = state.session.connection()
+    parameters = state.parameters if isinstance(state.parameters, list) else [state.parameters or {}]
+
+    # Find the members of the changed spans before the statement runs, None among them if not known.
+    condition = _bulk_statement_spans(state, parameters) if state.is_update or state.is_delete else None
+    span_ids: List[int] = []
+    if state.is_insert:
+        member_ids = {row.get(Span.member_id.key) for row in parameters}
+    elif condition is not None:
+        where_parameters = parameters[0] if state.statement.whereclause is not None else {}
+        changed = connection.execute(select(Span.span_id, Span.member_id).where(condition), where_parameters).all()
+        span_ids = [span_id for span_id, _ in changed]
+        member_ids = {member_id for _, member_id in changed}
+    else:
+        member_ids = {None}
+
+    result = state.invoke_statement()
+
+    if None in member_ids:
+        refresh_membership_status(connection)
+        return result
+
+    if state.is_update and span_ids:
+        # The spans may have been moved to other members.
+        member_ids.update(connection.scalars(select(Span.member_id).where(Span.span_id.in_(span_ids))))
+    refresh_membership_status(connection, member_ids)
+    return result
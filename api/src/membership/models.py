@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from logging import getLogger
 from typing import Any, List, Literal, Optional
 
@@ -202,6 +202,26 @@ class Span(Base):
         return f"Span(span_id={self.span_id}, type={self.type}, enddate={self.enddate})"
 
 
+class MemberMembershipStatus(Base):
+    """Membership status per member derived from the spans, kept up to date by membership_status.py. Members without
+    spans have no row."""
+
+    __tablename__ = "member_membership_status"
+
+    member_id: Mapped[int] = mapped_column(Integer, primary_key=True, nullable=False, autoincrement=False)
+    membership_end: Mapped[Optional[date]] = mapped_column(Date)
+    membership_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    labaccess_end: Mapped[Optional[date]] = mapped_column(Date)
+    labaccess_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    special_labaccess_end: Mapped[Optional[date]] = mapped_column(Date)
+    special_labaccess_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    # The date the active flags are valid for.
+    status_date: Mapped[date] = mapped_column(Date, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"MemberMembershipStatus(member_id={self.member_id}, status_date={self.status_date})"
+
+
 class Box(Base):
     __tablename__ = "membership_box"
 
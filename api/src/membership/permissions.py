@@ -5,9 +5,13 @@ from membership.models import Permission
 
 
 def register_permissions(permissions):
+    existing = {p for (p,) in db_session.query(Permission.permission)}
     for permission in permissions:
+        if permission in existing:
+            continue
         try:
             db_session.add(Permission(permission=permission))
             db_session.commit()
         except IntegrityError:
+            # Registered by another process booting at the same time.
             db_session.rollback()
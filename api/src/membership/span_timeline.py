@@ -0,0 +1,222 @@
+"""Days covered by spans of one type per member, loaded with one query, so that statistics and reminders can ask about
+many members and dates without going back to the spans.
+
+The spans of each member are merged into sorted intervals of inclusive date ordinals that neither overlap nor touch.
+They are stored as columns: the sorted member ids, and the intervals of all members after each other in starts and
+ends, searched with bisect for questions about one member. The merging and the statistics over all members
+(active_counts and days_covered_by_member) are vectorized with numpy. The pure python versions are the reference that
+the numpy versions are tested and benchmarked against, they are used if np is patched to None.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from service.db import db_session
+from sqlalchemy import select
+
+from membership.membership_status import MemberIds
+from membership.models import Span
+
+# Sorted member ids, offsets into starts and ends for each member (and the end), starts, ends.
+Columns = Tuple[array, array, array, array]
+
+
+def merge_columns(member_ids: Sequence[int], starts: Sequence[int], ends: Sequence[int]) -> Columns:
+    """Merge spans, given as columns of member id and inclusive start and end day ordinals, per member."""
+    members, offsets, merged_starts, merged_ends = array("l"), array("l"), array("l"), array("l")
+    for member_id, start, end in sorted(zip(member_ids, starts, ends)):
+        if members and members[-1] == member_id:
+            if start <= merged_ends[-1] + 1:
+                merged_ends[-1] = max(merged_ends[-1], end)
+                continue
+        else:
+            members.append(member_id)
+            offsets.append(len(merged_starts))
+        merged_starts.append(start)
+        merged_ends.append(end)
+    offsets.append(len(merged_starts))
+    return members, offsets, merged_starts, merged_ends
+
+
+def merge_columns_numpy(member_ids: Sequence[int], starts: Sequence[int], ends: Sequence[int]) -> Columns:
+    """Same as merge_columns, vectorized."""
+    member_ids, starts, ends = (np.asarray(c, dtype="l") for c in (member_ids, starts, ends))
+    if not len(member_ids):
+        return array("l"), array("l", [0]), array("l"), array("l")
+
+    order = np.lexsort((starts, member_ids))
+    member_ids, starts, ends = member_ids[order], starts[order], ends[order]
+
+    new_member = np.ones(len(member_ids), dtype=bool)
+    new_member[1:] = member_ids[1:] != member_ids[:-1]
+
+    # Move the days of each member to a range of its own, so the running max of the ends stays within the member.
+    base = starts.min()
+    width = ends.max() - base + 2
+    shift = (np.cumsum(new_member) - 1) * width - base
+    reach = np.maximum.accumulate(ends + shift)
+
+    new_interval = np.ones(len(member_ids), dtype=bool)
+    new_interval[1:] = starts[1:] + shift[1:] > reach[:-1] + 1
+    first = np.flatnonzero(new_interval)
+
+    member_first = np.flatnonzero(new_member[first])
+    return (
+        to_array(member_ids[first][member_first]),
+        to_array(np.append(member_first, len(first))),
+        to_array(starts[first]),
+        to_array(np.maximum.reduceat(ends, first)),
+    )
+
+
+def to_array(values) -> array:
+    result = array("l")
+    result.frombytes(np.ascontiguousarray(values, dtype="l").tobytes())
+    return result
+
+
+class SpanTimeline:
+    """Merged spans of one type for a set of members, the intervals of members[i] are at offsets[i] to
+    offsets[i + 1] in starts and ends."""
+
+    def __init__(self, members: array, offsets: array, starts: array, ends: array) -> None:
+        self.members = members
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.index = {member_id: i for i, member_id in enumerate(members)}
+
+    @classmethod
+    def from_columns(cls, member_ids: Sequence[int], starts: Sequence[int], ends: Sequence[int]) -> "SpanTimeline":
+        """From columns of member id and inclusive start and end day ordinals, in any order."""
+        merge = merge_columns_numpy if np is not None else merge_columns
+        return cls(*merge(member_ids, starts, ends))
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[Tuple[int, date, date]]) -> "SpanTimeline":
+        """From (member_id, startdate, enddate) rows in any order."""
+        member_ids, starts, ends = array("l"), array("l"), array("l")
+        for member_id, startdate, enddate in spans:
+            member_ids.append(member_id)
+            starts.append(startdate.toordinal())
+            ends.append(enddate.toordinal())
+        return cls.from_columns(member_ids, starts, ends)
+
+    @classmethod
+    def load(
+        cls,
+        span_type: str,
+        member_ids: MemberIds = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> "SpanTimeline":
+        """Spans of span_type (not deleted) for member_ids, all members if None, optionally only spans overlapping
+        start to end."""
+        query = select(Span.member_id, Span.startdate, Span.enddate).where(
+            Span.type == span_type, Span.deleted_at.is_(None)
+        )
+        if member_ids is not None:
+            query = query.where(Span.member_id.in_(member_ids))
+        if start is not None:
+            query = query.where(Span.enddate >= start)
+        if end is not None:
+            query = query.where(Span.startdate <= end)
+        return cls.from_spans(db_session.execute(query).tuples())
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.index
+
+    def bounds(self, member_id: int) -> Tuple[int, int]:
+        """Range of the intervals of the member in starts and ends."""
+        i = self.index.get(member_id)
+        if i is None:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    @property
+    def member_ids(self) -> List[int]:
+        """Members with any span, sorted."""
+        return list(self.members)
+
+    def intervals(self, member_id: int) -> List[Tuple[date, date]]:
+        """The merged (first day, last day) intervals of a member, sorted."""
+        lo, hi = self.bounds(member_id)
+        return [(date.fromordinal(self.starts[i]), date.fromordinal(self.ends[i])) for i in range(lo, hi)]
+
+    def first_start(self, member_id: int) -> Optional[date]:
+        lo, hi = self.bounds(member_id)
+        return date.fromordinal(self.starts[lo]) if lo < hi else None
+
+    def last_end(self, member_id: int) -> Optional[date]:
+        lo, hi = self.bounds(member_id)
+        return date.fromordinal(self.ends[hi - 1]) if lo < hi else None
+
+    def is_active(self, member_id: int, at_date: date) -> bool:
+        return self.active_at(member_id, (at_date,))[0]
+
+    def active_at(self, member_id: int, dates: Sequence[date]) -> List[bool]:
+        """For each of dates, if the member is covered by a span that day."""
+        lo, hi = self.bounds(member_id)
+        result = []
+        for d in dates:
+            day = d.toordinal()
+            i = bisect_right(self.starts, day, lo, hi) - 1
+            result.append(i >= lo and self.ends[i] >= day)
+        return result
+
+    def active_counts(self, first: date, last: date) -> List[int]:
+        """Number of members covered by a span for each day from first to last (inclusive)."""
+        first_day, last_day = first.toordinal(), last.toordinal()
+        days = last_day - first_day + 1
+
+        if np is not None and self.starts:
+            starts = np.maximum(np.frombuffer(self.starts, dtype="l"), first_day) - first_day
+            ends = np.minimum(np.frombuffer(self.ends, dtype="l"), last_day) - first_day
+            overlapping = starts <= ends
+            changes = np.bincount(starts[overlapping], minlength=days + 1) - np.bincount(
+                ends[overlapping] + 1, minlength=days + 1
+            )
+            return np.cumsum(changes[:days]).tolist()
+
+        changes = [0] * (days + 1)
+        for start, end in zip(self.starts, self.ends):
+            if start <= last_day and end >= first_day:
+                changes[max(start, first_day) - first_day] += 1
+                changes[min(end, last_day) - first_day + 1] -= 1
+        return list(accumulate(changes[:days]))
+
+    def days_covered(self, member_id: int, start: date, end: date) -> int:
+        """Number of days from start to end (inclusive) that the member is covered by a span."""
+        lo, hi = self.bounds(member_id)
+        first, last = start.toordinal(), end.toordinal()
+        days = 0
+        for i in range(bisect_left(self.ends, first, lo, hi), bisect_right(self.starts, last, lo, hi)):
+            days += min(self.ends[i], last) - max(self.starts[i], first) + 1
+        return days
+
+    def days_covered_by_member(self, member_ids: Sequence[int], start: date, end: date) -> List[int]:
+        """Same as days_covered for each of member_ids."""
+        if np is None or not self.starts:
+            return [self.days_covered(member_id, start, end) for member_id in member_ids]
+
+        first, last = start.toordinal(), end.toordinal()
+        lengths = (
+            np.minimum(np.frombuffer(self.ends, dtype="l"), last)
+            - np.maximum(np.frombuffer(self.starts, dtype="l"), first)
+            + 1
+        )
+        days = np.add.reduceat(np.maximum(lengths, 0), np.frombuffer(self.offsets, dtype="l")[:-1]).tolist()
+        return [days[self.index[member_id]] if member_id in self.index else 0 for member_id in member_ids]
+
+    def next_gap(self, member_id: int, at_date: date) -> date:
+        """The first day on or after at_date that the member is not covered by a span."""
+        lo, hi = self.bounds(member_id)
+        day = at_date.toordinal()
+        i = bisect_right(self.starts, day, lo, hi) - 1
+        if i >= lo and self.ends[i] >= day:
+            return date.fromordinal(self.ends[i] + 1)
+        return at_date
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import core
+import membership
+import membership.models
+from membership.membership import add_membership_days, get_membership_summaries, get_membership_summaries_from_spans
+from membership.membership_status import read_membership_status, refresh_membership_status
+from membership.models import Span
+from service.db import db_session
+from sqlalchemy import delete, update
+from test_aid.sql_budget import sql_budget
+from test_aid.test_base import FlaskTestBase
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def assert_status_matches_spans(self, member_ids) -> None:
+        self.assertEqual(
+            get_membership_summaries_from_spans(member_ids, date.today()), get_membership_summaries(member_ids)
+        )
+
+    def test_status_is_refreshed_when_spans_are_added_changed_and_deleted(self) -> None:
+        member = self.db.create_member()
+
+        summary = add_membership_days(member.member_id, Span.LABACCESS, 30, creation_reason="lab")
+        self.assertTrue(summary.labaccess_active)
+        self.assertEqual(date.today() + timedelta(days=30), summary.labaccess_end)
+        self.assertIn(member.member_id, read_membership_status(db_session, [member.member_id]))
+
+        span = self.db.create_span(
+            member=member, type=Span.MEMBERSHIP, startdate=self.date(-10), enddate=self.date(100)
+        )
+        self.assertTrue(get_membership_summaries([member.member_id])[0].membership_active)
+
+        span.enddate = self.date(-1)
+        db_session.commit()
+        self.assertFalse(get_membership_summaries([member.member_id])[0].membership_active)
+        self.assertEqual(self.date(-1), get_membership_summaries([member.member_id])[0].membership_end)
+
+        span.deleted_at = self.datetime()
+        db_session.commit()
+        self.assertIsNone(get_membership_summaries([member.member_id])[0].membership_end)
+
+        self.assert_status_matches_spans([member.member_id])
+
+    def test_bulk_statement_on_spans_refreshes_status(self) -> None:
+        members = [self.db.create_member() for _ in range(3)]
+        for member in members:
+            self.db.create_span(member=member, type=Span.LABACCESS, startdate=self.date(-5), enddate=self.date(5))
+        member_ids = [m.member_id for m in members]
+        self.assertTrue(all(s.labaccess_active for s in get_membership_summaries(member_ids)))
+
+        db_session.execute(
+            update(Span).where(Span.member_id.in_(member_ids)).values(enddate=self.date(-1)),
+            execution_options={"synchronize_session": False},
+        )
+        db_session.commit()
+
+        self.assertFalse(any(s.labaccess_active for s in get_membership_summaries(member_ids)))
+        self.assert_status_matches_spans(member_ids)
+
+    def test_bulk_statement_on_spans_only_refreshes_members_of_changed_spans(self) -> None:
+        changed, moved_to, untouched = [self.db.create_member() for _ in range(3)]
+        span = self.db.create_span(member=changed, type=Span.LABACCESS, startdate=self.date(-5), enddate=self.date(5))
+        self.db.create_span(member=untouched, type=Span.LABACCESS, startdate=self.date(-5), enddate=self.date(5))
+        member_ids = [changed.member_id, moved_to.member_id, untouched.member_id]
+        # As if refreshed yesterday, so it can be seen which rows are refreshed.
+        refresh_membership_status(db_session.connection(), member_ids, at_date=self.date(-1))
+
+        def status_dates():
+            return {m: row.status_date for m, row in read_membership_status(db_session, member_ids).items()}
+
+        db_session.execute(
+            update(Span).where(Span.member_id == changed.member_id).values(enddate=self.date(-1)),
+            execution_options={"synchronize_session": False},
+        )
+        self.assertEqual({changed.member_id: self.date(0), untouched.member_id: self.date(-1)}, status_dates())
+
+        db_session.execute(update(Span), [{"span_id": span.span_id, "member_id": moved_to.member_id}])
+        self.assertEqual({moved_to.member_id: self.date(0), untouched.member_id: self.date(-1)}, status_dates())
+        self.assert_status_matches_spans(member_ids[:2])
+
+        # Without a where clause all members are refreshed.
+        db_session.execute(delete(Span), execution_options={"synchronize_session": False})
+        self.assertEqual({}, status_dates())
+
+    def test_status_from_another_date_is_not_used(self) -> None:
+        member = self.db.create_member()
+        self.db.create_span(member=member, type=Span.LABACCESS, startdate=self.date(1), enddate=self.date(10))
+
+        # As if nothing was refreshed since yesterday, when the span had not started.
+        refresh_membership_status(db_session.connection(), at_date=self.date(-1))
+        self.assertFalse(read_membership_status(db_session)[member.member_id].labaccess_active)
+
+        self.assertFalse(get_membership_summaries([member.member_id])[0].labaccess_active)
+        self.assertTrue(get_membership_summaries([member.member_id], self.date(1))[0].labaccess_active)
+
+        refresh_membership_status(db_session.connection(), at_date=self.date(1))
+        self.assertFalse(get_membership_summaries([member.member_id])[0].labaccess_active)
+        self.assert_status_matches_spans([member.member_id])
+
+    def test_members_without_spans_have_no_membership(self) -> None:
+        member = self.db.create_member()
+
+        (summary,) = get_membership_summaries([member.member_id])
+
+        self.assertFalse(summary.membership_active or summary.effective_labaccess_active)
+        self.assertIsNone(summary.membership_end)
+
+    def test_summaries_for_many_members_are_read_with_one_query(self) -> None:
+        members = [self.db.create_member() for _ in range(10)]
+        for i, member in enumerate(members):
+            for span_type in (Span.MEMBERSHIP, Span.LABACCESS, Span.SPECIAL_LABACESS)[: i % 4]:
+                self.db.create_span(member=member, type=span_type)
+        member_ids = [m.member_id for m in members]
+
+        with sql_budget(max_queries=1):
+            get_membership_summaries(member_ids)
+
+        self.assert_status_matches_spans(member_ids)
+        # Only members with spans have a status row.
+        self.assertEqual(
+            len([m for i, m in enumerate(members) if i % 4]), len(read_membership_status(db_session, member_ids))
+        )
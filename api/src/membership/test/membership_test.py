@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
 from datetime import datetime as dt
+from math import ceil
 from typing import Any, Dict, List, Optional, Set, Tuple, TypeVar
 
 import core
@@ -12,8 +13,11 @@ import messages
 import messages.models
 import shop
 import shop.models
-from membership.membership import get_membership_summaries
+from membership.membership import get_membership_summaries, get_membership_summaries_by_member
 from membership.models import Member, Span
+from service.db import db_session
+from sqlalchemy import select
+from test_aid.sql_budget import sql_budget
 from test_aid.test_base import FlaskTestBase, ShopTestMixin
 
 
@@ -100,3 +104,72 @@ class MembershipTest(ShopTestMixin, FlaskTestBase):
 
         self.assertTrue(summary.effective_labaccess_active)
         self.assertEqual(summary.effective_labaccess_end, lab_access_end_date)
+
+    def test_get_membership_summaries_uses_same_number_of_queries_for_any_number_of_members(self):
+        members = [self.db.create_member() for _ in range(5)]
+        for member in members:
+            self.db.create_span(member=member, type=Span.MEMBERSHIP)
+
+        member_ids = [m.member_id for m in members]
+
+        with sql_budget(max_queries=6):
+            get_membership_summaries(member_ids)
+
+    def test_get_membership_summaries_from_spans_is_one_query_for_any_subset(self):
+        fixed_now = date(2024, 10, 1)
+        members = [self.db.create_member() for _ in range(6)]
+        for i, member in enumerate(members):
+            self.db.create_span(
+                member=member, type=Span.LABACCESS, startdate=fixed_now - timedelta(days=i), enddate=fixed_now
+            )
+            self.db.create_span(
+                member=member,
+                type=Span.MEMBERSHIP,
+                startdate=fixed_now + timedelta(days=1),
+                enddate=fixed_now + timedelta(days=i + 1),
+            )
+
+        subset = [m.member_id for m in members[1::2]]
+        with sql_budget(max_queries=1):
+            summaries = get_membership_summaries(subset, fixed_now)
+
+        self.assertEqual(len(subset), len(summaries))
+        for i, summary in zip(range(1, 6, 2), summaries):
+            self.assertTrue(summary.labaccess_active)
+            self.assertEqual(fixed_now, summary.labaccess_end)
+            self.assertFalse(summary.membership_active)
+            self.assertEqual(fixed_now + timedelta(days=i + 1), summary.membership_end)
+
+    def test_get_membership_summaries_by_member_accepts_select_of_member_ids(self):
+        member = self.db.create_member(firstname="Subquery")
+        self.db.create_span(member=member, type=Span.MEMBERSHIP, startdate=self.date(-1), enddate=self.date(1))
+        self.db.create_member(firstname="Subquery")
+
+        member_ids = select(Member.member_id).where(Member.firstname == "Subquery")
+        for at_date in (None, self.date(-2)):
+            with sql_budget(max_queries=1):
+                summaries = get_membership_summaries_by_member(member_ids, at_date)
+            self.assertEqual([member.member_id], list(summaries))
+            self.assertEqual(at_date is None, summaries[member.member_id].membership_active)
+
+    def test_member_export_queries_per_chunk_not_per_member(self):
+        for _ in range(5):
+            self.db.create_member()
+        chunks = ceil(db_session.query(Member).filter(Member.deleted_at.is_(None)).count() / 2)
+
+        # One query for members and six for summaries per chunk, and one for the empty last chunk.
+        with sql_budget(max_queries=chunks * 7 + 1, max_repeats=None):
+            for _ in membership.views.member_export_chunks(chunk_size=2):
+                pass
+
+    def test_sql_budget_reports_repeated_statements_with_call_site(self):
+        member_ids = [self.db.create_member().member_id for _ in range(4)]
+        db_session.expire_all()
+
+        with self.assertRaises(AssertionError) as context:
+            with sql_budget():
+                for member_id in member_ids:
+                    db_session.get(Member, member_id)
+
+        self.assertIn("possible N+1, statement executed 4 times", str(context.exception))
+        self.assertIn("membership_test.py", str(context.exception))
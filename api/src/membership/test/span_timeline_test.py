@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from random import randint, seed
+from unittest.mock import patch
+
+import core
+import membership
+import membership.models
+from membership import span_timeline
+from membership.models import Member, Span
+from membership.span_timeline import SpanTimeline, merge_columns, merge_columns_numpy
+from sqlalchemy import select
+from test_aid.test_base import FlaskTestBase
+
+
+def d(day: int) -> date:
+    return date(2024, 1, 1) + timedelta(days=day)
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def test_overlapping_and_adjacent_spans_are_merged(self) -> None:
+        timeline = SpanTimeline.from_spans(
+            [(1, d(20), d(29)), (1, d(0), d(9)), (1, d(5), d(14)), (1, d(15), d(16)), (2, d(0), d(0))]
+        )
+
+        self.assertEqual([(d(0), d(16)), (d(20), d(29))], timeline.intervals(1))
+        self.assertEqual([(d(0), d(0))], timeline.intervals(2))
+        self.assertEqual([], timeline.intervals(3))
+        self.assertEqual([1, 2], timeline.member_ids)
+        self.assertEqual(d(0), timeline.first_start(1))
+        self.assertEqual(d(29), timeline.last_end(1))
+        self.assertIsNone(timeline.last_end(3))
+
+    def test_active_at_days_covered_and_next_gap(self) -> None:
+        timeline = SpanTimeline.from_spans([(1, d(0), d(9)), (1, d(20), d(29))])
+
+        self.assertEqual(
+            [False, True, True, False, True, True, False],
+            timeline.active_at(1, [d(-1), d(0), d(9), d(10), d(20), d(29), d(30)]),
+        )
+        self.assertEqual([False], timeline.active_at(2, [d(0)]))
+
+        self.assertEqual(20, timeline.days_covered(1, d(-100), d(100)))
+        self.assertEqual(6, timeline.days_covered(1, d(5), d(20)))
+        self.assertEqual(0, timeline.days_covered(1, d(10), d(19)))
+        self.assertEqual(1, timeline.days_covered(1, d(29), d(29)))
+        self.assertEqual(0, timeline.days_covered(2, d(0), d(100)))
+
+        self.assertEqual(d(10), timeline.next_gap(1, d(3)))
+        self.assertEqual(d(15), timeline.next_gap(1, d(15)))
+        self.assertEqual(d(30), timeline.next_gap(1, d(29)))
+        self.assertEqual(d(0), timeline.next_gap(2, d(0)))
+
+    def test_load_skips_deleted_spans_and_other_types(self) -> None:
+        member = self.db.create_member()
+        self.db.create_span(type=Span.LABACCESS, startdate=self.date(0), enddate=self.date(9))
+        self.db.create_span(type=Span.LABACCESS, startdate=self.date(10), enddate=self.date(19))
+        self.db.create_span(type=Span.MEMBERSHIP, startdate=self.date(0), enddate=self.date(99))
+        self.db.create_span(
+            type=Span.LABACCESS, startdate=self.date(50), enddate=self.date(59), deleted_at=self.datetime()
+        )
+        other = self.db.create_member()
+        self.db.create_span(type=Span.LABACCESS, startdate=self.date(0), enddate=self.date(9))
+
+        timeline = SpanTimeline.load(Span.LABACCESS, [member.member_id])
+        self.assertEqual([(self.date(0), self.date(19))], timeline.intervals(member.member_id))
+        self.assertNotIn(other.member_id, timeline)
+
+        timeline = SpanTimeline.load(Span.LABACCESS, select(Member.member_id), start=self.date(15), end=self.date(30))
+        self.assertEqual([(self.date(10), self.date(19))], timeline.intervals(member.member_id))
+        self.assertNotIn(other.member_id, timeline)
+
+    def test_numpy_gives_same_results_as_python(self) -> None:
+        seed(1)
+        columns = ([], [], [])
+        for member_id in range(200):
+            for _ in range(randint(0, 6)):
+                start = randint(-400, 400)
+                for column, value in zip(columns, (randint(1, 200), start, start + randint(0, 100))):
+                    column.append(value)
+
+        self.assertEqual(merge_columns(*columns), merge_columns_numpy(*columns))
+        self.assertEqual(merge_columns([], [], []), merge_columns_numpy([], [], []))
+
+        timeline = SpanTimeline(*merge_columns(*columns))
+        member_ids = list(range(-1, 202))
+        for first, last in ((d(-500), d(500)), (d(-10), d(20)), (d(0), d(0)), (d(600), d(700))):
+            with self.subTest(first=first, last=last):
+                counts = timeline.active_counts(first, last)
+                days = timeline.days_covered_by_member(member_ids, first, last)
+                with patch.object(span_timeline, "np", None):
+                    self.assertEqual(timeline.active_counts(first, last), counts)
+                    self.assertEqual(timeline.days_covered_by_member(member_ids, first, last), days)
@@ -1,3 +1,8 @@
+import csv
+from dataclasses import fields
+from io import StringIO
+
+from flask import Response, json, stream_with_context
 from service.api_definition import (
     GET,
     GROUP_CREATE,
@@ -24,15 +29,17 @@ from service.api_definition import (
     natural1,
     non_empty_str,
 )
+from service.db import db_session
 from service.entity import ASC, Entity, ExpandField, OrmManyRelation, OrmSingeRelation, not_empty
 
 from membership import service
-from membership.member_auth import get_member_permissions
+from membership.member_auth import get_group_member_ids, get_member_permissions, invalidate_member_permissions
 from membership.member_entity import MemberEntity
 from membership.membership import (
+    MembershipData,
     add_membership_days,
     get_access_summary,
-    get_members_and_membership,
+    get_membership_summaries,
     get_membership_summary,
 )
 from membership.models import (
@@ -47,6 +54,27 @@ from membership.models import (
     member_group,
 )
 
+
+class PermissionChangingRelation(OrmManyRelation):
+    """Many to many relation where add and remove changes member permissions, invalidates the permissions of the
+    affected members."""
+
+    def __init__(self, *args, affected_member_ids=None, **kwargs):
+        """
+        :param affected_member_ids function from (entity_ids, related_entity_id) to member ids with changed permissions
+        """
+        super().__init__(*args, **kwargs)
+        self.affected_member_ids = affected_member_ids
+
+    def add(self, entity_ids, related_entity_id):
+        super().add(entity_ids, related_entity_id)
+        invalidate_member_permissions(self.affected_member_ids(entity_ids, related_entity_id))
+
+    def remove(self, entity_ids, related_entity_id):
+        super().remove(entity_ids, related_entity_id)
+        invalidate_member_permissions(self.affected_member_ids(entity_ids, related_entity_id))
+
+
 member_entity = MemberEntity(
     Member,
     validation=dict(email=not_empty, firstname=not_empty),
@@ -110,7 +138,14 @@ service.entity_routes(
 service.related_entity_routes(
     path="/member/<int:related_entity_id>/groups",
     entity=group_entity,
-    relation=OrmManyRelation("groups", Group.members, member_group, "group_id", "member_id"),
+    relation=PermissionChangingRelation(
+        "groups",
+        Group.members,
+        member_group,
+        "group_id",
+        "member_id",
+        affected_member_ids=lambda group_ids, member_id: [member_id],
+    ),
     permission_list=GROUP_MEMBER_VIEW,
     permission_add=GROUP_MEMBER_ADD,
     permission_remove=GROUP_MEMBER_REMOVE,
@@ -211,21 +246,93 @@ def member_get_slack_info(entity_id=None):
     }
 
 
+EXPORT_CHUNK_SIZE = 500
+
+
+def member_export_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of at most chunk_size members as json objects with membership included. Each chunk is read with
+    a seek on member_id and gets its own membership summaries, so memory use does not grow with the number of
+    members."""
+    keys = list(member_entity.cols_to_obj)
+    to_obj = member_entity.row_converter(keys, [member_entity.cols_to_obj[k] for k in keys])
+    columns = [getattr(Member, k) for k in keys]
+    member_id_index = keys.index("member_id")
+
+    last_member_id = 0
+    while True:
+        rows = (
+            db_session.query(*columns)
+            .filter(Member.deleted_at.is_(None), Member.member_id > last_member_id)
+            .order_by(Member.member_id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return
+
+        memberships = get_membership_summaries([row[member_id_index] for row in rows])
+        chunk = []
+        for row, membership in zip(rows, memberships):
+            obj = to_obj(row)
+            obj["membership"] = membership.as_json()
+            chunk.append(obj)
+        yield chunk
+
+        last_member_id = rows[-1][member_id_index]
+
+
+def export_json(chunks):
+    """Same body as a regular route response, written one chunk at a time."""
+    yield '{"status": "ok", "data": ['
+    separator = ""
+    for chunk in chunks:
+        yield separator + ",".join(json.dumps(obj) for obj in chunk)
+        separator = ","
+    yield "]}"
+
+
+def export_ndjson(chunks):
+    for chunk in chunks:
+        yield "".join(json.dumps(obj) + "\n" for obj in chunk)
+
+
+def export_csv(chunks):
+    """One row per member, membership fields as separate columns."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(member_entity.cols_to_obj) + [f.name for f in fields(MembershipData)])
+    for chunk in chunks:
+        for obj in chunk:
+            membership = obj.pop("membership")
+            writer.writerow(list(obj.values()) + list(membership.values()))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORT_FORMATS = {
+    "json": (export_json, "application/json"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, "text/csv"),
+}
+
+
 @service.route("/member/all_with_membership", method=GET, permission=MEMBER_VIEW)
-def all_with_membership(entity_id=None):
+def all_with_membership(format=Arg(Enum(*EXPORT_FORMATS), required=False)):
     """
     Used for the CSV export feature in MakerAdmin.
     While technically the frontend could reuqest a list of all members and then query individually if they are members or not,
     that would be several thousand API requests which seems kinda unnecessary.
     It also avoids the need to deal with pagination in the frontend for this operation.
+
+    The response is streamed, json (default) has the same body as other routes, ndjson has one member per line and
+    csv one member per row.
     """
-    members, memberships = get_members_and_membership()
-    dict_members = []
-    for member, membership in zip(members, memberships):
-        obj = member_entity.to_obj(member)
-        obj["membership"] = membership.as_json()
-        dict_members.append(obj)
-    return dict_members
+    export, mimetype = EXPORT_FORMATS[format or "json"]
+    response = Response(stream_with_context(export(member_export_chunks())), mimetype=mimetype)
+    if format == "csv":
+        response.headers["Content-Disposition"] = "attachment; filename=members.csv"
+    return response
 
 
 service.entity_routes(
@@ -241,7 +348,14 @@ service.entity_routes(
 service.related_entity_routes(
     path="/group/<int:related_entity_id>/members",
     entity=member_entity,
-    relation=OrmManyRelation("members", Member.groups, member_group, "member_id", "group_id"),
+    relation=PermissionChangingRelation(
+        "members",
+        Member.groups,
+        member_group,
+        "member_id",
+        "group_id",
+        affected_member_ids=lambda member_ids, group_id: member_ids,
+    ),
     permission_list=GROUP_MEMBER_VIEW,
     permission_add=GROUP_MEMBER_ADD,
     permission_remove=GROUP_MEMBER_REMOVE,
@@ -250,7 +364,14 @@ service.related_entity_routes(
 service.related_entity_routes(
     path="/group/<int:related_entity_id>/permissions",
     entity=permission_entity,
-    relation=OrmManyRelation("permissions", Permission.groups, group_permission, "permission_id", "group_id"),
+    relation=PermissionChangingRelation(
+        "permissions",
+        Permission.groups,
+        group_permission,
+        "permission_id",
+        "group_id",
+        affected_member_ids=lambda permission_ids, group_id: get_group_member_ids(group_id),
+    ),
     permission_list=PERMISSION_VIEW,
     permission_add=PERMISSION_MANAGE,
     permission_remove=PERMISSION_MANAGE,
@@ -284,6 +405,7 @@ service.entity_routes(
     permission_create=SPAN_MANAGE,
     permission_update=SPAN_MANAGE,
     permission_delete=SPAN_MANAGE,
+    bulk=True,
 )
 
 
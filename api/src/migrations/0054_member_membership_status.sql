@@ -0,0 +1,13 @@
+-- Membership status per member derived from membership_spans, maintained by the api on span changes and filled by
+-- init_db.py on every start.
+CREATE TABLE `member_membership_status` (
+    `member_id` int(10) unsigned NOT NULL,
+    `membership_end` date DEFAULT NULL,
+    `membership_active` tinyint(1) NOT NULL,
+    `labaccess_end` date DEFAULT NULL,
+    `labaccess_active` tinyint(1) NOT NULL,
+    `special_labaccess_end` date DEFAULT NULL,
+    `special_labaccess_active` tinyint(1) NOT NULL,
+    `status_date` date NOT NULL,
+    PRIMARY KEY (`member_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
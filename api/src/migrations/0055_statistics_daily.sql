@@ -0,0 +1,8 @@
+-- Public statistics precomputed per day, appended to by accessy_syncer.
+CREATE TABLE `statistics_daily` (
+    `metric` varchar(32) NOT NULL,
+    `day` date NOT NULL,
+    `value` int(11) DEFAULT NULL,
+    `data` mediumtext DEFAULT NULL,
+    PRIMARY KEY (`metric`, `day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
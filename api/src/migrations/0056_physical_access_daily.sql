@@ -0,0 +1,21 @@
+-- Doors seen in the physical access log, numbered for the doors bitmap in physical_access_daily.
+CREATE TABLE `physical_access_door` (
+    `id` int(11) unsigned NOT NULL AUTO_INCREMENT,
+    `accessy_asset_publication_id` varchar(255) COLLATE utf8mb4_0900_ai_ci NOT NULL,
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `accessy_asset_publication_id_key` (`accessy_asset_publication_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- The physical access log rolled up per member and day, updated for each access and backfilled by accessy_syncer.
+CREATE TABLE `physical_access_daily` (
+    `member_id` int unsigned NOT NULL,
+    `day` date NOT NULL,
+    `first_at` datetime NOT NULL,
+    `last_at` datetime NOT NULL,
+    `entries` int(11) NOT NULL,
+    `doors_bitmap` bigint NOT NULL, -- Bit id - 1 is set for each physical_access_door used that day.
+    `hours_bitmap` int(11) NOT NULL, -- Bit h is set if there was an access in hour h (of invoked_at).
+    PRIMARY KEY (`member_id`, `day`),
+    KEY `day_key` (`day`),
+    CONSTRAINT `physical_access_daily_member_constraint` FOREIGN KEY (`member_id`) REFERENCES `membership_members` (`member_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
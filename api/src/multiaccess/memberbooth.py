@@ -4,7 +4,7 @@ from urllib.parse import urlparse, urlunparse
 
 import serde
 from dataclasses_json import DataClassJsonMixin
-from membership.member_auth import get_member_permissions, verify_password
+from membership.member_auth import get_member_permission_names, verify_password
 from membership.membership import MembershipData, get_membership_summary
 from membership.models import Key, Member
 from serde import InternalTagging
@@ -75,7 +75,7 @@ def tag_to_memberinfo(tagid: str) -> MemberboothMemberInfo | None:
 
     membership_data = get_membership_summary(key.member_id)
 
-    permissions = [p[1] for p in get_member_permissions(key.member_id)]
+    permissions = get_member_permission_names(key.member_id)
     return memberbooth_response_object(key.member, membership_data, permissions)
 
 
@@ -103,7 +103,7 @@ def pin_login_to_memberinfo(member_number: int, pin_code_or_password: str) -> Me
         raise NotFound(f"The member + pin code/password combination does not belong to any known user.")
 
     membership_data = get_membership_summary(member.member_id)
-    permissions = [p[1] for p in get_member_permissions(member.member_id)]
+    permissions = get_member_permission_names(member.member_id)
     return memberbooth_response_object(member, membership_data, permissions)
 
 
@@ -114,7 +114,7 @@ def member_number_to_memberinfo(member_number: int) -> MemberboothMemberInfo | N
         return None
 
     membership_data = get_membership_summary(member.member_id)
-    permissions = [p[1] for p in get_member_permissions(member.member_id)]
+    permissions = get_member_permission_names(member.member_id)
     return memberbooth_response_object(member, membership_data, permissions)
 
 
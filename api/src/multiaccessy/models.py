@@ -1,7 +1,20 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from membership.models import Base, Member
-from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Integer, Numeric, String, Text, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    func,
+)
 from sqlalchemy.orm import Mapped, configure_mappers, declarative_base, mapped_column, relationship
 
 
@@ -15,3 +28,26 @@ class PhysicalAccessEntry(Base):
     accessy_asset_publication_id: Mapped[str] = mapped_column(Text, nullable=False)
     invoked_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class PhysicalAccessDoor(Base):
+    """Doors seen in the physical access log, bit id - 1 in PhysicalAccessDaily.doors_bitmap."""
+
+    __tablename__ = "physical_access_door"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    accessy_asset_publication_id: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+
+
+class PhysicalAccessDaily(Base):
+    """The physical access log rolled up per member and day, see multiaccessy/physical_access_daily.py."""
+
+    __tablename__ = "physical_access_daily"
+
+    member_id: Mapped[int] = mapped_column(Integer, ForeignKey(Member.member_id), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    first_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    entries: Mapped[int] = mapped_column(Integer, nullable=False)
+    doors_bitmap: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    hours_bitmap: Mapped[int] = mapped_column(Integer, nullable=False)
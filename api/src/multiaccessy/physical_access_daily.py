@@ -0,0 +1,159 @@
+"""The physical access log rolled up per member and day in physical_access_daily, so that the activity statistics count
+rows per member and day instead of scanning every door opening.
+
+record_access updates the row of the day for each entry added by the accessy webhook. update_physical_access_daily
+computes the rows again from the log, run by accessy_syncer every day for the last REBUILD_DAYS (fixing any update that
+failed), for all days if the rollup starts later than the log (the first run), and for all days as a command.
+"""
+
+from datetime import date, datetime, timedelta
+from logging import getLogger
+from typing import Dict, Optional, Tuple
+
+from service.db import db_session, insert_or_update
+from sqlalchemy import case, delete, func, insert, select
+
+from multiaccessy.models import PhysicalAccessDaily, PhysicalAccessDoor, PhysicalAccessEntry
+
+logger = getLogger("makeradmin")
+
+REBUILD_DAYS = 7
+
+# Days of the log read at a time when rebuilding.
+REBUILD_CHUNK_DAYS = 31
+
+# doors_bitmap is a signed 64 bit integer.
+MAX_DOORS = 63
+
+
+def bit_of_door(door_id: int) -> int:
+    return 1 << (door_id - 1) if door_id <= MAX_DOORS else 0
+
+
+def door_bit(publication_id: str, door_bits: Optional[Dict[str, int]] = None) -> int:
+    """The bit of the door in doors_bitmap, added to physical_access_door if new, 0 if there are too many doors."""
+    if door_bits is not None and publication_id in door_bits:
+        return door_bits[publication_id]
+
+    query = select(PhysicalAccessDoor.id).where(PhysicalAccessDoor.accessy_asset_publication_id == publication_id)
+    door_id = db_session.scalar(query)
+    if door_id is None:
+        # An upsert, another request may add the same door at the same time.
+        table = PhysicalAccessDoor.__table__
+        db_session.execute(
+            insert_or_update(
+                db_session.connection().dialect.name,
+                table,
+                [table.c.accessy_asset_publication_id],
+                lambda inserted: dict(accessy_asset_publication_id=inserted.accessy_asset_publication_id),
+                values=dict(accessy_asset_publication_id=publication_id),
+            )
+        )
+        door_id = db_session.scalar(query)
+
+    bit = bit_of_door(door_id)
+    if not bit:
+        logger.warning(f"door {publication_id} does not fit in the doors bitmap of physical_access_daily")
+
+    if door_bits is not None:
+        door_bits[publication_id] = bit
+    return bit
+
+
+def record_access(member_id: int, publication_id: str, invoked_at: datetime) -> None:
+    """Add an entry of the physical access log to the row of its day."""
+    doors = door_bit(publication_id)
+    hour = 1 << invoked_at.hour
+    table = PhysicalAccessDaily.__table__
+    # An upsert, two entries of the same member and day may be recorded at the same time.
+    db_session.execute(
+        insert_or_update(
+            db_session.connection().dialect.name,
+            table,
+            [table.c.member_id, table.c.day],
+            lambda inserted: dict(
+                first_at=case((table.c.first_at > inserted.first_at, inserted.first_at), else_=table.c.first_at),
+                last_at=case((table.c.last_at < inserted.last_at, inserted.last_at), else_=table.c.last_at),
+                entries=table.c.entries + 1,
+                doors_bitmap=table.c.doors_bitmap.op("|")(inserted.doors_bitmap),
+                hours_bitmap=table.c.hours_bitmap.op("|")(inserted.hours_bitmap),
+            ),
+            values=dict(
+                member_id=member_id,
+                day=invoked_at.date(),
+                first_at=invoked_at,
+                last_at=invoked_at,
+                entries=1,
+                doors_bitmap=doors,
+                hours_bitmap=hour,
+            ),
+        )
+    )
+
+
+def rebuild_physical_access_daily(first: date, last: date) -> None:
+    """Compute the rows from first to last (inclusive) from the physical access log."""
+    db_session.execute(
+        delete(PhysicalAccessDaily).where(PhysicalAccessDaily.day >= first, PhysicalAccessDaily.day <= last)
+    )
+
+    door_bits: Dict[str, int] = {}
+    chunk_start = first
+    while chunk_start <= last:
+        chunk_end = min(chunk_start + timedelta(days=REBUILD_CHUNK_DAYS), last + timedelta(days=1))
+        entries = db_session.execute(
+            select(
+                PhysicalAccessEntry.member_id,
+                PhysicalAccessEntry.accessy_asset_publication_id,
+                PhysicalAccessEntry.invoked_at,
+            ).where(
+                PhysicalAccessEntry.member_id.isnot(None),
+                PhysicalAccessEntry.invoked_at >= chunk_start,
+                PhysicalAccessEntry.invoked_at < chunk_end,
+            )
+        ).all()
+
+        rows: Dict[Tuple[int, date], Dict] = {}
+        for member_id, publication_id, invoked_at in entries:
+            doors = door_bit(publication_id, door_bits)
+            hour = 1 << invoked_at.hour
+            row = rows.get((member_id, invoked_at.date()))
+            if row is None:
+                rows[(member_id, invoked_at.date())] = dict(
+                    member_id=member_id,
+                    day=invoked_at.date(),
+                    first_at=invoked_at,
+                    last_at=invoked_at,
+                    entries=1,
+                    doors_bitmap=doors,
+                    hours_bitmap=hour,
+                )
+            else:
+                row["first_at"] = min(row["first_at"], invoked_at)
+                row["last_at"] = max(row["last_at"], invoked_at)
+                row["entries"] += 1
+                row["doors_bitmap"] |= doors
+                row["hours_bitmap"] |= hour
+
+        if rows:
+            db_session.execute(insert(PhysicalAccessDaily), list(rows.values()))
+        chunk_start = chunk_end
+
+
+def update_physical_access_daily(today: Optional[date] = None, rebuild_all: bool = False) -> None:
+    """Rebuild the last REBUILD_DAYS up to and including today, or all days if rebuild_all or the rollup starts later
+    than the log."""
+    if today is None:
+        today = date.today()
+
+    first_entry = db_session.scalar(
+        select(func.min(PhysicalAccessEntry.invoked_at)).where(PhysicalAccessEntry.member_id.isnot(None))
+    )
+    if first_entry is None:
+        return
+
+    first = today - timedelta(days=REBUILD_DAYS)
+    first_rolled_up = db_session.scalar(select(func.min(PhysicalAccessDaily.day)))
+    if rebuild_all or first_rolled_up is None or first_rolled_up > first_entry.date():
+        first = first_entry.date()
+    rebuild_physical_access_daily(first, today)
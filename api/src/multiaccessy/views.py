@@ -13,6 +13,7 @@ from service.error import UnprocessableEntity
 
 from multiaccessy import service
 from multiaccessy.models import PhysicalAccessEntry
+from multiaccessy.physical_access_daily import record_access
 
 from . import sync as syncer
 from .accessy import (
@@ -215,16 +216,27 @@ def handle_event(event: AccessyWebhookEvent) -> None:
         if member_id is None:
             logger.warning(f"Accessy user could not be associated with a makerspace member: {event.userId}")
 
+        invoked_at = parse_accessy_date(event.invokedAt)
         db_session.add(
             PhysicalAccessEntry(
                 member_id=member_id,
                 accessy_user_id=event.userId,
                 accessy_asset_operation_id=event.assetOperationId,
                 accessy_asset_publication_id=event.assetPublicationId,
-                invoked_at=parse_accessy_date(event.invokedAt),
+                invoked_at=invoked_at,
             )
         )
         db_session.commit()
+
+        # Committed separately so the entry is kept if this fails, the daily rebuild will include it.
+        if member_id is not None:
+            try:
+                record_access(member_id, event.assetPublicationId, invoked_at)
+                db_session.commit()
+            except Exception as e:
+                db_session.rollback()
+                logger.exception(f"failed to update physical_access_daily: {e}")
+
         deferred_delegate()
 
         # Check if member has any pending quiz completion messages to send
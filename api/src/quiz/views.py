@@ -526,12 +526,12 @@ class QuizMemberStat:
     ever_completed: bool = False
 
 
-@service.route("/member/<int:member_id>/statistics", method=GET, permission=MEMBER_VIEW)
+@service.route("/member/<int:member_id>/statistics", method=GET, permission=MEMBER_VIEW, read_only=True)
 def member_quiz_statistics_route(member_id: int):
     return [stat.to_dict() for stat in member_quiz_statistics(member_id)]
 
 
-@service.route("/unfinished/<int:quiz_id>", method=GET, permission=PUBLIC)
+@service.route("/unfinished/<int:quiz_id>", method=GET, permission=PUBLIC, read_only=True)
 def quiz_member_answer_stats_route(quiz_id: int) -> List[QuizMemberStat]:
     return quiz_member_answer_stats(quiz_id)
 
@@ -591,7 +591,7 @@ def quiz_member_answer_stats(quiz_id: int) -> List[QuizMemberStat]:
     return result
 
 
-@service.route("/quiz/<int:quiz_id>/statistics", method=GET, permission=PUBLIC)
+@service.route("/quiz/<int:quiz_id>/statistics", method=GET, permission=PUBLIC, read_only=True)
 def quiz_statistics(quiz_id: int):
     # How many members have answered the quiz that should have
 
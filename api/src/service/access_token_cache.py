@@ -0,0 +1,260 @@
+"""Cache of validated access tokens, so an authenticated request does not need a db write transaction.
+
+Validated tokens are kept in an in-process LRU with a short TTL, backed by redis so that all gunicorn workers share
+the validation. Sliding expiry and last seen ip/browser are coalesced per token and written to the db in batches by a
+background thread. Every lookup checks a global generation counter in redis and one per token, entries from an older
+generation are ignored by all workers. Changing or deleting a token through the session (service.auth listens for
+it) and changed permissions of a member bump only the generations of the tokens concerned, the global one is bumped
+when all tokens change.
+"""
+
+import atexit
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import sha256
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from redis import RedisError
+from redis_cache import redis_connection
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from service.config import config
+from service.db import call_after_transaction, db_session_factory
+
+logger = getLogger("makeradmin")
+
+GENERATION_KEY = "access_token:generation"
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    user_id: int
+    permissions: Tuple[str, ...]
+    expires: datetime
+    lifetime: int
+
+    def to_json(self) -> str:
+        return json.dumps(
+            dict(
+                user_id=self.user_id,
+                permissions=self.permissions,
+                expires=self.expires.isoformat(),
+                lifetime=self.lifetime,
+            )
+        )
+
+    @staticmethod
+    def from_json(data: bytes) -> "CachedToken":
+        obj = json.loads(data)
+        return CachedToken(
+            user_id=obj["user_id"],
+            permissions=tuple(obj["permissions"]),
+            expires=datetime.fromisoformat(obj["expires"]),
+            lifetime=obj["lifetime"],
+        )
+
+
+class AccessTokenCache:
+    def __init__(self, ttl: int, max_size: int = 4096, flush_interval: float = 10.0) -> None:
+        """
+        :param ttl seconds a validated token is trusted without looking in the db, 0 disables the cache
+        :param max_size max number of tokens in the in-process LRU
+        :param flush_interval seconds between batched writes of last seen data to the db
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+
+        self._lock = Lock()
+        self._local: OrderedDict[str, Tuple[float, str, CachedToken]] = OrderedDict()
+        self._pending: Dict[str, Tuple[str, str, datetime]] = {}
+        self._flush_event = Event()
+        self._flusher_pid: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def _redis_key(token: str) -> str:
+        return "access_token:" + sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _generation_key(token: str) -> str:
+        return "access_token:generation:" + sha256(token.encode()).hexdigest()
+
+    def generation(self, token: str) -> Optional[str]:
+        """Current cache generation of token (global and of the token), None if the cache is disabled or
+        unavailable."""
+        if not self.enabled:
+            return None
+        try:
+            generations = redis_connection.mget(GENERATION_KEY, self._generation_key(token))
+        except RedisError as e:
+            logger.warning(f"access token cache unavailable, falling back to db: {e}")
+            return None
+        return ".".join((value or b"0").decode() for value in generations)
+
+    def get(self, token: str) -> Optional[CachedToken]:
+        """Return cached token if it is valid for the current generation, None on cache miss."""
+        generation = self.generation(token)
+        if generation is None:
+            return None
+
+        now = monotonic()
+        try:
+            with self._lock:
+                entry = self._local.get(token)
+                if entry is not None:
+                    cached_at, cached_generation, cached = entry
+                    if cached_generation == generation and now - cached_at < self.ttl:
+                        self._local.move_to_end(token)
+                        return cached
+                    del self._local[token]
+
+            data = redis_connection.get(self._redis_key(token))
+            if data is None:
+                return None
+            stored_generation, _, payload = data.partition(b":")
+            if stored_generation.decode() != generation:
+                return None
+            cached = CachedToken.from_json(payload)
+
+        except RedisError as e:
+            logger.warning(f"access token cache unavailable, falling back to db: {e}")
+            return None
+
+        self._put_local(token, now, generation, cached)
+        return cached
+
+    def put(self, token: str, generation: Optional[str], cached: CachedToken) -> None:
+        """Store a token validated against the db. Generation should be read before the token was read from the db,
+        that way a revocation that happens in between will make the entry stale."""
+        if generation is None:
+            return
+
+        try:
+            redis_connection.set(self._redis_key(token), f"{generation}:{cached.to_json()}", ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"failed to store access token in cache: {e}")
+            return
+
+        self._put_local(token, monotonic(), generation, cached)
+
+    def _put_local(self, token: str, now: float, generation: str, cached: CachedToken) -> None:
+        with self._lock:
+            self._local[token] = (now, generation, cached)
+            self._local.move_to_end(token)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def touch(self, token: str, ip: str, browser: str, expires: datetime) -> None:
+        """Register last seen data and sliding expiry for token, it will be written to the db in the next batch."""
+        with self._lock:
+            self._pending[token] = (ip, browser, expires)
+            entry = self._local.get(token)
+            if entry is not None:
+                cached_at, generation, cached = entry
+                self._local[token] = (
+                    cached_at,
+                    generation,
+                    CachedToken(cached.user_id, cached.permissions, expires, cached.lifetime),
+                )
+
+        self._ensure_flusher()
+
+    def invalidate_all(self) -> None:
+        """Make all cached tokens in all workers stale."""
+        try:
+            redis_connection.incr(GENERATION_KEY)
+        except RedisError as e:
+            logger.error(f"failed to invalidate access token cache: {e}")
+
+        with self._lock:
+            self._local.clear()
+
+    def invalidate(self, *tokens: str) -> None:
+        """Make tokens stale in all workers, other cached tokens are kept."""
+        if not tokens:
+            return
+
+        try:
+            with redis_connection.pipeline() as pipe:
+                for token in tokens:
+                    pipe.delete(self._redis_key(token))
+                    pipe.incr(self._generation_key(token))
+                    # Entries are trusted for at most ttl, after that the generation is not needed.
+                    pipe.expire(self._generation_key(token), max(self.ttl, 1) * 2)
+                pipe.execute()
+        except RedisError as e:
+            logger.error(f"failed to invalidate access tokens in cache: {e}")
+            self.invalidate_all()
+
+        with self._lock:
+            for token in tokens:
+                self._local.pop(token, None)
+
+    def invalidate_after_commit(self, session: Session, *tokens: str) -> None:
+        """Invalidate tokens now and again when the transaction that changes them ends."""
+        self.invalidate(*tokens)
+        call_after_transaction(session, lambda: self.invalidate(*tokens))
+
+    def invalidate_all_after_commit(self, session: Session) -> None:
+        """Invalidate all tokens now and again when the transaction that changes them ends."""
+        self.invalidate_all()
+        call_after_transaction(session, self.invalidate_all)
+
+    def _ensure_flusher(self) -> None:
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            Thread(target=self._flush_loop, name="access-token-flusher", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while not self._flush_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write coalesced last seen data for all touched tokens in one batch."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        session = db_session_factory()
+        try:
+            session.execute(
+                text(
+                    "UPDATE access_tokens SET ip = :ip, browser = :browser,"
+                    "  expires = CASE WHEN expires < :expires THEN :expires ELSE expires END"
+                    "  WHERE access_token = :access_token"
+                ),
+                [
+                    dict(access_token=token, ip=ip, browser=browser, expires=expires)
+                    for token, (ip, browser, expires) in pending.items()
+                ],
+            )
+            session.commit()
+        except Exception:
+            logger.exception(f"failed to write last seen data for {len(pending)} access tokens")
+            session.rollback()
+        finally:
+            session.close()
+
+
+access_token_cache = AccessTokenCache(ttl=int(config.get("ACCESS_TOKEN_CACHE_TTL")))
+
+atexit.register(access_token_cache.flush)
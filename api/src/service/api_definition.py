@@ -41,6 +41,7 @@ WEBSHOP_EDIT = "webshop_edit"
 WEBSHOP_ADMIN = "webshop_admin"
 QUIZ_EDIT = "quiz_edit"
 MEMBERBOOTH = "memberbooth"
+METRICS_VIEW = "metrics_view"
 
 ALL_PERMISSIONS = [
     MEMBER_VIEW,
@@ -67,6 +68,7 @@ ALL_PERMISSIONS = [
     WEBSHOP_ADMIN,
     MEMBERBOOTH,
     QUIZ_EDIT,
+    METRICS_VIEW,
 ]
 
 #
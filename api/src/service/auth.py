@@ -1,14 +1,24 @@
 from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
 
 import membership.member_auth
 from core.models import AccessToken
 from core.service_users import SERVICE_PERMISSIONS
 from flask import g, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session
 
+from service.access_token_cache import CachedToken, access_token_cache
 from service.api_definition import BAD_VALUE, EXPIRED, REQUIRED, USER
 from service.db import db_session
 from service.error import BadRequest, Unauthorized
 
+# Attributes of an access token that a cached validation depends on.
+CACHED_ATTRIBUTES = ("access_token", "user_id", "permissions", "expires", "lifetime")
+
+# Tokens being validated by authenticate_request in a session.
+VALIDATING_TOKENS_KEY = "validating_access_tokens"
+
 
 def authenticate_request() -> None:
     """Update global object with user_id and user permissions using token from request header."""
@@ -34,11 +44,26 @@ def authenticate_request() -> None:
 
     token = authorization[len(bearer) :].strip()
 
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    cached = access_token_cache.get(token)
+    if cached is not None and cached.expires >= now:
+        # Validated recently, last seen data is written in batches in the background instead of in this request.
+        access_token_cache.touch(
+            token, request.remote_addr, request.user_agent.string, now + timedelta(seconds=cached.lifetime)
+        )
+        g.user_id = cached.user_id
+        g.session_token = token
+        g.permissions = list(cached.permissions)
+        return
+
+    # Read generation before the token so that a revocation in between makes the cache entry stale.
+    generation = access_token_cache.generation(token)
+
     access_token = db_session.get(AccessToken, token)
     if not access_token:
         raise Unauthorized("Unauthorized, invalid access token.", fields="bearer", what=BAD_VALUE)
 
-    now = datetime.now(timezone.utc).replace(tzinfo=None)
     if access_token.expires < now:
         db_session.query(AccessToken).filter(AccessToken.expires < now).delete()
         raise Unauthorized("Unauthorized, expired access token.", fields="bearer", what=EXPIRED)
@@ -48,7 +73,7 @@ def authenticate_request() -> None:
             permissions = SERVICE_PERMISSIONS.get(access_token.user_id, [])
 
         elif access_token.user_id > 0:
-            permissions_set = {p for _, p in membership.member_auth.get_member_permissions(access_token.user_id)}
+            permissions_set = set(membership.member_auth.get_member_permission_names(access_token.user_id))
             permissions_set.add(USER)
             permissions = list(permissions_set)
 
@@ -61,11 +86,78 @@ def authenticate_request() -> None:
 
     access_token.ip = request.remote_addr
     access_token.browser = request.user_agent.string
-    access_token.expires = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=access_token.lifetime)
+    access_token.expires = now + timedelta(seconds=access_token.lifetime)
 
     g.user_id = access_token.user_id
     g.session_token = access_token.access_token
     g.permissions = access_token.permissions.split(",")
 
     # Commit token validation to make it stick even if request fails later.
-    db_session.commit()
+    validating = db_session.info.setdefault(VALIDATING_TOKENS_KEY, set())
+    validating.add(token)
+    try:
+        db_session.commit()
+    finally:
+        validating.discard(token)
+
+    access_token_cache.put(
+        token,
+        generation,
+        CachedToken(
+            user_id=g.user_id,
+            permissions=tuple(g.permissions),
+            expires=access_token.expires,
+            lifetime=access_token.lifetime,
+        ),
+    )
+
+
+def changes_cached_validation(session: Session, access_token: AccessToken) -> bool:
+    """If a change of the token makes a cached validation of it wrong, last seen data does not and neither do the
+    changes of authenticate_request, they are what is cached."""
+    if access_token.access_token in session.info.get(VALIDATING_TOKENS_KEY, ()):
+        return False
+    attrs = inspect(access_token).attrs
+    return any(attrs[name].history.has_changes() for name in CACHED_ATTRIBUTES)
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_cached_tokens_after_flush(session: Session, flush_context) -> None:
+    tokens: Set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, AccessToken) and (obj not in session.dirty or changes_cached_validation(session, obj)):
+            tokens.add(obj.access_token)
+            # The token may have been rolled to a new value.
+            tokens.update(inspect(obj).attrs.access_token.history.deleted)
+    tokens.discard(None)
+    if tokens:
+        access_token_cache.invalidate_after_commit(session, *tokens)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def invalidate_cached_tokens_after_bulk_statement(state: ORMExecuteState):
+    if state.is_select or state.bind_mapper is None or not issubclass(state.bind_mapper.class_, AccessToken):
+        return None
+
+    parameters = state.parameters if isinstance(state.parameters, list) else [state.parameters or {}]
+
+    # Find the changed tokens before the statement runs, None if not known.
+    tokens: Optional[Set[str]]
+    if state.is_insert or state.statement.whereclause is None:
+        tokens = {row.get(AccessToken.access_token.key) for row in parameters}
+    elif len(parameters) == 1:
+        tokens = set(
+            state.session.connection().scalars(
+                select(AccessToken.access_token).where(state.statement.whereclause), parameters[0]
+            )
+        )
+    else:
+        tokens = None
+
+    result = state.invoke_statement()
+
+    if tokens is None or None in tokens:
+        access_token_cache.invalidate_all_after_commit(state.session)
+    elif tokens:
+        access_token_cache.invalidate_after_commit(state.session, *tokens)
+    return result
@@ -0,0 +1,21 @@
+from time import perf_counter
+
+from service.logging import logger
+
+
+class BootTimer:
+    """Measures the phases of booting an api worker, to see what makes restarts slow."""
+
+    def __init__(self) -> None:
+        self.started = self.last = perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    def done(self, phase: str) -> None:
+        """Mark phase as done, it is timed from the end of the previous phase."""
+        now = perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def log(self) -> None:
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        logger.info(f"booted in {(self.last - self.started) * 1000:.0f} ms ({phases})")
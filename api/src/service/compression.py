@@ -0,0 +1,102 @@
+"""Compression of json/text responses according to Accept-Encoding.
+
+Responses with a known size are compressed if they are larger than a threshold, streamed responses are always
+compressed chunk by chunk as they are produced. Brotli is used if the client accepts it, otherwise gzip.
+"""
+
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional
+
+import brotli
+from flask import Request, Response
+
+from service.config import config
+
+COMPRESSION_ENABLED = config.get("RESPONSE_COMPRESSION_ENABLED") == "true"
+
+MIN_SIZE = int(config.get("RESPONSE_COMPRESSION_MIN_SIZE"))
+
+GZIP_LEVEL = int(config.get("RESPONSE_GZIP_LEVEL"))
+
+BROTLI_QUALITY = int(config.get("RESPONSE_BROTLI_QUALITY"))
+
+COMPRESSIBLE_MIMETYPES = frozenset(
+    ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+)
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def choose_encoding(request: Request) -> Optional[str]:
+    return request.accept_encodings.best_match(["br", "gzip"])
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(iterable: Iterable[str | bytes], encoding: str) -> Iterator[bytes]:
+    """Compress chunks as they are produced, each chunk is flushed so the client receives data progressively."""
+    chunks = (chunk.encode() if isinstance(chunk, str) else chunk for chunk in iterable)
+    try:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            for chunk in chunks:
+                data = compressor.process(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            for chunk in chunks:
+                data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+    finally:
+        close = getattr(iterable, "close", None)
+        if close:
+            close()
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """Compress response body if the client accepts it and it is worth it."""
+    if not COMPRESSION_ENABLED or not is_compressible(response.mimetype):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    encoding = choose_encoding(request)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body is a different representation, keep If-None-Match working with weak comparison.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
@@ -12,6 +12,12 @@ default = Dict(
         MYSQL_PORT=3306,
         MYSQL_USER="makeradmin",
         MYSQL_DB="makeradmin",
+        # Read replica used for read only routes, same port, db and credentials as primary. The user needs the
+        # REPLICATION CLIENT privilege on the replica to read the replication lag (with SHOW REPLICA STATUS on MySQL
+        # 8.0.22 and later, SHOW SLAVE STATUS before), the replica is not used without it.
+        MYSQL_REPLICA_HOST=None,
+        MYSQL_REPLICA_MAX_LAG=5,  # Use primary when replication lag is more than this many seconds.
+        DB_INDEX_CACHE_FILE="/tmp/makeradmin_fields_by_index.json",  # Written by init_db.py, read at api boot.
         MAILGUN_KEY="",
         MAILGUN_DOMAIN="",
         MAILGUN_FROM="",
@@ -33,7 +39,16 @@ default = Dict(
         ACCESSY_SPECIAL_LABACCESS=None,
         ACCESSY_DO_MODIFY="false",  # Do perform modify operations to Accessy, default is to log only, useful when developing.
         LOG_DIR="logs",
+        ACCESS_TOKEN_CACHE_TTL=30,  # Seconds a validated access token is trusted without reading the db, 0 disables.
         SLACK_BOT_TOKEN=None,
+        RESPONSE_COMPRESSION_ENABLED="true",  # Compress json/text responses with brotli or gzip.
+        RESPONSE_COMPRESSION_MIN_SIZE=1024,  # Smaller responses are not compressed, streamed responses always are.
+        RESPONSE_GZIP_LEVEL=6,
+        RESPONSE_BROTLI_QUALITY=4,
+        TRAFFIC_LOG_ENABLED="false",  # Log requests, responses and outgoing calls (redacted) as ndjson, for debugging.
+        TRAFFIC_LOG_SAMPLE_RATE=1.0,  # Share of requests that are logged when traffic logging is enabled.
+        TRAFFIC_LOG_MAX_FILE_BYTES=64 * 1024 * 1024,
+        TRAFFIC_LOG_ROTATE_SECONDS=3600,
     ),
 )
 env = Env()
@@ -61,6 +76,15 @@ def get_mysql_config() -> dict[str, str | int]:
     return dict(host=host, port=port, db=db, user=user, pwd=pwd)
 
 
+def get_mysql_replica_config() -> dict[str, str | int | float] | None:
+    """Config for the read replica, None if no replica is configured."""
+    host = config.get("MYSQL_REPLICA_HOST")
+    if not host:
+        return None
+
+    return dict(get_mysql_config(), host=host, max_lag=float(config.get("MYSQL_REPLICA_MAX_LAG")), check_interval=5.0)
+
+
 def get_public_url(path: str) -> str:
     """Get public site url."""
     assert path == "" or path.startswith("/"), "path must start with /"
@@ -1,12 +1,149 @@
+import json
+import os
 from functools import wraps
-from typing import Any, Callable, TypeVar, Union, cast
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Optional, Sequence, TypeVar, Union, cast
 
-from sqlalchemy import create_engine, inspect
+from pymysql.constants.ER import PARSE_ERROR, SPECIFIC_ACCESS_DENIED_ERROR
+from sqlalchemy import (
+    Column,
+    ColumnCollection,
+    CompoundSelect,
+    Insert,
+    Select,
+    Table,
+    TextClause,
+    create_engine,
+    event,
+    inspect,
+    text,
+)
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 from service.logging import logger
 from service.util import can_connect, wait_for
 
+READ_ONLY_INFO_KEY = "read_only"
+
+WROTE_INFO_KEY = "wrote"
+
+
+# SHOW REPLICA STATUS needs MySQL 8.0.22, older versions and MariaDB only have SHOW SLAVE STATUS.
+REPLICA_STATUS = ("SHOW REPLICA STATUS", "Seconds_Behind_Source")
+SLAVE_STATUS = ("SHOW SLAVE STATUS", "Seconds_Behind_Master")
+
+
+def mysql_error_code(e: Exception) -> Optional[int]:
+    orig = getattr(e, "orig", None)
+    return orig.args[0] if orig is not None and orig.args else None
+
+
+class Replica:
+    """Optional read replica of the db. Replication lag is checked at most every check_interval seconds, the replica
+    is not used if the lag is above max_lag or can not be read (reading it needs the REPLICATION CLIENT privilege)."""
+
+    def __init__(self) -> None:
+        self.engine: Optional[Engine] = None
+        self.max_lag = 0.0
+        self.check_interval = 0.0
+
+        self._lock = Lock()
+        self._checked_at: Optional[float] = None
+        self._usable = False
+        self._status = REPLICA_STATUS
+        self._lag_error: Optional[str] = None
+
+    def init_with_engine(self, engine: Optional[Engine], max_lag: float = 5.0, check_interval: float = 5.0) -> None:
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._checked_at = None
+        self._usable = False
+        self._status = REPLICA_STATUS
+        self._lag_error = None
+
+    def lag(self) -> Optional[float]:
+        """Replication lag in seconds, None if replication is not running."""
+        with self.engine.connect() as connection:
+            try:
+                status = connection.execute(text(self._status[0])).mappings().first()
+            except ProgrammingError as e:
+                if self._status == SLAVE_STATUS or mysql_error_code(e) != PARSE_ERROR:
+                    raise
+                self._status = SLAVE_STATUS
+                status = connection.execute(text(self._status[0])).mappings().first()
+        if status is None or status[self._status[1]] is None:
+            return None
+        return float(status[self._status[1]])
+
+    def usable_engine(self) -> Optional[Engine]:
+        """The replica engine if it is configured and up to date enough, otherwise None."""
+        if self.engine is None:
+            return None
+
+        now = monotonic()
+        if self._checked_at is None or now - self._checked_at > self.check_interval:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at > self.check_interval:
+                    try:
+                        lag = self.lag()
+                        self._lag_error = None
+                    except Exception as e:
+                        # Warn once, not on every check, the error (like a missing privilege) usually stays.
+                        if str(e) != self._lag_error:
+                            hint = (
+                                ", the user needs the REPLICATION CLIENT privilege"
+                                if mysql_error_code(e) == SPECIFIC_ACCESS_DENIED_ERROR
+                                else ""
+                            )
+                            logger.warning(f"failed to read replication lag{hint}: {e}")
+                        self._lag_error = str(e)
+                        lag = None
+
+                    usable = lag is not None and lag <= self.max_lag
+                    if usable != self._usable:
+                        if usable:
+                            logger.info(f"replication lag is {lag}s, using replica for read only routes")
+                        else:
+                            logger.warning(f"replication lag is {lag}s, using primary for read only routes")
+                    self._usable = usable
+                    self._checked_at = monotonic()
+
+        return self.engine if self._usable else None
+
+
+replica = Replica()
+
+
+def is_read(clause) -> bool:
+    """True if clause is a non locking select, those can be executed on the replica."""
+    if isinstance(clause, (Select, CompoundSelect)):
+        return clause._for_update_arg is None
+    if isinstance(clause, TextClause):
+        statement = clause.text.upper()
+        return (
+            statement.lstrip().startswith("SELECT") and "FOR UPDATE" not in statement and "FOR SHARE" not in statement
+        )
+    return False
+
+
+class RoutingSession(Session):
+    """Session that executes selects on the replica while info[READ_ONLY_INFO_KEY] is set. Everything else, and all
+    statements after the first write in a transaction (to read your own writes), is executed on the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not is_read(clause):
+            self.info[WROTE_INFO_KEY] = True
+        elif self.info.get(READ_ONLY_INFO_KEY) and not self.info.get(WROTE_INFO_KEY):
+            engine = replica.usable_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
 
 class SessionFactoryWrapper:
     """This session factory wrapper is useful to be able to create and import the scoped_session db_session_factory
@@ -17,7 +154,7 @@ class SessionFactoryWrapper:
 
     def init_with_engine(self, engine):
         if self.session_factory is None:
-            self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
         else:
             self.session_factory.configure(bind=engine)
 
@@ -29,6 +166,7 @@ class SessionFactoryWrapper:
 
 db_session_factory = SessionFactoryWrapper()
 
+# Scoped per thread, so with threaded gunicorn workers each request has its own session (removed on teardown).
 db_session: Union[Session, scoped_session] = scoped_session(db_session_factory)
 
 
@@ -36,9 +174,21 @@ def shutdown_session(exception=None):
     db_session.remove()
 
 
-def create_mysql_engine(
-    host=None, port=None, db=None, user=None, pwd=None, timeout=240, isolation_level="REPEATABLE_READ"
-):
+# All engines created by connect_mysql, see dispose_engines_after_fork.
+engines: list[Engine] = []
+
+
+def dispose_engines_after_fork() -> None:
+    """Let a forked process (like a gunicorn worker with --preload) open its own connections, connections
+    inherited from the parent are dropped without being closed since the parent may still use them."""
+    for engine in engines:
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+
+def connect_mysql(host=None, port=None, db=None, user=None, pwd=None, timeout=240, isolation_level="REPEATABLE_READ"):
     # Skip wait log message if we can connect immediately
     if not wait_for(lambda: can_connect(host, port), timeout=2, interval=0.5):
         logger.info(f"waiting for db to respond at {host}:{port}")
@@ -48,24 +198,101 @@ def create_mysql_engine(
     engine = create_engine(
         f"mysql+pymysql://{user}:{pwd}@{host}:{port}/{db}", pool_recycle=1800, isolation_level=isolation_level
     )
+    engines.append(engine)
+    return engine
+
+
+def create_mysql_engine(
+    host=None, port=None, db=None, user=None, pwd=None, timeout=240, isolation_level="REPEATABLE_READ"
+):
+    engine = connect_mysql(host, port, db, user, pwd, timeout=timeout, isolation_level=isolation_level)
 
     db_session_factory.init_with_engine(engine)
 
     return engine
 
 
+def create_mysql_replica_engine(max_lag: float, check_interval: float, **kwargs):
+    """Create engine for the read replica, selects in read only routes will be sent to it."""
+    engine = connect_mysql(**kwargs)
+
+    replica.init_with_engine(engine, max_lag=max_lag, check_interval=check_interval)
+
+    return engine
+
+
 fields_by_index = {}
 
 
-def populate_fields_by_index(engine):
-    """Populate the dict fields_by_index (used for error messages) by inspecting the database."""
-    engine_inspect = inspect(engine)
-    for table in engine_inspect.get_table_names():
-        for index in engine_inspect.get_indexes(table):
-            index_name = index["name"]
-            column_names = index["column_names"]
-            fields_by_index[index_name] = ",".join(column_names)
-            fields_by_index[table + "." + index_name] = ",".join(column_names)
+def read_fields_by_index(engine) -> dict[str, str]:
+    """Map index names (both plain and prefixed with table name) to comma separated column names, used for error
+    messages. Reads all indexes in one query on MySQL instead of inspecting table by table."""
+    if engine.dialect.name != "mysql":
+        res = {}
+        engine_inspect = inspect(engine)
+        for table in engine_inspect.get_table_names():
+            for index in engine_inspect.get_indexes(table):
+                res[index["name"]] = res[table + "." + index["name"]] = ",".join(index["column_names"])
+        return res
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT table_name, index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index SEPARATOR ',')"
+                "    FROM information_schema.statistics"
+                "    WHERE table_schema = DATABASE() AND index_name != 'PRIMARY'"
+                "    GROUP BY table_name, index_name"
+                "    ORDER BY table_name, index_name"
+            )
+        ).all()
+    res = {}
+    for table, index_name, column_names in rows:
+        res[index_name] = res[table + "." + index_name] = column_names
+    return res
+
+
+def latest_migration_id(engine) -> Optional[int]:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT MAX(id) FROM migrations")).scalar()
+
+
+def write_fields_by_index_cache(engine, filename: str) -> dict[str, str]:
+    """Read index names and columns from the db and write them to filename for later api boots, run after
+    migrations."""
+    data = read_fields_by_index(engine)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, "w") as f:
+        json.dump(dict(migration_id=latest_migration_id(engine), fields_by_index=data), f)
+    os.replace(tmp_filename, filename)
+    return data
+
+
+def read_fields_by_index_cache(engine, filename: str) -> Optional[dict[str, str]]:
+    """Return cached index names and columns if the cache was written for the current migration, otherwise None."""
+    try:
+        with open(filename) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("migration_id") != latest_migration_id(engine):
+        return None
+    return cache["fields_by_index"]
+
+
+def populate_fields_by_index(engine, cache_filename: Optional[str] = None):
+    """Populate the dict fields_by_index (used for error messages), from cache_filename if it is up to date,
+    otherwise by inspecting the database (and updating the cache file)."""
+    data = None
+    if cache_filename:
+        data = read_fields_by_index_cache(engine, cache_filename)
+        if data is None:
+            try:
+                data = write_fields_by_index_cache(engine, cache_filename)
+            except OSError as e:
+                logger.warning(f"failed to write index cache {cache_filename}: {e}")
+    if data is None:
+        data = read_fields_by_index(engine)
+    fields_by_index.update(data)
 
 
 F = TypeVar("F", bound=Callable[..., Any])
@@ -87,3 +314,49 @@ def nested_atomic(f: F) -> F:
             raise
 
     return cast(F, wrapper)
+
+
+def insert_or_update(
+    dialect_name: str,
+    table: Table,
+    key: Sequence[Column],
+    update: Callable[[ColumnCollection], Dict[str, Any]],
+    values: Optional[Dict[str, Any]] = None,
+    from_select: Optional[Select] = None,
+) -> Insert:
+    """Insert values, or the rows of from_select (with columns named as in table), and update the row that is already
+    there for a duplicate key with update(columns of the row that was to be inserted) instead. INSERT ... ON DUPLICATE
+    KEY UPDATE on MySQL, INSERT ... ON CONFLICT (key) DO UPDATE otherwise (sqlite in tests). There is no separate
+    check for an existing row, so concurrent inserts of the same key do not fail."""
+    statement = mysql.insert(table) if dialect_name == "mysql" else sqlite.insert(table)
+    if from_select is not None:
+        statement = statement.from_select(list(from_select.selected_columns.keys()), from_select)
+    else:
+        statement = statement.values(values)
+    if dialect_name == "mysql":
+        return statement.on_duplicate_key_update(update(statement.inserted))
+    return statement.on_conflict_do_update(index_elements=key, set_=update(statement.excluded))
+
+
+AFTER_TRANSACTION_INFO_KEY = "after_transaction_callbacks"
+
+
+def call_after_transaction(session: Session, callback: Callable[[], None]) -> None:
+    """Call callback when the outermost transaction of session ends. Use for invalidating caches, invalidating before
+    the commit would let another process cache the old data again from the not yet updated db. The callback is also
+    called on rollback, so it should be safe to call spuriously."""
+    session.info.setdefault(AFTER_TRANSACTION_INFO_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def run_after_transaction_callbacks(session: Session, transaction) -> None:
+    if transaction.parent is not None:
+        return
+
+    session.info.pop(WROTE_INFO_KEY, None)
+
+    for callback in session.info.pop(AFTER_TRANSACTION_INFO_KEY, []):
+        try:
+            callback()
+        except Exception:
+            logger.exception("after transaction callback failed")
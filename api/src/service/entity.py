@@ -1,4 +1,5 @@
-from base64 import b64decode, b64encode
+import json
+from base64 import b64decode, b64encode, urlsafe_b64decode, urlsafe_b64encode
 from collections import namedtuple
 from datetime import date, datetime, timezone
 from decimal import Decimal
@@ -7,7 +8,7 @@ from math import ceil
 from typing import Any, Callable, Dict, Mapping, Type, TypeVar, Union
 from zoneinfo import ZoneInfo
 
-from flask import request
+from flask import jsonify, request
 from sqlalchemy import (
     JSON,
     Boolean,
@@ -19,19 +20,25 @@ from sqlalchemy import (
     Numeric,
     String,
     Text,
+    and_,
     asc,
+    bindparam,
     desc,
     inspect,
     or_,
+    select,
     text,
+    update,
 )
 from sqlalchemy import (
     Enum as DbEnum,
 )
+from sqlalchemy.orm import load_only
 
 from service.api_definition import BAD_VALUE, REQUIRED, Arg, Enum, boolean, natural0, natural1, symbol
 from service.db import db_session
-from service.error import NotFound, UnprocessableEntity
+from service.error import ApiError, NotFound, UnprocessableEntity
+from service.json_provider import NativeJson
 
 ASC = "asc"
 DESC = "desc"
@@ -118,8 +125,85 @@ to_obj_converters: Dict[Type, Callable] = {
 }
 
 
+# Converters for list responses, datetimes and dates are left as is and encoded natively, see NativeJson.
+native_to_obj_converters: Dict[Type, Callable] = {**to_obj_converters, DateTime: identity, Date: identity}
+
+
+def cursor_value_to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+cursor_value_from_json: Dict[Type, Callable] = {
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+    Decimal: Decimal,
+}
+
+
+def encode_cursor(sort_column, sort_order, sort_value, pk_value) -> str:
+    """Encode the position after a row as an opaque string."""
+    data = json.dumps([sort_column, sort_order, cursor_value_to_json(sort_value), pk_value])
+    return urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, sort_column, sort_order, column, pk):
+    """Decode cursor to (sort value, pk value), the cursor must have been created for the same sort."""
+    try:
+        cursor_sort_column, cursor_sort_order, sort_value, pk_value = json.loads(urlsafe_b64decode(cursor.encode()))
+        if cursor_sort_column != sort_column or cursor_sort_order != sort_order:
+            raise ValueError("cursor was created for another sort")
+        if sort_value is not None and column is not None:
+            sort_value = cursor_value_from_json.get(column.type.python_type, identity)(sort_value)
+        pk_value = cursor_value_from_json.get(pk.type.python_type, identity)(pk_value)
+    except Exception as e:
+        raise UnprocessableEntity(f"Bad cursor: {str(e)}", fields="cursor", what=BAD_VALUE)
+
+    return sort_value, pk_value
+
+
+def seek_after(column, pk, sort_order, sort_value, pk_value):
+    """Filter expression for rows after (sort_value, pk_value) when ordering on (column, pk). Null sort values comes
+    first in ascending order and last in descending order, as in MySQL."""
+    if column is None or column is pk:
+        return pk > pk_value if sort_order == ASC else pk < pk_value
+
+    if sort_order == ASC:
+        if sort_value is None:
+            return or_(and_(column.is_(None), pk > pk_value), column.isnot(None))
+        return or_(column > sort_value, and_(column == sort_value, pk > pk_value))
+
+    if sort_value is None:
+        return and_(column.is_(None), pk < pk_value)
+    return or_(column < sort_value, and_(column == sort_value, pk < pk_value), column.is_(None))
+
+
+def bulk_error_response(errors):
+    """Response for a bulk request where some items failed, errors is a list of (index, ApiError)."""
+    response = jsonify(
+        status="error",
+        message=f"{len(errors)} item(s) could not be saved, nothing was saved.",
+        errors=[dict(index=index, code=e.code, message=e.message, fields=e.fields, what=e.what) for index, e in errors],
+    )
+    response.status_code = UnprocessableEntity.code
+    return response
+
+
 GLOBAL_READ_ONLY = ("created_at", "updated_at", "deleted_at")
 
+BULK_MAX_ITEMS = 1000
+
+# Max number of ids per multi-row relation statement, keeps statements well below max_allowed_packet.
+RELATION_CHUNK_SIZE = 500
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
 
 ExpandField = namedtuple("ExpandField", "relation,columns")
 
@@ -137,6 +221,7 @@ class Entity:
         default_sort_order=DESC,
         search_columns=tuple(),
         expand_fields=None,
+        deferred_columns=tuple(),
     ):
         """
         :param model sqlalchemy orm model class
@@ -148,6 +233,7 @@ class Entity:
         :param default_sort_order asc/desc
         :param search_columns columns that should be used for text search (search param to list)
         :param expand_fields map of name to ExpandField for data from other models that can be added when listing entity
+        :param deferred_columns heavy columns that are not loaded when listing unless requested in the fields param
         """
 
         self.model = model
@@ -180,6 +266,14 @@ class Entity:
             k: to_obj_converters[type(c.type)] for k, c in self.columns.items() if k not in hidden_columns
         }
 
+        self.cols_to_native = {
+            k: native_to_obj_converters[type(c.type)] for k, c in self.columns.items() if k not in hidden_columns
+        }
+
+        assert all(k in self.cols_to_obj for k in deferred_columns), "deferred column does not exist or is hidden"
+
+        self.deferred_columns = deferred_columns
+
     def validate_present(self, obj):
         """Validate object for all items in object."""
         for k, v in obj.items():
@@ -205,9 +299,47 @@ class Entity:
 
         return {k: self.cols_to_model[k](v) for k, v in obj.items() if k in self.cols_to_model}
 
-    def to_obj(self, entity: Any) -> dict:
-        """Convert model to json compatible object."""
-        return {k: conv(getattr(entity, k, None)) for k, conv in self.cols_to_obj.items()}
+    def to_obj(self, entity: Any, fields=None) -> dict:
+        """Convert model to json compatible object, with only the listed fields if fields is set."""
+        if fields is None:
+            return {k: conv(getattr(entity, k, None)) for k, conv in self.cols_to_obj.items()}
+        return {k: self.cols_to_obj[k](getattr(entity, k, None)) for k in fields}
+
+    def select_fields(self, fields, deferred_columns=tuple()):
+        """Return list of columns from a comma separated fields param, or all columns except deferred_columns if not
+        set. Returns None for all columns."""
+        if not fields:
+            if not deferred_columns:
+                return None
+            return [k for k in self.cols_to_obj if k not in deferred_columns]
+
+        selected = [k.strip() for k in fields.split(",") if k.strip()]
+        unknown = [k for k in selected if k not in self.cols_to_obj]
+        if unknown:
+            raise UnprocessableEntity(f"Unknown fields: {', '.join(unknown)}.", fields="fields", what=BAD_VALUE)
+        return selected
+
+    def load_only(self, fields):
+        """Query option to only load the listed fields (and the primary key) from the db."""
+        return load_only(*[getattr(self.model, k) for k in fields])
+
+    @staticmethod
+    def row_converter(keys, converters):
+        """Compile a converter from row tuples (where the first columns match keys) to json compatible objects. Keys
+        with identity converters are copied as is, so the per row work is only for columns that need conversion."""
+        keys = tuple(keys)
+        last_index = {k: i for i, k in enumerate(keys)}
+        convert = tuple(
+            (k, i, c) for i, (k, c) in enumerate(zip(keys, converters)) if c is not identity and last_index[k] == i
+        )
+
+        def row_to_obj(row):
+            obj = dict(zip(keys, row))
+            for k, i, c in convert:
+                obj[k] = c(row[i])
+            return obj
+
+        return row_to_obj
 
     def list(
         self,
@@ -222,8 +354,23 @@ class Entity:
         include_deleted=Arg(boolean, required=False),
         search_column=Arg(str, required=False),
         regex=Arg(boolean, required=False),
+        cursor=Arg(str, required=False),
+        fields=Arg(str, required=False),
     ):
-        query = db_session.query(self.model)
+        """
+        List entities with offset pagination (page and page_size), or keyset pagination if cursor is set. In keyset
+        mode use an empty cursor for the first page and then next_cursor from the response, the total is not counted.
+
+        Fields is a comma separated list of columns to include, only those columns are loaded from the db. Deferred
+        columns are only included if listed in fields.
+
+        Rows are selected as plain tuples of the needed columns instead of orm instances, see row_converter.
+        """
+        keys = self.select_fields(fields, self.deferred_columns)
+        keys = list(self.cols_to_obj) if keys is None else keys
+        converters = [self.cols_to_native[k] for k in keys]
+
+        query = db_session.query(*[getattr(self.model, k) for k in keys])
 
         if include_deleted is None:
             include_deleted = False
@@ -258,24 +405,17 @@ class Entity:
                 raise UnprocessableEntity(f"Expand of {expand} not allowed.", fields="expand", what=BAD_VALUE)
             query = query.outerjoin(expand_field.relation).add_columns(*expand_field.columns)
 
-            column_obj_converter = [to_obj_converters[type(c.type)] for c in expand_field.columns]
+            keys += [c.name for c in expand_field.columns]
+            converters += [native_to_obj_converters[type(c.type)] for c in expand_field.columns]
 
             for c in expand_field.columns:
                 self.columns.add(c)
 
-            # Use to_obj that can unpack result row.
-            def to_obj(row):
-                obj = self.to_obj(row[0])
-                for value, column, converter in zip(row[1:], expand_field.columns, column_obj_converter):
-                    obj[column.name] = converter(value)
-                return obj
-
-        else:
-            # Use regular to_obj.
-            to_obj = self.to_obj
+        to_obj = self.row_converter(keys, converters)
 
         sort_column = sort_by or self.default_sort_column
         sort_order = sort_order or self.default_sort_order
+        column = None
 
         if sort_column:
             try:
@@ -285,20 +425,52 @@ class Entity:
             order = desc if sort_order == DESC else asc
             query = query.order_by(order(column))
 
+        page_size = 25 if page_size is None else page_size
+
+        if cursor is not None:
+            return self._list_after_cursor(query, to_obj, cursor, sort_column, sort_order or ASC, column, page_size)
+
         count = query.count()
 
-        page_size = 25 if page_size is None else page_size
         page = page or 1
 
         if page_size:
             query = query.limit(page_size).offset((page - 1) * page_size)
 
-        return dict(
+        return NativeJson(
             total=count,
             page=page,
             page_size=page_size,
             last_page=max(1, ceil(count / page_size)) if page_size else 1,
-            data=[to_obj(entity) for entity in query],
+            data=[to_obj(row) for row in query],
+        )
+
+    def _list_after_cursor(self, query, to_obj, cursor, sort_column, sort_order, column, page_size):
+        """Keyset pagination, seeks on (sort column, pk) instead of using offset so deep pages are as fast as the
+        first one."""
+        pk = self.pk
+        order = desc if sort_order == DESC else asc
+        query = query.order_by(order(pk)).add_columns(column if column is not None else pk, pk)
+
+        if cursor:
+            sort_value, pk_value = decode_cursor(cursor, sort_column, sort_order, column, pk)
+            query = query.filter(seek_after(column, pk, sort_order, sort_value, pk_value))
+
+        if page_size:
+            query = query.limit(page_size + 1)
+
+        rows = query.all()
+
+        next_cursor = None
+        if page_size and len(rows) > page_size:
+            rows = rows[:page_size]
+            *_, sort_value, pk_value = rows[-1]
+            next_cursor = encode_cursor(sort_column, sort_order, sort_value, pk_value)
+
+        return NativeJson(
+            page_size=page_size,
+            next_cursor=next_cursor,
+            data=[to_obj(row) for row in rows],
         )
 
     def _create_internal(self, data, commit=True):
@@ -321,11 +493,13 @@ class Entity:
             data = request.json or {}
         return self.to_obj(self._create_internal(data, commit=commit))
 
-    def read(self, entity_id):
-        entity = db_session.get(self.model, entity_id)
+    def read(self, entity_id, fields=Arg(str, required=False)):
+        fields = self.select_fields(fields)
+        options = [self.load_only(fields)] if fields is not None else None
+        entity = db_session.get(self.model, entity_id, options=options)
         if not entity:
             raise NotFound("Could not find any entity with specified parameters.")
-        obj = self.to_obj(entity)
+        obj = self.to_obj(entity, fields)
         return obj
 
     def _update_internal(self, entity_id, data, commit=True):
@@ -363,6 +537,129 @@ class Entity:
         if commit:
             db_session.commit()
 
+    def _get_bulk_items(self, name):
+        data = request.json
+        items = data.get(name) if isinstance(data, Mapping) else None
+        if not isinstance(items, list):
+            raise UnprocessableEntity(f"Unexpected body, should be list of items named {name}.", what=BAD_VALUE)
+        if len(items) > BULK_MAX_ITEMS:
+            raise UnprocessableEntity(f"At most {BULK_MAX_ITEMS} items per request.", fields=name, what=BAD_VALUE)
+        return items
+
+    def _to_transient(self, input_data, entity=None):
+        """Set input data on a model instance, to run orm validators that bulk statements would bypass."""
+        entity = entity if entity is not None else self.model()
+        for k, v in input_data.items():
+            try:
+                setattr(entity, k, v)
+            except ValueError as e:
+                raise UnprocessableEntity(f"Could not save value.", fields=k, what=BAD_VALUE) from e
+        return entity
+
+    def _missing_ids(self, entity_ids):
+        existing = set(db_session.scalars(select(self.pk).where(self.pk.in_(set(entity_ids)))))
+        return {entity_id for entity_id in entity_ids if entity_id not in existing}
+
+    def _bulk_result(self, entity_ids):
+        """Load all entities in one query, in the order of entity_ids."""
+        entities = {
+            getattr(e, self.pk.key): e
+            for e in db_session.scalars(
+                select(self.model).where(self.pk.in_(set(entity_ids))).execution_options(populate_existing=True)
+            )
+        }
+        return [self.to_obj(entities[entity_id]) for entity_id in entity_ids]
+
+    def bulk_create(self, items=None):
+        """Create all items in one transaction, if any item fails validation nothing is created and the errors are
+        returned per item index."""
+        if items is None:
+            items = self._get_bulk_items("items")
+
+        entities = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                input_data = self.to_model(item)
+                self.validate_all(input_data)
+                if not input_data:
+                    raise UnprocessableEntity("Can not create using empty data.")
+                entities.append(self._to_transient(input_data))
+            except ApiError as e:
+                errors.append((index, e))
+
+        if errors:
+            return bulk_error_response(errors)
+
+        # One flush, inserts are batched by the orm where the db can return generated ids.
+        db_session.add_all(entities)
+        db_session.flush()
+
+        return self._bulk_result([getattr(e, self.pk.key) for e in entities])
+
+    def bulk_update(self, items=None):
+        """Update all items (identified by primary key in each item) using executemany in one transaction, if any
+        item fails validation nothing is updated and the errors are returned per item index."""
+        if items is None:
+            items = self._get_bulk_items("items")
+
+        pk_key = self.pk.key
+        updates = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                input_data = self.to_model(item)
+                entity_id = item.get(pk_key)
+                if not isinstance(entity_id, int) or isinstance(entity_id, bool):
+                    raise UnprocessableEntity(f"'{pk_key}' is required.", fields=pk_key, what=REQUIRED)
+                self.validate_present(input_data)
+                if not input_data:
+                    raise UnprocessableEntity("Can not update using empty data.")
+                transient = self._to_transient(input_data)
+                updates.append((index, {pk_key: entity_id, **{k: getattr(transient, k) for k in input_data}}))
+            except ApiError as e:
+                errors.append((index, e))
+
+        missing = self._missing_ids([params[pk_key] for _, params in updates])
+        errors.extend(
+            (index, NotFound("Could not find any entity with specified parameters.", fields=pk_key))
+            for index, params in updates
+            if params[pk_key] in missing
+        )
+
+        if errors:
+            return bulk_error_response(sorted(errors, key=lambda error: error[0]))
+
+        if updates:
+            db_session.execute(update(self.model), [params for _, params in updates])
+
+        return self._bulk_result([params[pk_key] for _, params in updates])
+
+    def bulk_delete(self, entity_ids=None):
+        """Soft delete all entities in one statement, if any entity does not exist nothing is deleted."""
+        if entity_ids is None:
+            entity_ids = self._get_entity_id_list("ids")
+
+        missing = self._missing_ids(entity_ids)
+        if missing:
+            return bulk_error_response(
+                [
+                    (index, NotFound("Could not find any entity with specified parameters.", fields=self.pk.key))
+                    for index, entity_id in enumerate(entity_ids)
+                    if entity_id in missing
+                ]
+            )
+
+        if entity_ids:
+            db_session.execute(
+                update(self.model)
+                .where(self.pk.in_(set(entity_ids)), self.model.deleted_at.is_(None))
+                .values(deleted_at=datetime.now(timezone.utc).replace(tzinfo=None))
+                .execution_options(synchronize_session=False)
+            )
+
+        return entity_ids
+
     def _get_entity_id_list(self, name):
         ids = request.json.get(name)
         try:
@@ -443,25 +740,29 @@ class OrmManyRelation:
         self.entity_id_column = entity_id_column
         self.related_entity_id_column = related_entity_id_column
 
-        self.insert = text(
-            f"REPLACE INTO {self.relation_table.name} "
-            f" ({self.entity_id_column}, {self.related_entity_id_column}) "
-            f" VALUES (:entity_id, :related_entity_id)"
-        )
-
         self.delete = text(
             f"DELETE FROM {self.relation_table.name} "
-            f" WHERE {self.entity_id_column} = :entity_id"
-            f" AND {self.related_entity_id_column} = :related_entity_id"
+            f" WHERE {self.related_entity_id_column} = :related_entity_id"
+            f" AND {self.entity_id_column} IN :entity_ids"
+        ).bindparams(bindparam("entity_ids", expanding=True))
+
+    def insert(self, count):
+        """Multi-row replace statement for count entity ids, all rows with the same related entity id."""
+        values = ", ".join(f"(:entity_id_{i}, :related_entity_id)" for i in range(count))
+        return text(
+            f"REPLACE INTO {self.relation_table.name} "
+            f" ({self.entity_id_column}, {self.related_entity_id_column}) "
+            f" VALUES {values}"
         )
 
     def add(self, entity_ids, related_entity_id):
-        for entity_id in entity_ids:
-            db_session.execute(self.insert, {"entity_id": entity_id, "related_entity_id": related_entity_id})
+        for chunk in chunks(list(dict.fromkeys(entity_ids)), RELATION_CHUNK_SIZE):
+            params = {f"entity_id_{i}": entity_id for i, entity_id in enumerate(chunk)}
+            db_session.execute(self.insert(len(chunk)), {**params, "related_entity_id": related_entity_id})
 
     def remove(self, entity_ids, related_entity_id):
-        for entity_id in entity_ids:
-            db_session.execute(self.delete, {"entity_id": entity_id, "related_entity_id": related_entity_id})
+        for chunk in chunks(list(dict.fromkeys(entity_ids)), RELATION_CHUNK_SIZE):
+            db_session.execute(self.delete, {"entity_ids": chunk, "related_entity_id": related_entity_id})
 
     def filter(self, query, related_entity_id):
         return query.join(self.relation_property).filter_by(**{self.related_entity_id_column: related_entity_id})
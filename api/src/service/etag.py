@@ -0,0 +1,88 @@
+"""ETag support for cacheable GET routes.
+
+By default the ETag is a hash of the rendered body, that saves bandwidth and client work but the server still renders
+the full response. A route can also supply a version key, typically from a ModelVersion, then a matching
+If-None-Match is answered with 304 without calling the view at all.
+"""
+
+from hashlib import sha1
+from logging import getLogger
+from typing import Optional, Tuple, Type
+
+from flask import Response, g, make_response, request
+from redis import RedisError
+from redis_cache import redis_connection
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from service.db import call_after_transaction
+
+logger = getLogger("makeradmin")
+
+
+class ModelVersion:
+    """Version counter in redis that is bumped when a transaction that changes any of the models ends. Changes made
+    with plain sql (not through the orm) are not detected."""
+
+    def __init__(self, name: str, *models: Type) -> None:
+        self.key = f"model_version:{name}"
+        self.models: Tuple[Type, ...] = models
+
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "do_orm_execute", self._do_orm_execute)
+
+    def get(self) -> Optional[str]:
+        """Current version, None if it can not be read."""
+        try:
+            return (redis_connection.get(self.key) or b"0").decode()
+        except RedisError as e:
+            logger.warning(f"failed to read {self.key}: {e}")
+            return None
+
+    def bump(self) -> None:
+        try:
+            redis_connection.incr(self.key)
+        except RedisError as e:
+            logger.error(f"failed to bump {self.key}: {e}")
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        if any(isinstance(obj, self.models) for obj in (*session.new, *session.dirty, *session.deleted)):
+            self.bump()
+            call_after_transaction(session, self.bump)
+
+    def _do_orm_execute(self, state: ORMExecuteState) -> None:
+        if state.is_select or state.bind_mapper is None:
+            return
+        if issubclass(state.bind_mapper.class_, self.models):
+            self.bump()
+            call_after_transaction(state.session, self.bump)
+
+
+def version_etag(version: str) -> str:
+    """ETag for a view supplied version, the request path, query and user is included since the view may use them."""
+    return sha1(f"{request.full_path}|{g.get('user_id')}|{version}".encode()).hexdigest()
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def conditional_response(result, etag: Optional[str], cache_control: str) -> Response:
+    """Add ETag (a hash of the body if etag is None) and Cache-Control to a 200 response and turn it into a 304 if the
+    ETag matches If-None-Match."""
+    response = make_response(result)
+    if response.status_code != 200 or response.is_streamed:
+        return response
+
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = cache_control
+
+    return response.make_conditional(request)
@@ -3,15 +3,19 @@ from functools import partial, wraps
 from typing import Any, Callable, List, Optional, Tuple
 
 import pymysql
-from flask import Blueprint, Response, g, jsonify
+from flask import Blueprint, Response, g, jsonify, request
 from flask import typing as ft
 from pymysql.constants.ER import BAD_NULL_ERROR, DUP_ENTRY
 from sqlalchemy.exc import IntegrityError
 
 from service.api_definition import DELETE, GET, NOT_UNIQUE, POST, PUBLIC, PUT, REQUIRED, Arg
-from service.db import db_session, fields_by_index
+from service.db import READ_ONLY_INFO_KEY, db_session, fields_by_index
 from service.error import Forbidden, Unauthorized, UnprocessableEntity
+from service.etag import conditional_response, not_modified, version_etag
+from service.json_provider import NativeJson, json_response
 from service.logging import logger
+from service.metrics import instrumented
+from service.response_cache import ResponseCache
 
 
 class InternalService(Blueprint):
@@ -36,6 +40,11 @@ class InternalService(Blueprint):
         commit: bool = True,
         commit_on_error: bool = False,
         flat_return: bool = False,
+        read_only: Optional[bool] = None,
+        cacheable: bool = False,
+        version: Optional[Callable[..., Optional[str]]] = None,
+        cache_control: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
         **route_kwargs,
     ) -> Callable[[ft.RouteCallable], ft.RouteCallable]:
         """
@@ -56,6 +65,17 @@ class InternalService(Blueprint):
         :param commit_on_error commit db_session even if there was an exception
         :param route_kwargs all extra kwargs are forwarded to Blueprint.route
         :param flat_return some endpoints returns data flattened
+        :param read_only selects in the function may be executed on the read replica (if configured), default is
+                         True for GET routes without commit
+        :param cacheable set a strong ETag on the response and respond with 304 Not Modified if it matches
+                         If-None-Match, the ETag is a hash of the body unless version is set
+        :param version function called with the same args as the view that returns a version key of the data, the ETag
+                       is computed from it so 304 can be returned without calling the view, return None to fall
+                       back to hashing the body
+        :param cache_control Cache-Control for cacheable responses if not set by the view, default is to always
+                             revalidate
+        :param response_cache cache the data of the view in redis, see ResponseCache, the data must only depend on
+                              the path and query, not the user
         """
 
         assert permission is not None, "permission is required, use PUBLIC for no permission needed"
@@ -63,6 +83,15 @@ class InternalService(Blueprint):
 
         methods = methods or (method,)
 
+        if read_only is None:
+            read_only = all(m == GET for m in methods) and not commit
+
+        assert not cacheable or all(m == GET for m in methods), "only GET routes can be cacheable"
+        assert version is None or cacheable, "version requires cacheable"
+        assert response_cache is None or read_only, "response_cache requires read_only"
+
+        cache_control = cache_control or ("no-cache" if permission == PUBLIC else "private, no-cache")
+
         def decorator(f):
             params = Arg.get_args(f)
 
@@ -90,15 +119,39 @@ class InternalService(Blueprint):
 
                     Arg.fill_args(params, kwargs)
 
-                    data = f(*args, **kwargs)
+                    if read_only:
+                        db_session.info[READ_ONLY_INFO_KEY] = True
+                    try:
+                        etag = None
+                        if version is not None:
+                            key = version(*args, **kwargs)
+                            if key is not None:
+                                etag = version_etag(key)
+                                if request.if_none_match.contains_weak(etag):
+                                    return not_modified(etag, cache_control)
+
+                        if response_cache is not None:
+                            data = response_cache.get(partial(f, *args, **kwargs))
+                        else:
+                            data = f(*args, **kwargs)
+                    finally:
+                        db_session.info.pop(READ_ONLY_INFO_KEY, None)
 
                     if isinstance(data, Response):
                         result = data
+                    elif isinstance(data, NativeJson):
+                        native = (
+                            NativeJson(data, status=status) if flat_return else NativeJson(status=status, data=data)
+                        )
+                        result = json_response(native), code
                     elif flat_return:
                         result = jsonify({**data, "status": status}), code
                     else:
                         result = jsonify({"status": status, "data": data}), code
 
+                    if cacheable:
+                        result = conditional_response(result, etag, cache_control)
+
                     if commit and not commit_on_error:
                         db_session.commit()
 
@@ -148,7 +201,7 @@ class InternalService(Blueprint):
 
                 return result
 
-            return super(InternalService, self).route(path, methods=methods, **route_kwargs)(view_wrapper)
+            return super(InternalService, self).route(path, methods=methods, **route_kwargs)(instrumented(view_wrapper))
 
         return decorator
 
@@ -164,11 +217,13 @@ class InternalService(Blueprint):
         permission_read=None,
         permission_update=None,
         permission_delete=None,
+        bulk=False,
     ):
         """
         Add routes to manipulate an entity (model). Routes will be added if there is a permission for it,
         list: GET <path>, create: POST <path>, update: PUT <path>/<id>, read: GET <path>/<id>, delete: DELETE
-        <path>/<id>.
+        <path>/<id>. With bulk also bulk create: POST <path>/bulk, bulk update: PUT <path>/bulk, bulk delete:
+        DELETE <path>/bulk.
 
         :param path path to use for entity
         :param entity object which supports the view methods needed
@@ -177,6 +232,7 @@ class InternalService(Blueprint):
         :param permission_read permission needed to read
         :param permission_update permission needed to update
         :param permission_delete permission needed to delete
+        :param bulk add bulk routes, only for entities without special handling in create/update/delete
         """
 
         if permission_list:
@@ -186,6 +242,7 @@ class InternalService(Blueprint):
                 permission=permission_list,
                 method=GET,
                 flat_return=True,
+                read_only=True,
             )(entity.list)
 
         if permission_create:
@@ -224,6 +281,34 @@ class InternalService(Blueprint):
                 status="deleted",
             )(entity.delete)
 
+        if bulk and permission_create:
+            self.route(
+                f"{path}/bulk",
+                endpoint=entity.name + "_bulk_create",
+                permission=permission_create,
+                method=POST,
+                status="created",
+                code=201,
+            )(entity.bulk_create)
+
+        if bulk and permission_update:
+            self.route(
+                f"{path}/bulk",
+                endpoint=entity.name + "_bulk_update",
+                permission=permission_update,
+                method=PUT,
+                status="updated",
+            )(entity.bulk_update)
+
+        if bulk and permission_delete:
+            self.route(
+                f"{path}/bulk",
+                endpoint=entity.name + "_bulk_delete",
+                permission=permission_delete,
+                method=DELETE,
+                status="deleted",
+            )(entity.bulk_delete)
+
     def related_entity_routes(
         self, path=None, entity=None, relation=None, permission_list=None, permission_add=None, permission_remove=None
     ):
@@ -247,6 +332,7 @@ class InternalService(Blueprint):
                 permission=permission_list,
                 method=GET,
                 flat_return=True,
+                read_only=True,
             )(partial(entity.list, relation=relation))
 
         if permission_add:
@@ -0,0 +1,224 @@
+"""Per route latency, sql statement and outgoing http call instrumentation.
+
+While a route runs, sql statements are counted and timed by sqlalchemy cursor hooks and outgoing http calls by a
+wrapper around requests.Session.send, the counts are kept on flask g. When the route is done the observations are
+added to a per process buffer, that is flushed to a redis hash by a background thread, so /metrics can show the sum
+over all gunicorn workers in prometheus text format.
+"""
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import wraps
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Dict, Optional
+
+import requests
+from flask import Response, g, has_app_context, request
+from redis import RedisError
+from redis_cache import redis_connection
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from service.error import ApiError
+
+logger = getLogger("makeradmin")
+
+METRICS_KEY = "metrics"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SQL_STATEMENTS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+FAMILIES = {
+    "makeradmin_request_duration_seconds": ("histogram", "Time spent in route."),
+    "makeradmin_request_sql_statements": ("histogram", "Number of sql statements per request."),
+    "makeradmin_request_sql_seconds_total": ("counter", "Time spent executing sql statements."),
+    "makeradmin_request_http_calls_total": ("counter", "Number of outgoing http calls."),
+    "makeradmin_request_http_seconds_total": ("counter", "Time spent in outgoing http calls."),
+}
+
+
+@dataclass
+class RequestStats:
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    http_calls: int = 0
+    http_seconds: float = 0.0
+
+
+def request_stats() -> Optional[RequestStats]:
+    """Stats of the route currently running in this thread, None if outside an instrumented route."""
+    if not has_app_context():
+        return None
+    return g.get("request_stats")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, not the connection, so nothing is left behind when the statement raises.
+    if context is not None:
+        context.query_start_time = perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start_time", None)
+    if start is None:
+        return
+    stats = request_stats()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += perf_counter() - start
+
+
+def instrument_http() -> None:
+    """Measure outgoing http calls made with requests (also used by the stripe sdk)."""
+    send = requests.Session.send
+    if getattr(send, "instrumented", False):
+        return
+
+    @wraps(send)
+    def instrumented_send(session, prepared_request, **kwargs):
+        start = perf_counter()
+        try:
+            return send(session, prepared_request, **kwargs)
+        finally:
+            stats = request_stats()
+            if stats is not None:
+                stats.http_calls += 1
+                stats.http_seconds += perf_counter() - start
+
+    instrumented_send.instrumented = True
+    requests.Session.send = instrumented_send
+
+
+instrument_http()
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def sample_sort_key(key: str):
+    """Sort samples by name and labels, with histogram buckets in increasing le order."""
+    series, _, le = key.partition(',le="')
+    return series, float(le.rstrip('"}').replace("+Inf", "inf")) if le else 0.0
+
+
+class Metrics:
+    def __init__(self, key: str = METRICS_KEY, flush_interval: float = 10.0) -> None:
+        """
+        :param key redis hash where observations from all workers are summed
+        :param flush_interval seconds between writes of buffered observations to redis
+        """
+        self.key = key
+        self.flush_interval = flush_interval
+
+        self._lock = Lock()
+        self._pending: Dict[str, float] = defaultdict(float)
+        self._flush_event = Event()
+        self._flusher_pid: Optional[int] = None
+
+    def _observe(self, name: str, labels: str, value: float, buckets) -> None:
+        for le in buckets:
+            self._pending[f'{name}_bucket{{{labels},le="{le}"}}'] += 1 if value <= le else 0
+        self._pending[f'{name}_bucket{{{labels},le="+Inf"}}'] += 1
+        self._pending[f"{name}_sum{{{labels}}}"] += value
+        self._pending[f"{name}_count{{{labels}}}"] += 1
+
+    def observe_request(self, endpoint: str, method: str, status: int, duration: float, stats: RequestStats) -> None:
+        labels = f'endpoint="{endpoint}",method="{method}"'
+        with self._lock:
+            self._observe(
+                "makeradmin_request_duration_seconds", f'{labels},status="{status}"', duration, REQUEST_DURATION_BUCKETS
+            )
+            self._observe("makeradmin_request_sql_statements", labels, stats.sql_statements, SQL_STATEMENTS_BUCKETS)
+            self._pending[f"makeradmin_request_sql_seconds_total{{{labels}}}"] += stats.sql_seconds
+            self._pending[f"makeradmin_request_http_calls_total{{{labels}}}"] += stats.http_calls
+            self._pending[f"makeradmin_request_http_seconds_total{{{labels}}}"] += stats.http_seconds
+
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while not self._flush_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Add buffered observations to the shared counters in redis."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+
+        if not pending:
+            return
+
+        try:
+            pipeline = redis_connection.pipeline(transaction=False)
+            for key, value in pending.items():
+                pipeline.hincrbyfloat(self.key, key, value)
+            pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"failed to write {len(pending)} metrics to redis: {e}")
+
+    def render(self) -> str:
+        """Metrics of all workers in prometheus text format."""
+        self.flush()
+
+        samples = defaultdict(list)
+        for key, value in redis_connection.hgetall(self.key).items():
+            key = key.decode()
+            name = key.partition("{")[0]
+            family = next((f for f in FAMILIES if name == f or name.startswith(f + "_")), name)
+            samples[family].append((key, float(value)))
+
+        lines = []
+        for family in sorted(samples):
+            type_, help_ = FAMILIES.get(family, ("untyped", ""))
+            lines += [f"# HELP {family} {help_}", f"# TYPE {family} {type_}"]
+            lines += [
+                f"{key} {format_value(value)}"
+                for key, value in sorted(samples[family], key=lambda s: sample_sort_key(s[0]))
+            ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def instrumented(view):
+    """Wrap view to record latency, sql statements and http calls for the endpoint."""
+
+    @wraps(view)
+    def instrumented_view(*args, **kwargs):
+        g.request_stats = stats = RequestStats()
+        start = perf_counter()
+        status = 500
+        try:
+            result = view(*args, **kwargs)
+            if isinstance(result, Response):
+                status = result.status_code
+            elif isinstance(result, tuple):
+                status = result[1]
+            return result
+        except ApiError as e:
+            status = e.code
+            raise
+        finally:
+            metrics.observe_request(request.endpoint, request.method, status, perf_counter() - start, stats)
+
+    return instrumented_view
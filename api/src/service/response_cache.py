@@ -0,0 +1,110 @@
+"""Cache of view data in redis for expensive read only routes, shared by all gunicorn workers.
+
+Entries are keyed by endpoint, view args and the normalized query string, so the view data must only depend on those
+(not on the user). An entry is fresh for ttl seconds. With stale_while_revalidate it is kept that many seconds longer,
+a stale entry is returned directly while one worker (the one that gets the redis lock) computes a new one in a
+background thread, so an expensive view is not computed by every request that finds it expired.
+"""
+
+import json
+from hashlib import sha1
+from logging import getLogger
+from threading import Thread
+from time import time
+from typing import Any, Callable, Optional, Tuple
+
+from flask import copy_current_request_context, current_app, request
+from redis import RedisError
+from redis_cache import redis_connection
+
+from service.db import READ_ONLY_INFO_KEY, db_session
+
+logger = getLogger("makeradmin")
+
+
+def run_in_background(fn: Callable[[], None]) -> None:
+    Thread(target=fn, name="response-cache-refresh", daemon=True).start()
+
+
+class ResponseCache:
+    def __init__(self, ttl: int, stale_while_revalidate: int = 0, lock_timeout: int = 300) -> None:
+        """
+        :param ttl seconds an entry is fresh
+        :param stale_while_revalidate seconds after ttl that an entry is returned while it is recomputed in the
+                                      background, 0 to compute it in the request when expired
+        :param lock_timeout seconds a background recompute may take before another worker may start one
+        """
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.lock_timeout = lock_timeout
+
+    @staticmethod
+    def key() -> str:
+        view_args = sorted((request.view_args or {}).items())
+        query = sorted(request.args.items(multi=True))
+        digest = sha1(json.dumps([view_args, query], default=str).encode()).hexdigest()
+        return f"response_cache:{request.endpoint}:{digest}"
+
+    def read(self, key: str) -> Optional[Tuple[float, Any]]:
+        """(computed at, data) of the entry, None if missing or redis can not be read."""
+        try:
+            value = redis_connection.get(key)
+        except RedisError as e:
+            logger.warning(f"failed to read response cache {key}: {e}")
+            return None
+        if value is None:
+            return None
+        computed_at, data = value.split(b" ", 1)
+        return float(computed_at), json.loads(data)
+
+    def write(self, key: str, data: Any) -> Any:
+        """Store data and return it as read from the cache, so that a miss gives the same response as a hit."""
+        body = current_app.json.dumps(data)
+        try:
+            redis_connection.set(key, f"{time():.3f} {body}", ex=self.ttl + self.stale_while_revalidate)
+        except RedisError as e:
+            logger.warning(f"failed to write response cache {key}: {e}")
+        return json.loads(body)
+
+    def get(self, compute: Callable[[], Any]) -> Any:
+        """Data from the cache, or from compute if missing or expired."""
+        key = self.key()
+        entry = self.read(key)
+        if entry is None:
+            return self.write(key, compute())
+
+        computed_at, data = entry
+        age = time() - computed_at
+        if age < self.ttl:
+            return data
+
+        if age >= self.ttl + self.stale_while_revalidate:
+            return self.write(key, compute())
+
+        self.refresh_in_background(key, compute)
+        return data
+
+    def refresh_in_background(self, key: str, compute: Callable[[], Any]) -> None:
+        lock = f"{key}:lock"
+        try:
+            if not redis_connection.set(lock, 1, nx=True, ex=self.lock_timeout):
+                return
+        except RedisError as e:
+            logger.warning(f"failed to lock response cache {key}: {e}")
+            return
+
+        @copy_current_request_context
+        def refresh() -> None:
+            db_session.info[READ_ONLY_INFO_KEY] = True
+            try:
+                self.write(key, compute())
+            except Exception as e:
+                logger.exception(f"failed to refresh response cache {key}: {e}")
+            finally:
+                db_session.remove()
+                try:
+                    redis_connection.delete(lock)
+                except RedisError as e:
+                    logger.warning(f"failed to unlock response cache {key}: {e}")
+
+        run_in_background(refresh)
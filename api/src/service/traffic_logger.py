@@ -1,22 +1,256 @@
+"""Traffic logging of requests, responses and outgoing service calls, used when debugging.
+
+The request path only collects the raw data and puts a record on a bounded queue. A background thread per process
+redacts and serializes the records and appends them to NDJSON files that are rotated on size and age. If the queue is
+full the record is dropped rather than slowing down the request.
+"""
+
+import atexit
 import json
+import os
+import random
 from datetime import datetime, timezone
-from typing import List
+from logging import getLogger
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, Dict, List, Optional, TextIO
+from urllib.parse import parse_qsl, urlencode
 
 from flask import Request as FlaskRequest
 from flask import g, request
 from flask.wrappers import Response as FlaskResponse
 from requests import PreparedRequest, Response
 
+from service.config import config
+
+logger = getLogger("makeradmin")
+
 
 def byte_decode(data: bytes) -> str:
     return data.decode("utf-8", "backslashreplace")
 
 
-LOGGING_ENABLED = False
+LOG_DIR = config.get("LOG_DIR")
+
+# Traffic is logged next to the service log, so there is nowhere to write it if LOG_DIR is disabled.
+LOGGING_ENABLED = config.get("TRAFFIC_LOG_ENABLED") == "true" and bool(LOG_DIR)
+
+SAMPLE_RATE = float(config.get("TRAFFIC_LOG_SAMPLE_RATE"))
+
+LOG_LIMIT = 64 * 1024
+
+REDACTED = "<redacted>"
+
+# Header, query parameter and json/form body keys (lower case) that are never written to the log.
+REDACTED_KEYS = frozenset(
+    (
+        "authorization",
+        "cookie",
+        "set-cookie",
+        "stripe-signature",
+        "password",
+        "unhashed_password",
+        "access_token",
+        "token",
+        "reset_token",
+        "pin_code",
+        "client_secret",
+        "secret",
+    )
+)
+
+
+def redact(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: REDACTED if str(k).lower() in REDACTED_KEYS else redact(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [redact(v) for v in obj]
+    return obj
+
+
+def redact_body(body: Optional[str]) -> Optional[str]:
+    """Redact a json or form encoded body, other bodies are returned as is."""
+    if not body:
+        return body
+    try:
+        return json.dumps(redact(json.loads(body)), ensure_ascii=False)
+    except ValueError:
+        pass
+    if "=" in body and " " not in body:
+        return urlencode([(k, REDACTED if k.lower() in REDACTED_KEYS else v) for k, v in parse_qsl(body)])
+    return body
+
+
+class TrafficLogWriter:
+    """Appends traffic records to NDJSON files from a background thread."""
+
+    def __init__(
+        self, directory: str, max_file_bytes: int, rotate_seconds: float, queue_size: int = 10000, batch_size: int = 100
+    ) -> None:
+        """
+        :param directory where log files are written, files are named traffic_<start time>_<pid>.ndjson
+        :param max_file_bytes start a new file when the current file is larger than this
+        :param rotate_seconds start a new file when the current file is older than this
+        :param queue_size max number of records waiting to be written, new records are dropped when full
+        :param batch_size max number of records written before flushing the file
+        """
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.rotate_seconds = rotate_seconds
+        self.batch_size = batch_size
+
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.dropped = 0
+
+        self._lock = Lock()
+        self._dropped_lock = Lock()
+        self._writer_pid: Optional[int] = None
+        self._file: Optional[TextIO] = None
+        self._file_opened = 0.0
+
+    def put(self, record: Dict[str, Any]) -> None:
+        """Queue record for writing, this is all the work done in the request."""
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+
+        with self._lock:
+            if self._writer_pid == pid:
+                return
+            self._writer_pid = pid
+            self._file = None
+            Thread(target=self._write_loop, name="traffic-log-writer", daemon=True).start()
+
+    def _write_loop(self) -> None:
+        while True:
+            self.write_pending(block=True)
+
+    def write_pending(self, block: bool = False) -> None:
+        """Write queued records, if block wait for the first one."""
+        batch = []
+        try:
+            batch.append(self.queue.get(block=block, timeout=1.0 if block else None))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except Empty:
+            pass
+
+        if not batch:
+            return
+
+        try:
+            file = self._current_file()
+            for record in batch:
+                file.write(json.dumps(serialize(record), ensure_ascii=False) + "\n")
+            file.flush()
+        except Exception:
+            logger.exception(f"failed to write {len(batch)} traffic log records")
+
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning(f"traffic log queue full, dropped {dropped} records")
+
+    def _current_file(self) -> TextIO:
+        if self._file is not None and (
+            self._file.tell() > self.max_file_bytes or monotonic() - self._file_opened > self.rotate_seconds
+        ):
+            self._file.close()
+            self._file = None
+
+        if self._file is None:
+            start = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+            self._file = open(os.path.join(self.directory, f"traffic_{start}_{os.getpid()}.ndjson"), "a")
+            self._file_opened = monotonic()
+
+        return self._file
+
+    def close(self) -> None:
+        """Write everything still in the queue, used at exit."""
+        while not self.queue.empty():
+            self.write_pending()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+traffic_log_writer = TrafficLogWriter(
+    # Parent dir because the docker container runs with 'src' as the work directory, same as the service log.
+    directory=os.path.join("..", LOG_DIR or ""),
+    max_file_bytes=int(config.get("TRAFFIC_LOG_MAX_FILE_BYTES")),
+    rotate_seconds=float(config.get("TRAFFIC_LOG_ROTATE_SECONDS")),
+)
+
+if LOGGING_ENABLED:
+    atexit.register(traffic_log_writer.close)
+
+
+def serialize(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a raw record collected in the request into the redacted log structure, runs in the writer thread."""
+    session_request = record["request"]
+    session_response = record["response"]
+
+    request_data = {
+        "date": record["create_time"],
+        "method": session_request["method"],
+        "url": session_request["path"],
+        "headers": redact(session_request["headers"]),
+        "query": redact(session_request["query"]),
+    }
+    response_data = {
+        "date": record["commit_time"],
+        "status": session_response["status"],
+        "headers": redact(session_response["headers"]),
+    }
+
+    if session_request["method"] == "GET":
+        data = session_response["data"]
+        response_data["data"] = redact_body(byte_decode(data)) if isinstance(data, bytes) else data
+    else:
+        data = session_request["data"]
+        request_data["data"] = redact_body(byte_decode(data)) if isinstance(data, bytes) else data
+
+    return {
+        "ip": record["ip"],
+        "host": record["host"],
+        "request": request_data,
+        "service_traffic": [
+            {
+                "timeElapsed": traffic["timeElapsed"],
+                "request": {
+                    **traffic["request"],
+                    "headers": redact(traffic["request"]["headers"]),
+                    "body": redact_body(
+                        byte_decode(traffic["request"]["body"])
+                        if isinstance(traffic["request"]["body"], bytes)
+                        else traffic["request"]["body"]
+                    ),
+                },
+                "response": {
+                    **traffic["response"],
+                    "headers": redact(traffic["response"]["headers"]),
+                    "data": byte_decode(traffic["response"]["data"])
+                    if isinstance(traffic["response"]["data"], bytes)
+                    else traffic["response"]["data"],
+                },
+            }
+            for traffic in record["service_traffic"]
+        ],
+        "response": response_data,
+    }
 
 
 class TrafficLogger:
-    LOG_LIMIT = 64 * 1024
+    LOG_LIMIT = LOG_LIMIT
     service_traffic: List[object]
 
     def __init__(self) -> None:
@@ -24,66 +258,65 @@ class TrafficLogger:
         self.service_traffic = list()
 
     def log_service_traffic(self, traffic: Response) -> None:
+        """Collect the raw outgoing request and response, decoding and redaction is done by the writer."""
         req: PreparedRequest = traffic.request
-        req_body = byte_decode(req.body) if isinstance(req.body, bytes) else req.body
 
-        req_data = {"method": req.method, "url": req.url, "headers": dict(req.headers), "body": req_body}
+        req_data = {"method": req.method, "url": req.url, "headers": dict(req.headers), "body": req.body}
         resp_data = {
             "status": traffic.status_code,
             "headers": dict(traffic.headers),
-            "data": traffic.text if len(traffic.content) < self.LOG_LIMIT else "<content too large for logging>",
+            "data": traffic.content if len(traffic.content) < self.LOG_LIMIT else "<content too large for logging>",
         }
         self.service_traffic.append(
             {"timeElapsed": traffic.elapsed.total_seconds(), "request": req_data, "response": resp_data}
         )
 
     def commit(self, session_request: FlaskRequest, session_response: FlaskResponse) -> None:
+        """Collect the raw request and response data and queue it, serialization is done by the writer."""
         method = session_request.method
-        session_request_data = {
-            "date": self.create_time,
-            "method": method,
-            "url": session_request.path,
-            "headers": dict(session_request.headers),
-            "query": session_request.args,
-        }
-        session_response_data = {
-            "date": datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z",
-            "status": session_response.status_code,
-            "headers": dict(session_response.headers),
-        }
 
         if method == "GET":
-            if len(session_response.data) > self.LOG_LIMIT:
-                data = "<content too large for logging>"
-            # Webship images are unnecessary and large
+            if session_response.is_streamed:
+                data = "<streamed content>"
             elif session_request.path.startswith("/webshop/image/"):
+                # Webship images are unnecessary and large
                 data = "<skipping image content>"
-            else:
-                data = byte_decode(session_response.data)
-            session_response_data["data"] = data
-
-        if method != "GET":
-            if (session_request.content_length or 0) > self.LOG_LIMIT:
+            elif (session_response.content_length or 0) > self.LOG_LIMIT:
                 data = "<content too large for logging>"
             else:
-                data = session_request.get_data(as_text=True)
-            session_request_data["data"] = data
-
-        traffic_data = {
-            "ip": session_request.remote_addr,
-            "host": session_request.host,
-            "request": session_request_data,
-            "service_traffic": self.service_traffic,
-            "response": session_response_data,
-        }
-        with open(f"/work/logs/{self.create_time}_{session_request.remote_addr}_{method}.json", "w") as file:
-            json.dump(traffic_data, file, ensure_ascii=False)
+                data = session_response.get_data()
+        elif (session_request.content_length or 0) > self.LOG_LIMIT:
+            data = "<content too large for logging>"
+        else:
+            data = session_request.get_data()
+
+        traffic_log_writer.put(
+            {
+                "create_time": self.create_time,
+                "commit_time": datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z",
+                "ip": session_request.remote_addr,
+                "host": session_request.host,
+                "request": {
+                    "method": method,
+                    "path": session_request.path,
+                    "headers": dict(session_request.headers),
+                    "query": session_request.args.to_dict(),
+                    "data": data if method != "GET" else None,
+                },
+                "response": {
+                    "status": session_response.status_code,
+                    "headers": dict(session_response.headers),
+                    "data": data if method == "GET" else None,
+                },
+                "service_traffic": self.service_traffic,
+            }
+        )
 
 
 def traffic_logger_init() -> None:
-    """Add TrafficLogger instance to global object."""
+    """Add TrafficLogger instance to global object, for the sampled share of requests."""
 
-    if LOGGING_ENABLED:
+    if LOGGING_ENABLED and random.random() < SAMPLE_RATE:
         # Create traffic logger object.
         g.traffic_logger = TrafficLogger()
 
@@ -91,14 +324,14 @@ def traffic_logger_init() -> None:
 def log_traffic(traffic: Response) -> None:
     """Log traffic to global object."""
 
-    if LOGGING_ENABLED:
-        traffic_logger: TrafficLogger = g.traffic_logger
+    traffic_logger: Optional[TrafficLogger] = g.get("traffic_logger")
+    if traffic_logger:
         traffic_logger.log_service_traffic(traffic)
 
 
 def traffic_logger_commit(response: FlaskResponse) -> None:
-    """Write TrafficLogger data."""
+    """Queue TrafficLogger data for writing."""
 
-    if LOGGING_ENABLED:
-        traffic_logger: TrafficLogger = g.traffic_logger
+    traffic_logger: Optional[TrafficLogger] = g.get("traffic_logger")
+    if traffic_logger:
         traffic_logger.commit(request, response)
@@ -1,7 +1,10 @@
+import sys
 from contextlib import closing
 from datetime import date, datetime
+from importlib.util import LazyLoader, find_spec, module_from_spec
 from socket import AF_INET, SOCK_STREAM, socket
 from time import perf_counter, sleep
+from types import ModuleType
 from typing import Optional
 
 
@@ -42,3 +45,18 @@ def dt_to_str(d: Optional[datetime]) -> Optional[str]:
     if d is None:
         return None
     return d.isoformat()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import module name on first attribute access instead of now. The module is put in sys.modules so that later
+    imports of it anywhere get the lazy module, use for heavy dependencies that are only needed by some code paths.
+    Anything that reads an attribute at import time, like type annotations or from imports, loads it."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = find_spec(name)
+    loader = LazyLoader(spec.loader)
+    spec.loader = loader
+    module = module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
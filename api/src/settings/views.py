@@ -11,7 +11,7 @@ from settings import service
 from settings.models import Setting, _parse_value, _serialize_value, all_setting_properties, get_setting_property
 
 
-@service.route("/public", permission=PUBLIC, method=GET)
+@service.route("/public", permission=PUBLIC, method=GET, cacheable=True)
 def list_public_settings():
     """List all public settings (no authentication required).
 
@@ -1,4 +1,3 @@
-import stripe
 from service.config import config
 from service.internal_service import InternalService
 
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 from decimal import Decimal
@@ -10,7 +12,7 @@ from membership.models import Member
 from service.config import debug_mode
 from service.db import db_session
 from service.error import EXCEPTION, BadRequest, InternalServerError
-from stripe import CardError, Charge, InvalidRequestError, PaymentIntent, StripeError
+from service.util import lazy_import
 
 from shop.models import Transaction
 from shop.stripe_charge import get_stripe_charges
@@ -24,6 +26,8 @@ from shop.stripe_constants import (
 from shop.stripe_customer import get_and_sync_stripe_customer
 from shop.stripe_util import convert_from_stripe_amount, convert_to_stripe_amount, replace_default_payment_method, retry
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
@@ -38,7 +42,7 @@ class CompletedPayment(DataClassJsonMixin):
 
 
 def convert_completed_stripe_charges_to_payments(
-    stripe_charges: List[Charge],
+    stripe_charges: List[stripe.Charge],
 ) -> Dict[int, CompletedPayment]:
     payments: Dict[int, CompletedPayment] = {}
     for charge in stripe_charges:
@@ -94,6 +98,6 @@ def get_completed_payments_from_stripe(start_date: datetime, end_date: datetime)
 
     try:
         stripe_charges = get_stripe_charges(start_date, end_date)
-    except StripeError as e:
+    except stripe.StripeError as e:
         raise BadRequest(message=f"Failed to fetch stripe payment intents: {e}")
     return convert_completed_stripe_charges_to_payments(stripe_charges)
@@ -70,6 +70,7 @@ product_action_entity = Entity(ProductAction)
 product_image_entity = ProductImageEntity(
     ProductImage,
     search_columns=("name",),
+    deferred_columns=("data",),
 )
 
 
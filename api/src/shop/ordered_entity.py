@@ -27,3 +27,18 @@ class OrderedEntity(Entity):
         except Exception:
             db_session.rollback()
             raise
+
+    def bulk_create(self, items: list | None = None):
+        if items is None:
+            items = self._get_bulk_items("items")
+
+        max_display_order = db_session.query(func.max(self.model.display_order)).with_for_update().scalar() or 0
+        for item in items:
+            if isinstance(item, dict) and item.get("display_order") is None:
+                max_display_order += 1
+                item["display_order"] = max_display_order
+        try:
+            return super().bulk_create(items)
+        except Exception:
+            db_session.rollback()
+            raise
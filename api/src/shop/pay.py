@@ -5,7 +5,6 @@ from decimal import Decimal
 from logging import getLogger
 from typing import Any, List, Optional
 
-import stripe
 from basic_types.enums import PriceLevel
 from core import auth
 from dataclasses_json import DataClassJsonMixin
@@ -13,6 +12,7 @@ from membership.models import Member, Span
 from membership.views import member_entity
 from service.db import db_session
 from service.error import BadRequest, UnprocessableEntity
+from service.util import lazy_import
 
 from shop.models import Product, StripePending, Transaction, TransactionAction, TransactionContent
 from shop.stripe_constants import MakerspaceMetadataKeys
@@ -32,6 +32,8 @@ from shop.stripe_subscriptions import (
 from shop.stripe_util import retry
 from shop.transactions import Purchase, create_transaction
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
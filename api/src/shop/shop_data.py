@@ -7,6 +7,7 @@ import sqlalchemy
 from membership.views import member_entity
 from service.db import db_session
 from service.error import InternalServerError, NotFound
+from service.etag import ModelVersion
 from sqlalchemy import JSON, desc
 from sqlalchemy.orm import contains_eager, joinedload
 from sqlalchemy.orm.exc import NoResultFound
@@ -18,12 +19,14 @@ from shop.entities import (
     transaction_content_entity,
     transaction_entity,
 )
-from shop.models import Product, ProductAction, ProductCategory, Transaction, TransactionContent
+from shop.models import Product, ProductAction, ProductCategory, ProductImage, Transaction, TransactionContent
 from shop.stripe_constants import MakerspaceMetadataKeys
 from shop.transactions import pending_actions_query
 
 logger = getLogger("makeradmin")
 
+product_data_version = ModelVersion("product_data", Product, ProductCategory, ProductImage)
+
 
 def pending_actions(member_id: Optional[int] = None) -> List[Any]:
     query = pending_actions_query(member_id)
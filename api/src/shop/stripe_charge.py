@@ -1,21 +1,24 @@
+from __future__ import annotations
+
 from datetime import date, datetime, timezone
 from logging import getLogger
 from typing import Dict, List, Never, Optional
 from zoneinfo import ZoneInfo
 
-import stripe
 from service.error import EXCEPTION, InternalServerError
-from stripe import CardError, InvalidRequestError, StripeError
+from service.util import lazy_import
 
 from shop.models import Transaction
 from shop.stripe_constants import CURRENCY, ChargeStatus, MakerspaceMetadataKeys
 from shop.stripe_util import convert_to_stripe_amount, retry
 from shop.transactions import PaymentFailed, payment_success
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
-def raise_from_stripe_invalid_request_error(e: InvalidRequestError) -> Never:
+def raise_from_stripe_invalid_request_error(e: stripe.InvalidRequestError) -> Never:
     if "Amount must convert to at least" in str(e) or "Amount must be at least" in str(e):
         raise PaymentFailed("Total amount too small total, least chargable amount is around 5 SEK.")
 
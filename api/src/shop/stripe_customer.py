@@ -1,17 +1,20 @@
+from __future__ import annotations
+
 from logging import getLogger
 from typing import Any, Dict, Optional
 
-import stripe
 from membership.models import Member
 from service.db import db_session
 from service.error import BadRequest, InternalServerError, NotFound
-from stripe import InvalidRequestError
+from service.util import lazy_import
 
 from shop.stripe_constants import (
     MakerspaceMetadataKeys as MSMetaKeys,
 )
 from shop.stripe_util import are_metadata_dicts_equivalent, retry
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
@@ -29,7 +32,7 @@ def get_stripe_customer(makeradmin_member: Member) -> stripe.Customer | None:
         return None
     try:
         customer = retry(lambda: stripe.Customer.retrieve(stripe_customer_id))
-    except InvalidRequestError as e:
+    except stripe.InvalidRequestError as e:
         logger.warning(
             f"failed to retrive customer from stripe for makeradmin member with id {makeradmin_member.member_id}, {e}"
         )
@@ -1,15 +1,19 @@
+from __future__ import annotations
+
 import time
 from dataclasses import dataclass
 from decimal import Decimal
 from enum import Enum
 from typing import TYPE_CHECKING, Dict, List, Optional
 
-import stripe
 from basic_types.enums import PriceLevel
+from service.util import lazy_import
 
 from shop.stripe_constants import MakerspaceMetadataKeys
 from shop.stripe_util import retry
 
+stripe = lazy_import("stripe")
+
 if TYPE_CHECKING:
     from membership.models import Member
 
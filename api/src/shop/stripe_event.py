@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import random
 import time
 from datetime import datetime, timezone
@@ -6,11 +8,10 @@ from logging import getLogger
 from math import ceil
 from typing import Any, Dict, List, Optional, cast
 
-import stripe
 from membership.models import Member
 from service.db import db_session
 from service.error import BadRequest, InternalServerError
-from stripe import RateLimitError, SignatureVerificationError
+from service.util import lazy_import
 
 import shop.transactions
 from shop import stripe_subscriptions
@@ -37,6 +38,8 @@ from shop.transactions import (
     get_source_transaction,
 )
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
@@ -380,7 +383,7 @@ def stripe_event(event: stripe.Event, current_time: datetime) -> None:
             with db_session.begin_nested():
                 _stripe_event_inner(event, current_time)
                 break
-        except RateLimitError:
+        except stripe.RateLimitError:
             logger.warning("Exceeded Stripe API rate limit. Waiting a bit...")
             # This is most likely because we are running tests in parallel.
             # Add some jitter to avoid the stripe tests from running so much in parallel.
@@ -437,7 +440,7 @@ def stripe_callback(data: Any, headers: Dict[str, Any]) -> None:
 
         signature = headers["Stripe-Signature"]
         event = stripe.Webhook.construct_event(data, signature, STRIPE_SIGNING_SECRET)
-    except (KeyError, SignatureVerificationError) as e:
+    except (KeyError, stripe.SignatureVerificationError) as e:
         raise BadRequest(log=f"failed to process stripe callback: {str(e)}")
 
     stripe_event(event, current_time=datetime.now(timezone.utc))
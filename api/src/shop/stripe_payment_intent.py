@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 from decimal import Decimal
@@ -6,13 +8,12 @@ from logging import getLogger
 from typing import Dict, List, Optional
 from zoneinfo import ZoneInfo
 
-import stripe
 from dataclasses_json import DataClassJsonMixin
 from membership.models import Member
 from service.config import debug_mode
 from service.db import db_session
 from service.error import EXCEPTION, BadRequest, InternalServerError
-from stripe import CardError, InvalidRequestError, PaymentIntent, StripeError
+from service.util import lazy_import
 from typing_extensions import Never
 
 from shop.models import StripePending, Transaction
@@ -27,10 +28,12 @@ from shop.stripe_customer import get_and_sync_stripe_customer
 from shop.stripe_util import convert_from_stripe_amount, convert_to_stripe_amount, replace_default_payment_method, retry
 from shop.transactions import PaymentFailed, commit_fail_transaction, payment_success
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
-def raise_from_stripe_invalid_request_error(e: InvalidRequestError) -> Never:
+def raise_from_stripe_invalid_request_error(e: stripe.InvalidRequestError) -> Never:
     if "Amount must convert to at least" in str(e) or "Amount must be at least" in str(e):
         raise PaymentFailed("Total amount too small total, least chargable amount is around 5 SEK.")
 
@@ -58,7 +61,7 @@ class PartialPayment(DataClassJsonMixin):
     action_info: Optional[PaymentAction]
 
 
-def create_action_required_response(transaction: Transaction, payment_intent: PaymentIntent) -> PaymentAction:
+def create_action_required_response(transaction: Transaction, payment_intent: stripe.PaymentIntent) -> PaymentAction:
     """The payment_intent requires customer action to be confirmed. Create response to client"""
 
     try:
@@ -84,7 +87,7 @@ def create_action_required_response(transaction: Transaction, payment_intent: Pa
         raise
 
 
-def create_client_response(transaction: Transaction, payment_intent: PaymentIntent) -> Optional[PaymentAction]:
+def create_client_response(transaction: Transaction, payment_intent: stripe.PaymentIntent) -> Optional[PaymentAction]:
     status = PaymentIntentStatus(payment_intent.status)
     if status == PaymentIntentStatus.REQUIRES_ACTION:
         """Requires further action on client side."""
@@ -131,7 +134,7 @@ def confirm_stripe_payment_intent(transaction_id: int) -> PartialPayment:
         # In case transaction was updated after stripe charge event, no action needed.
         try:
             action_info = create_client_response(transaction, payment_intent)
-        except CardError as e:
+        except stripe.CardError as e:
             # Reason can be for example: 'Your card's security code is incorrect'.
             commit_fail_transaction(transaction)
             err = PaymentFailed(log=f"Payment failed: {str(e)}", level=EXCEPTION)
@@ -202,12 +205,12 @@ def pay_with_stripe(
             f"created stripe payment_intent for transaction {transaction.id}, payment_intent id {payment_intent.id}"
         )
         return payment_intent
-    except CardError as e:
+    except stripe.CardError as e:
         # Reason can be for example: 'Your card was declined. This transaction requires authentication'.
         # It seems weird that it fails already when trying to create the payment intent, but it has been observed.
         commit_fail_transaction(transaction)
         err = PaymentFailed(log=f"Payment failed: {str(e)}", level=EXCEPTION)
         err.message = e.user_message
         raise err
-    except InvalidRequestError as e:
+    except stripe.InvalidRequestError as e:
         raise_from_stripe_invalid_request_error(e)
@@ -1,10 +1,12 @@
+from __future__ import annotations
+
 from dataclasses import asdict, dataclass
 from logging import getLogger
 from typing import Any, Dict, List, Tuple
 
-import stripe
 from service.db import db_session
 from service.error import InternalServerError
+from service.util import lazy_import
 
 from shop.models import Product
 from shop.stripe_constants import (
@@ -14,6 +16,8 @@ from shop.stripe_constants import (
 )
 from shop.stripe_util import StripeInterval, get_subscription_category, retry, stripe_amount_from_makeradmin_product
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 makeradmin_unit_to_stripe_unit = {
@@ -1,14 +1,16 @@
 from logging import getLogger
 
-import stripe
 from service.config import debug_mode
 from service.db import db_session
+from service.util import lazy_import
 from test_aid.systest_config import STRIPE_PRIVATE_KEY, STRIPE_PUBLIC_KEY
 
 from shop.models import Product, ProductCategory
 from shop.stripe_product_price import get_and_sync_stripe_product_and_prices
 from shop.stripe_util import get_subscription_category
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
@@ -1,16 +1,19 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
-import stripe
 from service.error import BadRequest, InternalServerError
-from stripe import CardError, SetupIntent
+from service.util import lazy_import
 
 from shop.stripe_constants import PaymentIntentNextActionType, SetupIntentStatus
 from shop.stripe_payment_intent import PaymentAction
 from shop.stripe_util import replace_default_payment_method
 from shop.transactions import PaymentFailed
 
+stripe = lazy_import("stripe")
+
 
 class SetupIntentResult(str, Enum):
     Success = "success"
@@ -26,7 +29,7 @@ class SetupIntentFailed(Exception):
     error: Optional[str] = None
 
 
-def check_next_action(intent: SetupIntent) -> PaymentAction:
+def check_next_action(intent: stripe.SetupIntent) -> PaymentAction:
     """The payment_intent requires customer action to be confirmed. Create response to client"""
     next_action_type = PaymentIntentNextActionType(intent["next_action"]["type"])
 
@@ -54,7 +57,7 @@ def handle_setup_intent(setup_intent: stripe.SetupIntent) -> None:
         elif status == SetupIntentStatus.REQUIRES_CONFIRMATION:
             try:
                 setup_intent = stripe.SetupIntent.confirm(setup_intent.id)
-            except CardError as e:
+            except stripe.CardError as e:
                 assert e.error is not None
                 # This can happen if the card was declined in *some* cases.
                 # In particular, it happens if you try to use a real card in a testing environment.
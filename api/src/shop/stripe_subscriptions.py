@@ -1,3 +1,7 @@
+from __future__ import annotations
+
+from service.util import lazy_import
+
 """
 This module contains the logic for handling Stripe subscriptions.
 
@@ -32,14 +36,12 @@ from enum import Enum
 from logging import getLogger
 from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar, cast
 
-import stripe
 from basic_types.enums import PriceLevel
 from membership.membership import get_membership_summary
 from membership.models import Member
 from service.db import db_session
 from service.error import BadRequest, InternalServerError, NotFound
 from sqlalchemy import func
-from stripe import InvalidRequestError
 
 from shop.models import Product, ProductAction, ProductCategory
 from shop.stripe_constants import (
@@ -56,6 +58,8 @@ from shop.stripe_product_price import get_and_sync_stripe_product_and_prices
 from shop.stripe_setup import are_stripe_keys_set
 from shop.stripe_util import are_metadata_dicts_equivalent, convert_from_stripe_amount, retry
 
+stripe = lazy_import("stripe")
+
 
 class SubscriptionType(str, Enum):
     MEMBERSHIP = "membership"
@@ -324,7 +328,7 @@ def resume_paused_subscription(
 
     try:
         subscription = retry(lambda: stripe.Subscription.retrieve(subscription_id))
-    except InvalidRequestError as e:
+    except stripe.InvalidRequestError as e:
         if e.code == "resource_missing":
             # The subscription was deleted.
             # We might have missed the webhook to delete the reference from the member.
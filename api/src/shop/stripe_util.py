@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import random
 import time
 from dataclasses import dataclass
@@ -6,14 +8,16 @@ from decimal import Decimal
 from logging import getLogger
 from typing import Any, Callable, Dict, TypeVar
 
-import stripe
 from service.db import db_session
 from service.error import InternalServerError
+from service.util import lazy_import
 from sqlalchemy import func
 
 from shop.models import Product, ProductCategory
 from shop.stripe_constants import STRIPE_CURRENTY_BASE, PriceType
 
+stripe = lazy_import("stripe")
+
 logger = getLogger("makeradmin")
 
 
@@ -47,6 +47,7 @@ from shop.shop_data import (
     get_product_data,
     member_history,
     pending_actions,
+    product_data_version,
     receipt,
 )
 from shop.statistics import category_sales, product_sales
@@ -78,6 +79,7 @@ service.entity_routes(
     permission_create=WEBSHOP_EDIT,
     permission_update=WEBSHOP_EDIT,
     permission_delete=WEBSHOP_EDIT,
+    bulk=True,
 )
 
 
@@ -207,17 +209,17 @@ service.entity_routes(
 )
 
 
-@service.route("/member/current/pending_actions", method=GET, permission=USER)
+@service.route("/member/current/pending_actions", method=GET, permission=USER, cacheable=True)
 def pending_actions_for_member():
     return pending_actions(g.user_id)
 
 
-@service.route("/member/current/transactions", method=GET, permission=USER)
+@service.route("/member/current/transactions", method=GET, permission=USER, cacheable=True)
 def transactions_for_member():
     return member_history(g.user_id)
 
 
-@service.route("/member/current/receipt/<int:transaction_id>", method=GET, permission=USER)
+@service.route("/member/current/receipt/<int:transaction_id>", method=GET, permission=USER, cacheable=True)
 def receipt_for_member(transaction_id):
     return receipt(g.user_id, transaction_id)
 
@@ -248,7 +250,7 @@ def cancel_subscriptions_route() -> Any:
     return cancel_subscriptions(data, g.user_id)
 
 
-@service.route("/member/current/subscriptions", method=GET, permission=USER)
+@service.route("/member/current/subscriptions", method=GET, permission=USER, cacheable=True)
 def list_subscriptions_route() -> Any:
     return list_subscriptions(g.user_id)
 
@@ -267,22 +269,34 @@ def ship_labaccess_orders_endpoint(member_id: int) -> None:
         raise PreconditionFailed(message=str(e))
 
 
-@service.route("/product_data", method=GET, permission=PUBLIC)
+# Allow caching of product data for a short amount of time, revalidation is cheap thanks to the version ETag.
+PRODUCT_DATA_CACHE_CONTROL = f"public, max-age={60 * 60 * 24}"
+
+
+@service.route(
+    "/product_data",
+    method=GET,
+    permission=PUBLIC,
+    cacheable=True,
+    version=lambda: product_data_version.get(),
+    cache_control=PRODUCT_DATA_CACHE_CONTROL,
+)
 def shop_data():
     response = jsonify({"status": "ok", "data": all_product_data()})
-
-    # Allow caching of this response for a short amount of time
-    response.headers["Cache-Control"] = f"public, max-age={60 * 60 * 24}"
     response.headers["Vary"] = "Accept-Encoding"
     return response
 
 
-@service.route("/product_data/<int:product_id>", method=GET, permission=PUBLIC)
+@service.route(
+    "/product_data/<int:product_id>",
+    method=GET,
+    permission=PUBLIC,
+    cacheable=True,
+    version=lambda product_id: product_data_version.get(),
+    cache_control=PRODUCT_DATA_CACHE_CONTROL,
+)
 def product_data(product_id):
     response = jsonify({"status": "ok", "data": get_product_data(product_id)})
-
-    # Allow caching of this response for a short amount of time
-    response.headers["Cache-Control"] = f"public, max-age={60 * 60 * 24}"
     response.headers["Vary"] = "Accept-Encoding"
     return response
 
@@ -1,146 +1,51 @@
-import itertools
 import math
 import time
 from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta, timezone
+from itertools import chain, groupby
 from logging import getLogger
-from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, cast
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, cast
 
 import sqlalchemy
 from dataclasses_json import DataClassJsonMixin, config
-from membership.membership import get_members_and_membership, get_membership_summaries
+from membership.membership import get_members_and_membership, get_membership_summaries_by_member
 from membership.models import Member, Span
+from membership.span_timeline import SpanTimeline
 from quiz.models import QuizAnswer, QuizQuestion, QuizQuestionOption
 from service.db import db_session
 from service.util import format_datetime
 from shop.entities import category_entity, product_entity
 from shop.models import Product, ProductCategory, Transaction, TransactionContent
-from sqlalchemy import ColumnElement, Date, func, select, text
+from sqlalchemy import ColumnElement, Date, Row, Select, and_, func, select
 
 logger = getLogger("statistics")
 
+STREAM_BATCH_SIZE = 1000
 
-def spans_by_date(span_type: str) -> List[Tuple[str, int]]:
-    """Number of active spans of a given type indexed by a date string"""
-    spans = db_session.query(Span).filter(Span.type == span_type, Span.deleted_at == None).all()
 
-    events = []
-    for span in spans:
-        # Make sure we calculate the correct number of members on the day before the span starts
-        events.append((span.startdate - timedelta(days=1), 0, span.member_id))
-        events.append((span.startdate, 1, span.member_id))
-        events.append((span.enddate, 0, span.member_id))
-        # enddate is inclusive, so membership is lost on the day after enddate
-        events.append((span.enddate + timedelta(days=1), -1, span.member_id))
-
-    # Note: The order of the events within a single day does not matter.
-    # The result will be calculated after all events in a day have been processed.
-    events.sort(key=lambda x: x[0])
-
-    counter = 0
-    active_members: Dict[int, int] = dict()
-    result: List[Tuple[date, int]] = []
-    if len(events) == 0:
-        return []
-
-    current_date = events[0][0]
-    for d, delta, member_id in events:
-        if current_date < d:
-            result.append((current_date, counter))
-            current_date = d
-
-        # Need to handle overlapping spans, to avoid double counting members
-        new_count = active_members.get(member_id, 0) + delta
-        active_members[member_id] = new_count
-        if delta == 1 and new_count == 1:
-            counter += 1
-        elif delta == -1 and new_count == 0:
-            counter -= 1
-
-    result.append((current_date, counter))
-
-    return [(date.strftime("%Y-%m-%d"), count) for (date, count) in result]
-
-
-def membership_number_months(membership_type: str, startdate: date, enddate: date) -> List[int]:
-    """Of all members who became members before startdate, how many months have they had active lab membership between startdate and enddate. Returns a mapping of month count to member counts."""
+def months_active_histogram(membership_type: str, members: Select, startdate: date, enddate: date) -> List[int]:
+    """Number of members (selected by members) active for exactly N months between startdate and enddate, indexed by
+    N."""
     total_months = math.ceil((enddate - startdate).days / 30)
+    member_ids = db_session.scalars(members).all()
+    timeline = SpanTimeline.load(membership_type, members, startdate, enddate)
 
-    spans = (
-        db_session.query(Member.member_id, Span.startdate, Span.enddate)
-        .join(Member.spans)
-        .filter(
-            Member.created_at <= startdate,
-            Span.startdate < enddate,
-            Span.enddate > startdate,
-            Span.type == membership_type,
-        )
-        .all()
-    )
-    valid_members = db_session.query(Member.member_id).filter(Member.created_at <= startdate).all()
-    amount_by_member = {}
-
-    for (member_id,) in valid_members:
-        amount_by_member[member_id] = timedelta(days=0)
-
-    for member_id, span_startdate, span_enddate in spans:
-        span_startdate: datetime = max(span_startdate, startdate)
-        span_enddate: datetime = min(span_enddate, enddate)
-        length = span_enddate - span_startdate
-        amount_by_member[member_id] += length
-
-    # Number of members active for exactly N months during this period
     members_active_for_months = [0] * (total_months + 1)
-    for _, member_time in amount_by_member.items():
-        days = member_time.days
-        months = round(days / 30)
-        if months > total_months:
-            print(f"Unexpected high month count: {months}")
-            months = total_months
-        assert months <= total_months
-        members_active_for_months[months] += 1
+    for days in timeline.days_covered_by_member(member_ids, startdate, enddate - timedelta(days=1)):
+        members_active_for_months[min(round(days / 30), total_months)] += 1
 
     return members_active_for_months
 
 
-def membership_number_months2(membership_type: str, startdate: date, enddate: date) -> List[int]:
+def membership_number_months(membership_type: str, startdate: date, enddate: date) -> List[int]:
     """Of all members who became members before startdate, how many months have they had active lab membership between startdate and enddate. Returns a mapping of month count to member counts."""
-    total_months = math.ceil((enddate - startdate).days / 30)
+    members = select(Member.member_id).filter(Member.created_at <= startdate)
+    return months_active_histogram(membership_type, members, startdate, enddate)
 
-    spans = (
-        db_session.query(Member.member_id, Span.startdate, Span.enddate)
-        .join(Member.spans)
-        .filter(
-            Span.startdate < enddate,
-            Span.enddate > startdate,
-            Span.type == membership_type,
-        )
-        .all()
-    )
-    valid_members = db_session.query(Member.member_id).all()
-    amount_by_member = {}
-
-    for (member_id,) in valid_members:
-        amount_by_member[member_id] = timedelta(days=0)
-
-    for member_id, span_startdate, span_enddate in spans:
-        span_startdate: datetime = max(span_startdate, startdate)
-        span_enddate: datetime = min(span_enddate, enddate)
-        length = span_enddate - span_startdate
-        amount_by_member[member_id] += length
 
-    # Number of members active for exactly N months during this period
-    members_active_for_months = [0] * (total_months + 1)
-    for _, member_time in amount_by_member.items():
-        days = member_time.days
-        months = round(days / 30)
-        if months > total_months:
-            print(f"Unexpected high month count: {months}")
-            months = total_months
-        assert months <= total_months
-        members_active_for_months[months] += 1
-
-    return members_active_for_months
+def membership_number_months2(membership_type: str, startdate: date, enddate: date) -> List[int]:
+    """Of all members who became members before startdate, how many months have they had active lab membership between startdate and enddate. Returns a mapping of month count to member counts."""
+    return months_active_histogram(membership_type, select(Member.member_id), startdate, enddate)
 
 
 def membership_number_months_default():
@@ -161,31 +66,6 @@ def membership_number_months2_default():
     }
 
 
-def membership_by_date_statistics():
-    return {
-        "membership": spans_by_date("membership"),
-        "labaccess": spans_by_date("labaccess"),
-    }
-
-
-def lasertime() -> List[Tuple[str, int]]:
-    query = db_session.execute(
-        text(
-            """
-            SELECT DATE_FORMAT(webshop_transactions.created_at, "%Y-%m"), sum(webshop_transaction_contents.count)
-            FROM webshop_transaction_contents
-            INNER JOIN webshop_transactions
-            ON webshop_transactions.id = webshop_transaction_contents.transaction_id
-            WHERE webshop_transaction_contents.product_id=7 AND webshop_transactions.status='completed'
-            GROUP BY DATE_FORMAT(webshop_transactions.created_at, "%Y-%m")
-            """
-        )
-    )
-
-    results = [(date, int(count)) for (date, count) in query]
-    return results
-
-
 @dataclass
 class ProductRevenue:
     product_id: int
@@ -313,45 +193,65 @@ class RetentionLink:
     pause: bool
 
 
+RETENTION_MONTH_NODES = (1, 2, 3, 6, 12, 24)
+
+
+def stream_rows(query: Select) -> Iterator[Row]:
+    """Rows of query fetched in batches when iterated, only one query may be streamed at a time."""
+    yield from db_session.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+
+def stream_member_spans(query: Select) -> Iterator[Tuple[Row, List[Tuple[date, date]]]]:
+    """Stream the rows of query, member columns followed by span startdate and enddate ordered by member_id first, as
+    the first row of each member and its (startdate, enddate) spans in the order of the query. The spans are not
+    merged, each span is counted on its own by the retention statistics."""
+    for _, member_rows in groupby(stream_rows(query), key=lambda row: row.member_id):
+        rows = list(member_rows)
+        yield rows[0], [(row.startdate, row.enddate) for row in rows]
+
+
 def retention_graph(startdate: date, enddate: date) -> RetentionGraph:
     hard_start_date = date(2016, 1, 1)
-    lab_spans: List[Tuple[int, datetime, datetime]] = (
-        db_session.query(Member.member_id, Span.startdate, Span.enddate)
-        .join(Member.spans)
-        .filter(
-            Span.startdate < enddate,
-            Span.enddate > hard_start_date,
-            Span.type == Span.LABACCESS,
-        )
+
+    # All spans in the period count, also deleted ones.
+    def in_period(span_type: str) -> List[ColumnElement[bool]]:
+        return [Span.type == span_type, Span.enddate > hard_start_date, Span.startdate < enddate]
+
+    membership_end = (
+        select(Span.member_id, func.max(Span.enddate).label("last_end"))
+        .where(*in_period(Span.MEMBERSHIP))
+        .group_by(Span.member_id)
+        .subquery()
+    )
+    member_columns = (
+        Member.member_id,
+        Member.member_number,
+        Member.labaccess_agreement_at,
+        membership_end.c.last_end,
+    )
+
+    # Members with labaccess first and then the others, both by member_id, which gives the order of the nodes.
+    with_labaccess = stream_member_spans(
+        select(*member_columns, Span.startdate, Span.enddate)
+        .join(Span, Span.member_id == Member.member_id)
+        .outerjoin(membership_end, membership_end.c.member_id == Member.member_id)
+        .where(*in_period(Span.LABACCESS))
         .order_by(Member.member_id, Span.enddate)
-        .all()
     )
-    membership_spans: List[Tuple[int, datetime, datetime]] = (
-        db_session.query(Member.member_id, Span.startdate, Span.enddate)
-        .join(Member.spans)
-        .filter(
-            Span.startdate < enddate,
-            Span.enddate > hard_start_date,
-            Span.type == Span.MEMBERSHIP,
+    without_labaccess = (
+        (member, [])
+        for member in stream_rows(
+            select(*member_columns)
+            .join(membership_end, membership_end.c.member_id == Member.member_id)
+            .where(~select(Span.span_id).where(Span.member_id == Member.member_id, *in_period(Span.LABACCESS)).exists())
+            .order_by(Member.member_id)
         )
-        .order_by(Member.member_id, Span.enddate)
-        .all()
     )
 
-    members = {m.member_id: m for m in db_session.query(Member).all()}
-
-    spans_by_member_groups = itertools.groupby(lab_spans, key=lambda x: x[0])
-    spans_by_member = [(x[0], list(x[1])) for x in spans_by_member_groups]
-    has_any_spans = set([x[0] for x in spans_by_member])
-
-    for member_id in members.keys():
-        if member_id not in has_any_spans:
-            spans_by_member.append((member_id, []))
-
-    membership_spans_by_member = {x[0]: list(x[1]) for x in itertools.groupby(membership_spans, key=lambda x: x[0])}
-
-    summaries = get_membership_summaries([x[0] for x in spans_by_member])
-    assert len(summaries) == len(spans_by_member)
+    # Labaccess active today, from the membership status.
+    labaccess_active = {
+        member_id for member_id, summary in get_membership_summaries_by_member(None).items() if summary.labaccess_active
+    }
 
     nodes: Dict[str, RetentionNode] = {}
     links: Dict[Tuple[int, int, bool], RetentionLink] = {}
@@ -387,23 +287,18 @@ def retention_graph(startdate: date, enddate: date) -> RetentionGraph:
         links[key].value += 1
         return b
 
-    for (member_id, spans), summary in zip(spans_by_member, summaries):
-        member = members[member_id]
-        if member_id not in membership_spans_by_member:
-            if len(spans) > 0:
-                print(f"Member {member.member_number} has {len(spans)} labaccess spans but no membership spans")
+    for member, spans in chain(with_labaccess, without_labaccess):
+        if member.last_end is None:
+            print(f"Member {member.member_number} has {len(spans)} labaccess spans but no membership spans")
             continue
-        mspans = membership_spans_by_member[member_id]
         last = None
 
-        last_activity = mspans[-1][2] if len(mspans) > 0 else (spans[-1][2] if len(spans) > 0 else None)
-        if last_activity is not None and last_activity < startdate:
+        if member.last_end < startdate:
             last = connect(last, f"inactive before {startdate}", False)
             last = connect(last, f"END {startdate}", False)
             continue
 
-        if len(mspans) > 0:
-            last = connect(last, "1st year membership", False)
+        last = connect(last, "1st year membership", False)
         if member.labaccess_agreement_at is None:
             last = connect(last, "never signed agreement", False)
             continue
@@ -411,23 +306,21 @@ def retention_graph(startdate: date, enddate: date) -> RetentionGraph:
         monthId = 1
         lastEnd = None
         hadPause = False
-        for span in spans:
-            (_, start, end) = span
+        for start, end in spans:
             if lastEnd is not None and (start - lastEnd).days > 7:
                 hadPause = True
             months = round((end - start).days / 30)
             if months <= 0:
                 continue
-            for _ in range(months):
-                if monthId <= 3 or monthId == 6 or monthId == 12 or monthId == 24:
-                    # if monthId <= 12:
-                    last = connect(last, f"{monthId}M labaccess", hadPause)
+            for node_month in RETENTION_MONTH_NODES:
+                if monthId <= node_month < monthId + months:
+                    last = connect(last, f"{node_month}M labaccess", hadPause)
                     hadPause = False
-                monthId += 1
+            monthId += months
 
             lastEnd = end
 
-        if summary.labaccess_active:
+        if member.member_id in labaccess_active:
             last = connect(last, "active", False)
         else:
             last = connect(last, "END " + str(last), False)
@@ -467,47 +360,30 @@ class QuizQuestionMapping:
 
 
 def retention_table(start: Optional[datetime], end: Optional[datetime], spantype: Span.ACCESS_TYPE) -> RetentionTable:
-    spans: Sequence[Tuple[int, date, date]] = (
-        db_session.execute(
-            select(Member.member_id, Span.startdate, Span.enddate)
-            .join(Member.spans)
-            .filter(Span.type == spantype)
-            .filter(
-                Member.labaccess_agreement_at > start
-                if start is not None
-                else sqlalchemy.cast(True, sqlalchemy.Boolean)
-            )
-            .filter(
-                Member.labaccess_agreement_at <= end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean)
-            )
-            .filter(Member.labaccess_agreement_at != None)
-            .order_by(Member.member_id, Span.startdate)
-        )
-        .tuples()
-        .all()
+    signed_in_period = [
+        Member.labaccess_agreement_at != None,
+        Member.labaccess_agreement_at > start if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean),
+        Member.labaccess_agreement_at <= end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean),
+    ]
+    member_columns = (Member.member_id, Member.labaccess_agreement_at, Member.civicregno)
+    # All spans of the type count, also deleted ones.
+    is_span = (Span.member_id == Member.member_id, Span.type == spantype)
+
+    # Members with spans first and then the others, both by member_id.
+    with_spans = stream_member_spans(
+        select(*member_columns, Span.startdate, Span.enddate)
+        .join(Span, and_(*is_span))
+        .where(*signed_in_period)
+        .order_by(Member.member_id, Span.startdate)
     )
-
-    members = {
-        m.member_id: m
-        for m in db_session.query(Member)
-        .filter(
-            Member.labaccess_agreement_at > start if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean)
+    without_spans = (
+        (member, [])
+        for member in stream_rows(
+            select(*member_columns)
+            .where(*signed_in_period, ~select(Span.span_id).where(*is_span).exists())
+            .order_by(Member.member_id)
         )
-        .filter(Member.labaccess_agreement_at <= end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean))
-        .filter(Member.labaccess_agreement_at != None)
-        .all()
-    }
-
-    spans_by_member_groups = itertools.groupby(spans, key=lambda x: x[0])
-    spans_by_member = [(x[0], list(x[1])) for x in spans_by_member_groups]
-    has_any_spans = set([x[0] for x in spans_by_member])
-
-    for member_id in members.keys():
-        if member_id not in has_any_spans:
-            spans_by_member.append((member_id, []))
-
-    summaries = get_membership_summaries([x[0] for x in spans_by_member])
-    assert len(summaries) == len(spans_by_member)
+    )
 
     interesting_questions: List[QuizQuestionMapping] = [
         QuizQuestionMapping(
@@ -554,35 +430,27 @@ def retention_table(start: Optional[datetime], end: Optional[datetime], spantype
     current_year = datetime.now().year
 
     MONTH_LIMIT = 12 * 5
-    for (member_id, spans), summary in zip(spans_by_member, summaries):
-        member = members.get(member_id, None)
-        if member is None:
-            continue
-
+    for member, spans in chain(with_spans, without_spans):
+        member_id = member.member_id
         assert member.labaccess_agreement_at is not None
 
         # Spans may start before the before the agreement was signed.
         # This is the case for some old members that were migrated.
-        start_date = (
-            min(member.labaccess_agreement_at.date(), spans[0][1])
-            if len(spans) > 0
-            else member.labaccess_agreement_at.date()
-        )
+        start_date = member.labaccess_agreement_at.date()
+        if spans:
+            start_date = min(start_date, spans[0][0])
 
-        active_months = [False for _ in range(MONTH_LIMIT)]
+        # Bit i is set if the member was active in month i.
+        active_months = 0
         last_month = 0
-        for span in spans:
-            (_, span_start, span_end) = span
+        for span_start, span_end in spans:
             start_month = round((span_start - start_date).days / 30)
             end_month = round((span_end - start_date).days / 30)
             assert end_month >= 0 and start_month >= 0
-            start_month = max(0, min(start_month - 1, len(active_months) - 1))
-            end_month = max(0, min(end_month, len(active_months) - 1))
+            start_month = max(0, min(start_month - 1, MONTH_LIMIT - 1))
+            end_month = max(0, min(end_month, MONTH_LIMIT - 1))
             last_month = max(last_month, end_month)
-            for i in range(start_month, end_month):
-                active_months[i] = True
-
-        active_months = active_months[:last_month]
+            active_months |= (1 << end_month) - (1 << start_month)
 
         attributes = {q.id: members_to_quiz_answers.get(member_id, {}).get(q.id, None) for q in interesting_questions}
 
@@ -611,7 +479,7 @@ def retention_table(start: Optional[datetime], end: Optional[datetime], spantype
         result.append(
             RetentionMember(
                 member_id=member_id,
-                active_months=active_months,
+                active_months=[bool(active_months >> i & 1) for i in range(last_month)],
                 attributes=attributes,
             )
         )
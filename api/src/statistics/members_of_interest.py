@@ -2,15 +2,17 @@ import time
 from dataclasses import dataclass
 from datetime import datetime
 from logging import getLogger
+from statistics.physical_access_log import activity_days
 from typing import Dict, List, Optional, Sequence, Tuple
 
 import sqlalchemy
 from dataclasses_json import DataClassJsonMixin
 from membership.models import Member
-from multiaccessy.models import PhysicalAccessEntry
+from multiaccessy.models import PhysicalAccessDaily, PhysicalAccessDoor
+from multiaccessy.physical_access_daily import bit_of_door
 from service.db import db_session
 from shop.models import Product, ProductCategory, Transaction, TransactionContent
-from sqlalchemy import desc, distinct, func, select
+from sqlalchemy import desc, func, select
 
 logger = getLogger("statistics")
 
@@ -38,18 +40,15 @@ def score_members_by_amount_purchased(
 def days_with_visits(
     start: Optional[datetime], end: Optional[datetime], limit: Optional[int] = 30
 ) -> List[Tuple[Member, int]]:
-    unique_days = func.count(distinct(func.DATE(PhysicalAccessEntry.invoked_at)))
+    unique_days = func.count()
     stmt = (
         select(Member, unique_days.label("days_with_visits"))
-        .where(
-            PhysicalAccessEntry.invoked_at >= start if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean)
-        )
-        .where(PhysicalAccessEntry.invoked_at < end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean))
+        .where(*activity_days(start, end))
         .having(unique_days > 0)
         .limit(limit)
         .order_by(desc(unique_days))
         .group_by(Member.member_id)
-        .join(PhysicalAccessEntry, Member.member_id == PhysicalAccessEntry.member_id)
+        .join(PhysicalAccessDaily, Member.member_id == PhysicalAccessDaily.member_id)
     )
     return [(member, count) for (member, count) in db_session.execute(stmt)]
 
@@ -208,20 +207,17 @@ def members_of_interest(start: Optional[datetime], end: Optional[datetime]) -> M
                     )
             elif score_key.startswith("opens_door:"):
                 score_key = score_key[len("opens_door:") :]
-                entries = db_session.execute(
-                    select(Member, func.count(distinct(func.date_format(PhysicalAccessEntry.invoked_at, "%Y-%m-%d"))))
-                    .join(PhysicalAccessEntry, Member.member_id == PhysicalAccessEntry.member_id)
-                    .filter(PhysicalAccessEntry.accessy_asset_publication_id.like(score_key))
-                    .filter(
-                        PhysicalAccessEntry.invoked_at >= start
-                        if start is not None
-                        else sqlalchemy.cast(True, sqlalchemy.Boolean)
-                    )
-                    .filter(
-                        PhysicalAccessEntry.invoked_at < end
-                        if end is not None
-                        else sqlalchemy.cast(True, sqlalchemy.Boolean)
+                door_ids = db_session.scalars(
+                    select(PhysicalAccessDoor.id).filter(
+                        PhysicalAccessDoor.accessy_asset_publication_id.like(score_key)
                     )
+                ).all()
+                doors_mask = sum(bit_of_door(door_id) for door_id in door_ids)
+                entries = db_session.execute(
+                    select(Member, func.count())
+                    .join(PhysicalAccessDaily, Member.member_id == PhysicalAccessDaily.member_id)
+                    .filter(PhysicalAccessDaily.doors_bitmap.op("&")(doors_mask) != 0)
+                    .filter(*activity_days(start, end))
                     .group_by(Member.member_id)
                 ).t.all()
                 doors.append(
@@ -0,0 +1,24 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import String, Text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class StatisticsDaily(Base):
+    """Public statistics precomputed per day by statistics/statistics_daily.py. Series have one row per day with value
+    set, snapshots have the statistics computed that day as json in data."""
+
+    __tablename__ = "statistics_daily"
+
+    metric: Mapped[str] = mapped_column(String(32), primary_key=True)
+    day: Mapped[date] = mapped_column(primary_key=True)
+    value: Mapped[Optional[int]]
+    data: Mapped[Optional[str]] = mapped_column(Text)
+
+    def __repr__(self) -> str:
+        return f"StatisticsDaily(metric={self.metric}, day={self.day}, value={self.value})"
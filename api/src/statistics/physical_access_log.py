@@ -1,16 +1,16 @@
 from dataclasses import dataclass, field
 from datetime import date as datetime_date
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from enum import Enum
 from logging import getLogger
 from typing import Any, List, Literal, Optional, Sequence, Tuple, cast
 
 import sqlalchemy
 from dataclasses_json import DataClassJsonMixin, config
-from multiaccessy.models import PhysicalAccessEntry
+from multiaccessy.models import PhysicalAccessDaily
 from service.db import db_session
 from service.util import date_to_str, format_datetime
-from sqlalchemy import ColumnElement, Date, distinct, func, select, text
+from sqlalchemy import ColumnElement, Date, distinct, func, select
 
 logger = getLogger("statistics")
 
@@ -35,36 +35,41 @@ class TimeGrouping(Enum):
     Year = "year"
 
 
+def activity_days(start: Optional[datetime], end: Optional[datetime]) -> List[ColumnElement[bool]]:
+    """Conditions for the rows of physical_access_daily from start to end. The rollup is per day, so a start or end
+    within a day includes that whole day."""
+    return [
+        PhysicalAccessDaily.day >= start.date() if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean),
+        (
+            PhysicalAccessDaily.day < end.date() + timedelta(days=1 if end.time() != time() else 0)
+            if end is not None
+            else sqlalchemy.cast(True, sqlalchemy.Boolean)
+        ),
+    ]
+
+
 def activity_by_date(
     start: Optional[datetime], end: Optional[datetime], grouping: TimeGrouping, member_id: Optional[int] = None
 ) -> PhysicalActivity:
     if grouping == TimeGrouping.Day:
-        selecter = func.date_format(PhysicalAccessEntry.invoked_at, "%Y-%m-%d").label("grouped_date")
+        selecter = func.date_format(PhysicalAccessDaily.day, "%Y-%m-%d").label("grouped_date")
     elif grouping == TimeGrouping.Year:
-        selecter = func.date_format(PhysicalAccessEntry.invoked_at, "%Y-01-01").label("grouped_date")
+        selecter = func.date_format(PhysicalAccessDaily.day, "%Y-01-01").label("grouped_date")
     elif grouping == TimeGrouping.Month:
-        selecter = func.date_format(PhysicalAccessEntry.invoked_at, "%Y-%m-01").label("grouped_date")
+        selecter = func.date_format(PhysicalAccessDaily.day, "%Y-%m-01").label("grouped_date")
     elif grouping == TimeGrouping.Week:
         # Round down to the nearest Monday
         selecter = func.date_format(
-            text("DATE_SUB(invoked_at, INTERVAL (DAYOFWEEK(invoked_at) - 1) DAY)"),
+            func.subdate(PhysicalAccessDaily.day, func.dayofweek(PhysicalAccessDaily.day) - 1),
             "%Y-%m-%d",
         ).label("grouped_date")
 
+    # Distinct members for all members, a member has one row per day so the rows of one member are its days.
     days: Sequence[Tuple[str, int]] = db_session.execute(
-        select(
-            selecter,
-            func.count(distinct(PhysicalAccessEntry.member_id))
-            if member_id is None
-            else func.count(distinct(func.date_format(PhysicalAccessEntry.invoked_at, "%Y-%m-%d"))),
-        )
+        select(selecter, func.count(distinct(PhysicalAccessDaily.member_id)) if member_id is None else func.count())
+        .where(*activity_days(start, end))
         .where(
-            PhysicalAccessEntry.invoked_at >= start if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean)
-        )
-        .where(PhysicalAccessEntry.invoked_at < end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean))
-        .where(PhysicalAccessEntry.member_id.isnot(None))
-        .where(
-            PhysicalAccessEntry.member_id == member_id
+            PhysicalAccessDaily.member_id == member_id
             if member_id is not None
             else sqlalchemy.cast(True, sqlalchemy.Boolean)
         )
@@ -93,39 +98,26 @@ class ActivityByDayOfWeek(DataClassJsonMixin):
 def activity_by_day_of_week(
     start: Optional[datetime], end: Optional[datetime], member_id: Optional[int] = None
 ) -> ActivityByDayOfWeek:
-    selecter = func.date_format(PhysicalAccessEntry.invoked_at, "%Y-%m-%d %H:00").label("grouped_date")
-    activity_by_day = (
-        select(selecter, func.count(distinct(PhysicalAccessEntry.member_id)).label("count"))
+    # Members active in each hour of each day summed by day of week and hour, from the hours each member was active
+    # per day. Grouped by the hours bitmap too, which has few distinct values.
+    day_of_week = func.date_format(PhysicalAccessDaily.day, "%w").label("day_of_week")
+    activity_by_hours: Sequence[Tuple[str, int, int]] = db_session.execute(
+        select(day_of_week, PhysicalAccessDaily.hours_bitmap, func.count())
+        .where(*activity_days(start, end))
         .where(
-            PhysicalAccessEntry.invoked_at >= start if start is not None else sqlalchemy.cast(True, sqlalchemy.Boolean)
-        )
-        .where(PhysicalAccessEntry.invoked_at < end if end is not None else sqlalchemy.cast(True, sqlalchemy.Boolean))
-        .where(PhysicalAccessEntry.member_id.isnot(None))
-        .where(
-            PhysicalAccessEntry.member_id == member_id
+            PhysicalAccessDaily.member_id == member_id
             if member_id is not None
             else sqlalchemy.cast(True, sqlalchemy.Boolean)
         )
-        .group_by("grouped_date")
-        .order_by(selecter.asc())
-        .subquery()
-    )
-
-    activity_by_day_of_week: Sequence[Tuple[str, int]] = db_session.execute(
-        select(
-            func.date_format(activity_by_day.c.grouped_date, "%w %H").label("day_of_week"),
-            func.sum(activity_by_day.c.count),
-        )
-        .group_by("day_of_week")
-        .order_by("day_of_week")
+        .group_by(day_of_week, PhysicalAccessDaily.hours_bitmap)
     ).t.all()
 
     activity_by_day_and_hour = [[0 for _ in range(24)] for _ in range(7)]
-    for day_of_week, count in activity_by_day_of_week:
-        day, hour = map(int, day_of_week.split())
-        day = (day - 1 + 7) % 7  # Ensure week starts on Monday
-        assert activity_by_day_and_hour[day][hour] == 0
-        activity_by_day_and_hour[day][hour] = int(count)
+    for day_of_week, hours_bitmap, count in activity_by_hours:
+        day = (int(day_of_week) - 1 + 7) % 7  # Ensure week starts on Monday
+        for hour in range(24):
+            if hours_bitmap >> hour & 1:
+                activity_by_day_and_hour[day][hour] += count
 
     return ActivityByDayOfWeek(
         week_starts_on="monday", activity=activity_by_day_and_hour, start_time=start, end_time=end
@@ -0,0 +1,209 @@
+"""Public statistics precomputed per day in statistics_daily by update_statistics_daily, run by accessy_syncer at start
+and in the daily job, so that the public endpoints only read rows instead of recomputing the whole history.
+
+Series (active members per span type and lasertime) have one row per day. Only days from the last stored day are
+processed, the last REPROCESS_DAYS are processed again for transactions completed late, and spans added or deleted
+since then are processed from their start. Spans edited in place are not noticed, rebuild with
+update_statistics_daily(rebuild_all=True) (the accessy_syncer statistics_daily command) after editing history.
+Snapshots (the distribution by months and the retention graph) are computed once a day and stored as json. The
+endpoints compute what is not stored yet, days after the last stored one and everything before the first update.
+"""
+
+import json
+from dataclasses import asdict
+from datetime import date, datetime, time, timedelta
+from statistics.maker_statistics import (
+    membership_number_months2_default,
+    membership_number_months_default,
+    retention_graph,
+)
+from statistics.models import StatisticsDaily
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from membership.models import Span
+from membership.span_timeline import SpanTimeline
+from service.db import db_session
+from shop.models import Transaction, TransactionContent
+from sqlalchemy import Date, Select, delete, func, insert, or_, select
+
+REPROCESS_DAYS = 7
+
+SERIES_SPAN_TYPES = (Span.MEMBERSHIP, Span.LABACCESS)
+
+LASERTIME = "lasertime"
+LASERTIME_PRODUCT_ID = 7
+
+DISTRIBUTION_BY_MONTH = "distribution_by_month"
+DISTRIBUTION_BY_MONTH2 = "distribution_by_month2"
+RETENTION_GRAPH = "retention_graph"
+
+SNAPSHOTS: Dict[str, Callable[[], Any]] = {
+    DISTRIBUTION_BY_MONTH: membership_number_months_default,
+    DISTRIBUTION_BY_MONTH2: membership_number_months2_default,
+    RETENTION_GRAPH: lambda: asdict(retention_graph(date(2020, 1, 1), date(2030, 12, 31))),
+}
+
+
+def first_day_to_process(
+    metric: str, rebuild_all: bool, changed: Optional[Callable[[datetime], Select]] = None
+) -> Optional[date]:
+    """The first day to (re)compute for a series, None for all of it (nothing stored yet, or rebuild_all). Otherwise
+    the last REPROCESS_DAYS stored days, or from the first day of rows written since then if earlier (changed is a
+    query of that day for rows written since a time)."""
+    if rebuild_all:
+        return None
+    last_stored = db_session.scalar(select(func.max(StatisticsDaily.day)).where(StatisticsDaily.metric == metric))
+    if last_stored is None:
+        return None
+    first = last_stored - timedelta(days=REPROCESS_DAYS)
+    if changed is not None:
+        first_changed = db_session.scalar(changed(datetime.combine(first, time())))
+        if first_changed is not None:
+            # From the day before, which may be the new first day of the series.
+            first = min(first, first_changed - timedelta(days=1))
+    return first
+
+
+def store_series(metric: str, first: Optional[date], rows: List[Tuple[date, int]]) -> None:
+    """Replace the rows of a series from first (all of them if None)."""
+    stored = delete(StatisticsDaily).where(StatisticsDaily.metric == metric)
+    if first is not None:
+        stored = stored.where(StatisticsDaily.day >= first)
+    db_session.execute(stored)
+    if rows:
+        db_session.execute(insert(StatisticsDaily), [dict(metric=metric, day=day, value=value) for day, value in rows])
+
+
+def active_members_series(span_type: str, first: Optional[date], last: Optional[date] = None) -> List[Tuple[date, int]]:
+    """Number of active members per day from first to last, from the day before the first span starts and to the day
+    after the last span ends if None (or earlier, as in the previous spans_by_date)."""
+    timeline = SpanTimeline.load(span_type, start=first)
+    if not timeline.starts:
+        return []
+    if first is None:
+        first = date.fromordinal(min(timeline.starts) - 1)
+    after_last_end = date.fromordinal(max(timeline.ends) + 1)
+    last = after_last_end if last is None else min(last, after_last_end)
+    if first > last:
+        return []
+    return [(first + timedelta(days=i), count) for i, count in enumerate(timeline.active_counts(first, last))]
+
+
+def update_active_members(span_type: str, today: date, rebuild_all: bool = False) -> None:
+    # Spans added or deleted late (not spans edited in place, use rebuild_all for those).
+    first = first_day_to_process(
+        span_type,
+        rebuild_all,
+        lambda since: select(func.min(Span.startdate)).where(
+            Span.type == span_type, or_(Span.created_at >= since, Span.deleted_at >= since)
+        ),
+    )
+    store_series(span_type, first, active_members_series(span_type, first, today))
+
+
+def lasertime_by_day(first: Optional[date], last: Optional[date] = None) -> List[Tuple[date, int]]:
+    """Sold lasertime (product count) of completed transactions from first to last, for the days with any."""
+    day = func.date(Transaction.created_at, type_=Date)
+    query = (
+        select(day, func.sum(TransactionContent.count))
+        .join(TransactionContent.transaction)
+        .where(
+            TransactionContent.product_id == LASERTIME_PRODUCT_ID,
+            Transaction.status == Transaction.Status.completed,
+        )
+        .group_by(day)
+        .order_by(day)
+    )
+    if first is not None:
+        query = query.where(Transaction.created_at >= first)
+    if last is not None:
+        query = query.where(Transaction.created_at < last + timedelta(days=1))
+    return [(day, int(count)) for day, count in db_session.execute(query)]
+
+
+def update_lasertime(today: date, rebuild_all: bool = False) -> None:
+    first = first_day_to_process(LASERTIME, rebuild_all)
+    store_series(LASERTIME, first, lasertime_by_day(first, today))
+
+
+def update_snapshot(metric: str, today: date, rebuild_all: bool = False) -> None:
+    snapshot = db_session.get(StatisticsDaily, (metric, today))
+    if snapshot is None:
+        db_session.add(StatisticsDaily(metric=metric, day=today, data=json.dumps(SNAPSHOTS[metric]())))
+    elif rebuild_all:
+        snapshot.data = json.dumps(SNAPSHOTS[metric]())
+    db_session.flush()
+
+
+def update_statistics_daily(today: Optional[date] = None, rebuild_all: bool = False) -> None:
+    """Process the days not yet in statistics_daily, up to and including today, all days if rebuild_all."""
+    if today is None:
+        today = date.today()
+    for span_type in SERIES_SPAN_TYPES:
+        update_active_members(span_type, today, rebuild_all)
+    update_lasertime(today, rebuild_all)
+    for metric in SNAPSHOTS:
+        update_snapshot(metric, today, rebuild_all)
+
+
+def read_series(metric: str) -> List[Tuple[date, int]]:
+    return list(
+        db_session.execute(
+            select(StatisticsDaily.day, StatisticsDaily.value)
+            .where(StatisticsDaily.metric == metric)
+            .order_by(StatisticsDaily.day)
+        ).tuples()
+    )
+
+
+def read_snapshot(metric: str) -> Any:
+    """The latest snapshot of metric, computed if there is none yet."""
+    data = db_session.scalar(
+        select(StatisticsDaily.data)
+        .where(StatisticsDaily.metric == metric)
+        .order_by(StatisticsDaily.day.desc())
+        .limit(1)
+    )
+    return json.loads(data) if data is not None else SNAPSHOTS[metric]()
+
+
+def active_members_by_date(span_type: str) -> List[Tuple[str, int]]:
+    """Number of active members indexed by a date string, only the days where the number changes and the days
+    before, which is enough to draw it as steps."""
+    series = read_series(span_type)
+    # The days after the stored ones (up to the future span ends, or all of them before the first update) are
+    # computed from the spans.
+    series += active_members_series(span_type, series[-1][0] + timedelta(days=1) if series else None)
+    return [
+        (day.strftime("%Y-%m-%d"), count)
+        for i, (day, count) in enumerate(series)
+        if i == 0 or i == len(series) - 1 or series[i - 1][1] != count or series[i + 1][1] != count
+    ]
+
+
+def membership_by_date_statistics() -> Dict[str, List[Tuple[str, int]]]:
+    return {span_type: active_members_by_date(span_type) for span_type in SERIES_SPAN_TYPES}
+
+
+def lasertime() -> List[Tuple[str, int]]:
+    """Sold lasertime by month, for months with any completed transaction."""
+    series = read_series(LASERTIME)
+    # Sales after the last stored day are read from the transactions.
+    series += lasertime_by_day(series[-1][0] + timedelta(days=1) if series else None)
+    by_month: Dict[str, int] = {}
+    for day, count in series:
+        month = day.strftime("%Y-%m")
+        by_month[month] = by_month.get(month, 0) + count
+    return list(by_month.items())
+
+
+def membership_number_months_statistics() -> Dict[str, List[int]]:
+    return read_snapshot(DISTRIBUTION_BY_MONTH)
+
+
+def membership_number_months2_statistics() -> Dict[str, List[int]]:
+    return read_snapshot(DISTRIBUTION_BY_MONTH2)
+
+
+def retention_graph_statistics() -> Dict[str, List[Any]]:
+    return read_snapshot(RETENTION_GRAPH)
@@ -0,0 +1,108 @@
+from statistics.maker_statistics import (
+    RetentionLink,
+    RetentionNode,
+    retention_graph,
+    retention_table,
+)
+
+import core
+import membership
+import quiz
+from membership.models import Span
+from service.db import db_session
+from test_aid.test_base import FlaskTestBase
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models, quiz.models]
+
+    def setUp(self) -> None:
+        db_session.query(Span).delete()
+        db_session.commit()
+
+    def member(self, signed_days: int, membership: tuple, labaccess: list, deleted_labaccess: tuple = ()):
+        member = self.db.create_member(labaccess_agreement_at=self.datetime(days=signed_days))
+        self.db.create_span(
+            member=member, type=Span.MEMBERSHIP, startdate=self.date(membership[0]), enddate=self.date(membership[1])
+        )
+        for start, end in labaccess:
+            self.db.create_span(member=member, type=Span.LABACCESS, startdate=self.date(start), enddate=self.date(end))
+        for start, end in deleted_labaccess:
+            self.db.create_span(
+                member=member,
+                type=Span.LABACCESS,
+                startdate=self.date(start),
+                enddate=self.date(end),
+                deleted_at=self.datetime(),
+            )
+        return member
+
+    def create_members(self):
+        # Each span is counted on its own, they are not merged, and deleted spans are counted as well.
+        overlapping = self.member(-300, (-300, -181), [(-300, -241), (-270, -181)])
+        paused = self.member(-200, (-200, 10), [(-200, -141), (-80, 10)])
+        adjacent = self.member(-150, (-150, -100), [(-150, -137), (-136, -123), (-122, -109)])
+        deleted = self.member(-150, (-150, -1), [], deleted_labaccess=[(-150, -91)])
+        ended_before_start = self.member(-600, (-600, -500), [(-600, -500)])
+        without_labaccess = self.member(-100, (-100, 50), [])
+        return overlapping, paused, adjacent, deleted, ended_before_start, without_labaccess
+
+    def test_retention_graph_nodes_and_links(self) -> None:
+        self.create_members()
+
+        graph = retention_graph(self.date(-400), self.date(0))
+
+        self.assertEqual(
+            [
+                RetentionNode(id=0, name="1st year membership"),
+                RetentionNode(id=1, name="1M labaccess"),
+                RetentionNode(id=2, name="2M labaccess"),
+                RetentionNode(id=3, name="3M labaccess"),
+                RetentionNode(id=4, name="Inactive"),
+                RetentionNode(id=5, name="active"),
+                RetentionNode(id=6, name="Inactive"),
+                RetentionNode(id=7, name="Inactive"),
+                RetentionNode(id=8, name=f"inactive before {self.date(-400)}"),
+                RetentionNode(id=9, name="Inactive"),
+            ],
+            graph.nodes,
+        )
+        self.assertEqual(
+            [
+                RetentionLink(source=0, target=1, value=3, pause=False),
+                RetentionLink(source=1, target=2, value=3, pause=False),
+                RetentionLink(source=2, target=3, value=1, pause=False),
+                RetentionLink(source=3, target=4, value=1, pause=False),
+                # The second span of the paused member starts after more than 7 days.
+                RetentionLink(source=2, target=3, value=1, pause=True),
+                RetentionLink(source=3, target=5, value=1, pause=False),
+                # The adjacent spans are too short to count as a month each.
+                RetentionLink(source=0, target=6, value=2, pause=False),
+                # The deleted span counts as 2 months.
+                RetentionLink(source=2, target=7, value=1, pause=False),
+                RetentionLink(source=8, target=9, value=1, pause=False),
+            ],
+            graph.links,
+        )
+
+    def test_retention_table_active_months(self) -> None:
+        members = self.create_members()
+
+        table = retention_table(None, None, Span.LABACCESS)
+
+        member_ids = [member.member_id for member in members]
+        rows = [m for m in table.members if m.member_id in member_ids]
+        # Members with spans come first, the one without labaccess last.
+        self.assertEqual(member_ids, [m.member_id for m in rows])
+        self.assertEqual(
+            [
+                [True, True, True, True],
+                [True, True, False, True, True, True, True],
+                [True],
+                # The deleted span.
+                [True, True],
+                [True, True, True],
+                [],
+            ],
+            [m.active_months for m in rows],
+        )
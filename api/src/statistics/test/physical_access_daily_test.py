@@ -0,0 +1,140 @@
+from datetime import date, datetime, time, timedelta
+from statistics.members_of_interest import days_with_visits
+from statistics.physical_access_log import TimeGrouping, activity_by_date, activity_by_day_of_week
+
+import core
+import membership
+from multiaccessy.models import PhysicalAccessDaily, PhysicalAccessDoor, PhysicalAccessEntry
+from multiaccessy.physical_access_daily import record_access, update_physical_access_daily
+from service.db import db_session
+from test_aid.test_base import FlaskTestBase
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models]
+
+    def setUp(self) -> None:
+        for model in (PhysicalAccessDaily, PhysicalAccessEntry, PhysicalAccessDoor):
+            db_session.query(model).delete()
+        db_session.commit()
+
+    def access(self, member_id, publication_id: str, days: int, hour: int) -> None:
+        invoked_at = datetime.combine(self.date(days), time(hour, 30))
+        db_session.add(
+            PhysicalAccessEntry(
+                member_id=member_id,
+                accessy_asset_operation_id="operation",
+                accessy_asset_publication_id=publication_id,
+                invoked_at=invoked_at,
+            )
+        )
+        if member_id is not None:
+            record_access(member_id, publication_id, invoked_at)
+        db_session.commit()
+
+    def create_mysql_functions(self) -> None:
+        """The MySQL functions used for the grouping."""
+        connection = db_session.connection().connection.driver_connection
+        connection.create_function("date_format", 2, lambda day, format: date.fromisoformat(day).strftime(format))
+        connection.create_function("dayofweek", 1, lambda day: date.fromisoformat(day).isoweekday() % 7 + 1)
+        connection.create_function("subdate", 2, lambda day, days: str(date.fromisoformat(day) - timedelta(days)))
+
+    def rows(self):
+        return [
+            (r.member_id, r.day, r.first_at, r.last_at, r.entries, r.doors_bitmap, r.hours_bitmap)
+            for r in db_session.query(PhysicalAccessDaily).order_by(
+                PhysicalAccessDaily.member_id, PhysicalAccessDaily.day
+            )
+        ]
+
+    def test_recorded_accesses_are_the_same_as_rebuilt_from_the_log(self) -> None:
+        m1 = self.db.create_member()
+        m2 = self.db.create_member()
+        self.access(m1.member_id, "front", -2, 18)
+        self.access(m1.member_id, "workshop", -2, 9)
+        self.access(m1.member_id, "front", -2, 20)
+        self.access(m2.member_id, "workshop", -2, 12)
+        self.access(m1.member_id, "workshop", -1, 12)
+        self.access(None, "front", -1, 12)
+
+        recorded = self.rows()
+        day = self.date(-2)
+        self.assertEqual(
+            (m1.member_id, day, datetime.combine(day, time(9, 30)), datetime.combine(day, time(20, 30)), 3, 0b11),
+            recorded[0][:6],
+        )
+        self.assertEqual((1 << 9) | (1 << 18) | (1 << 20), recorded[0][6])
+        self.assertEqual(3, len(recorded))
+
+        update_physical_access_daily(self.date(0), rebuild_all=True)
+        self.assertEqual(recorded, self.rows())
+
+    def test_rollup_is_backfilled_and_used_for_days_with_visits(self) -> None:
+        m1 = self.db.create_member()
+        m2 = self.db.create_member()
+        for member_id, days in ((m1.member_id, -100), (m1.member_id, -40), (m1.member_id, -40), (m2.member_id, -3)):
+            db_session.add(
+                PhysicalAccessEntry(
+                    member_id=member_id,
+                    accessy_asset_operation_id="operation",
+                    accessy_asset_publication_id="front",
+                    invoked_at=datetime.combine(self.date(days), time(12)),
+                )
+            )
+        db_session.commit()
+
+        # The first update rebuilds the whole log, not only the last days.
+        update_physical_access_daily(self.date(0))
+        self.assertEqual(3, len(self.rows()))
+
+        self.assertEqual(
+            [(m1.member_id, 2), (m2.member_id, 1)],
+            [(member.member_id, days) for member, days in days_with_visits(None, None)],
+        )
+        start = datetime.combine(self.date(-50), time())
+        self.assertEqual(
+            [(m1.member_id, 1), (m2.member_id, 1)],
+            [(member.member_id, days) for member, days in days_with_visits(start, start + timedelta(days=50))],
+        )
+
+    def test_activity_by_date_counts_members_or_days_of_one_member(self) -> None:
+        self.create_mysql_functions()
+
+        m1 = self.db.create_member()
+        m2 = self.db.create_member()
+        for member, day in ((m1, 14), (m1, 15), (m1, 16), (m2, 15)):
+            record_access(member.member_id, "front", datetime(2024, 5, day, 12))
+        db_session.commit()
+
+        def activity(grouping: TimeGrouping, member_id=None):
+            return [(entry.date, entry.count) for entry in activity_by_date(None, None, grouping, member_id).activity]
+
+        self.assertEqual(
+            [(date(2024, 5, 14), 1), (date(2024, 5, 15), 2), (date(2024, 5, 16), 1)], activity(TimeGrouping.Day)
+        )
+        self.assertEqual([(date(2024, 5, 12), 2)], activity(TimeGrouping.Week))
+        self.assertEqual([(date(2024, 5, 1), 2)], activity(TimeGrouping.Month))
+        self.assertEqual([(date(2024, 1, 1), 2)], activity(TimeGrouping.Year))
+
+        self.assertEqual([(date(2024, 5, 12), 3)], activity(TimeGrouping.Week, m1.member_id))
+        self.assertEqual([(date(2024, 5, 1), 3)], activity(TimeGrouping.Month, m1.member_id))
+
+    def test_activity_by_day_of_week_counts_members_per_hour_from_monday(self) -> None:
+        self.create_mysql_functions()
+
+        m1 = self.db.create_member()
+        m2 = self.db.create_member()
+        # 2024-05-13 is a monday and 2024-05-19 a sunday.
+        for member, day, hour in ((m1, 13, 12), (m1, 13, 18), (m1, 13, 12), (m2, 13, 12), (m1, 19, 9)):
+            record_access(member.member_id, "front", datetime(2024, 5, day, hour))
+        db_session.commit()
+
+        def active_hours(member_id=None):
+            activity = activity_by_day_of_week(None, None, member_id).activity
+            return {
+                (day, hour): count for day, hours in enumerate(activity) for hour, count in enumerate(hours) if count
+            }
+
+        self.assertEqual({(0, 12): 2, (0, 18): 1, (6, 9): 1}, active_hours())
+        self.assertEqual({(0, 12): 1, (0, 18): 1, (6, 9): 1}, active_hours(m1.member_id))
+        self.assertEqual({(0, 12): 1}, active_hours(m2.member_id))
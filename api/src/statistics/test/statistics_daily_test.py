@@ -0,0 +1,147 @@
+import statistics
+import statistics.statistics_daily
+from datetime import date, datetime
+from statistics.statistics_daily import (
+    LASERTIME,
+    lasertime,
+    membership_by_date_statistics,
+    membership_number_months_statistics,
+    read_series,
+    retention_graph_statistics,
+    update_statistics_daily,
+)
+from unittest.mock import patch
+
+import core
+import membership
+import shop
+from membership.models import Span
+from service.db import db_session
+from shop.models import Transaction
+from test_aid.test_base import FlaskTestBase
+
+
+class Test(FlaskTestBase):
+    models = [core.models, membership.models, shop.models, statistics.models]
+
+    def setUp(self) -> None:
+        db_session.query(Span).delete()
+        db_session.query(statistics.models.StatisticsDaily).delete()
+        db_session.commit()
+
+    def test_active_members_are_counted_per_day_and_read_as_steps(self) -> None:
+        m1 = self.db.create_member()
+        self.db.create_span(member=m1, type=Span.LABACCESS, startdate=self.date(-10), enddate=self.date(-6))
+        # Overlapping spans are one active member.
+        self.db.create_span(member=m1, type=Span.LABACCESS, startdate=self.date(-8), enddate=self.date(-4))
+        m2 = self.db.create_member()
+        self.db.create_span(member=m2, type=Span.LABACCESS, startdate=self.date(-5), enddate=self.date(5))
+        self.db.create_span(member=m2, type=Span.MEMBERSHIP, startdate=self.date(-2), enddate=self.date(100))
+
+        # Computed from the spans before the first update.
+        computed = membership_by_date_statistics()
+        update_statistics_daily(self.date(0))
+
+        self.assertEqual([0, 1, 1, 1, 1, 1, 2, 2, 1, 1, 1, 1], [count for _, count in read_series(Span.LABACCESS)])
+        by_date = membership_by_date_statistics()
+        # From the day before the first span starts to the day after the last one ends, also in the future.
+        self.assertEqual(
+            [
+                (self.date(d).isoformat(), c)
+                for d, c in ((-11, 0), (-10, 1), (-6, 1), (-5, 2), (-4, 2), (-3, 1), (5, 1), (6, 0))
+            ],
+            by_date[Span.LABACCESS],
+        )
+        self.assertEqual(
+            [(self.date(d).isoformat(), c) for d, c in ((-3, 0), (-2, 1), (100, 1), (101, 0))],
+            by_date[Span.MEMBERSHIP],
+        )
+        self.assertEqual(computed, by_date)
+
+    def test_spans_added_late_are_processed_and_edited_spans_on_rebuild(self) -> None:
+        member = self.db.create_member()
+        edited = self.db.create_span(
+            member=member,
+            type=Span.LABACCESS,
+            startdate=self.date(-100),
+            enddate=self.date(100),
+            created_at=self.datetime(days=-100),
+        )
+        update_statistics_daily(self.date(-20))
+
+        # Added for days long processed.
+        other = self.db.create_member()
+        self.db.create_span(
+            member=other,
+            type=Span.LABACCESS,
+            startdate=self.date(-50),
+            enddate=self.date(100),
+            created_at=self.datetime(days=-10),
+        )
+        update_statistics_daily(self.date(0))
+
+        series = dict(read_series(Span.LABACCESS))
+        self.assertEqual(self.date(-101), min(series))
+        self.assertEqual(self.date(0), max(series))
+        self.assertEqual(1, series[self.date(-51)])
+        self.assertEqual(2, series[self.date(-50)])
+        self.assertEqual(2, series[self.date(0)])
+
+        # Edited in place, before the days processed again.
+        edited.enddate = self.date(-40)
+        db_session.commit()
+        update_statistics_daily(self.date(0))
+        self.assertEqual(2, dict(read_series(Span.LABACCESS))[self.date(-30)])
+
+        update_statistics_daily(self.date(0), rebuild_all=True)
+        self.assertEqual(1, dict(read_series(Span.LABACCESS))[self.date(-30)])
+
+    def test_lasertime_is_summed_by_month(self) -> None:
+        member = self.db.create_member()
+        category = self.db.create_category()
+        laser = self.db.create_product(category_id=category.id)
+        for created_at, status, count in (
+            (datetime(2024, 1, 5, 12), Transaction.Status.completed, 3),
+            (datetime(2024, 1, 31, 23), Transaction.Status.completed, 2),
+            (datetime(2024, 1, 20), Transaction.Status.failed, 10),
+            (datetime(2024, 2, 10), Transaction.Status.completed, 0),
+            (datetime(2024, 3, 1), Transaction.Status.completed, 1),
+        ):
+            transaction = self.db.create_transaction(member_id=member.member_id, created_at=created_at, status=status)
+            self.db.create_transaction_content(transaction_id=transaction.id, product_id=laser.id, count=count)
+
+        expected = [("2024-01", 5), ("2024-02", 0), ("2024-03", 1)]
+        with patch.object(statistics.statistics_daily, "LASERTIME_PRODUCT_ID", laser.id):
+            self.assertEqual(expected, lasertime())
+
+            # Sales after the last processed day are read from the transactions.
+            update_statistics_daily(date(2024, 1, 31))
+            self.assertEqual([(date(2024, 1, 5), 3), (date(2024, 1, 31), 2)], read_series(LASERTIME))
+            self.assertEqual(expected, lasertime())
+
+            update_statistics_daily(self.date(0))
+            self.assertEqual(expected, lasertime())
+
+    def test_snapshots_are_computed_once_a_day(self) -> None:
+        member = self.db.create_member()
+        self.db.create_span(member=member, type=Span.MEMBERSHIP, startdate=self.date(-20), enddate=self.date(300))
+        # Computed before the first update.
+        self.assertEqual(
+            ["1st year membership", "never signed agreement"],
+            [n["name"] for n in retention_graph_statistics()["nodes"]],
+        )
+        update_statistics_daily(self.date(0))
+
+        self.assertEqual(
+            ["1st year membership", "never signed agreement"],
+            [n["name"] for n in retention_graph_statistics()["nodes"]],
+        )
+        graph = retention_graph_statistics()
+
+        other = self.db.create_member()
+        self.db.create_span(member=other, type=Span.MEMBERSHIP, startdate=self.date(-10), enddate=self.date(300))
+        update_statistics_daily(self.date(0))
+        self.assertEqual(graph, retention_graph_statistics())
+
+        update_statistics_daily(self.date(0), rebuild_all=True)
+        self.assertNotEqual(graph, retention_graph_statistics())
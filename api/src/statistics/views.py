@@ -1,48 +1,50 @@
-from datetime import date, datetime
+from datetime import datetime
 from statistics import service
-from statistics.maker_statistics import (
-    RetentionGraph,
-    RetentionTable,
-    ShopStatistics,
+from statistics.maker_statistics import RetentionTable, ShopStatistics, retention_table, shop_statistics
+from statistics.members_of_interest import members_of_interest
+from statistics.physical_access_log import TimeGrouping, activity_by_date, activity_by_day_of_week
+from statistics.statistics_daily import (
     lasertime,
     membership_by_date_statistics,
-    membership_number_months2_default,
-    membership_number_months_default,
-    retention_graph,
-    retention_table,
-    shop_statistics,
+    membership_number_months2_statistics,
+    membership_number_months_statistics,
+    retention_graph_statistics,
 )
-from statistics.members_of_interest import members_of_interest
-from statistics.physical_access_log import TimeGrouping, activity_by_date, activity_by_day_of_week
 from typing import Any, Dict, List, Optional, Tuple
 
 from flask import request
 from membership.models import Span
 from service.api_definition import GET, MEMBER_VIEW, PUBLIC
 from service.error import BadRequest
+from service.response_cache import ResponseCache
 
+# The statistics page may be shared publicly, serve cached data while it is recomputed by one worker.
+STATISTICS_CACHE = ResponseCache(ttl=10 * 60, stale_while_revalidate=24 * 60 * 60)
 
-@service.route("/membership/distribution_by_month2", method=GET, permission=PUBLIC)
+
+@service.route("/membership/distribution_by_month2", method=GET, permission=PUBLIC, read_only=True, cacheable=True)
 def membership_number_months_default_route2():
-    return membership_number_months2_default()
+    return membership_number_months2_statistics()
 
 
-@service.route("/membership/distribution_by_month", method=GET, permission=PUBLIC)
+@service.route("/membership/distribution_by_month", method=GET, permission=PUBLIC, read_only=True, cacheable=True)
 def membership_number_months_default_route():
-    return membership_number_months_default()
+    return membership_number_months_statistics()
 
 
-@service.route("/membership/by_date", method=GET, permission=PUBLIC)
+@service.route("/membership/by_date", method=GET, permission=PUBLIC, read_only=True, cacheable=True)
 def membership_by_date_statistics_route():
     return membership_by_date_statistics()
 
 
-@service.route("/lasertime/by_month", method=GET, permission=PUBLIC)
+@service.route("/lasertime/by_month", method=GET, permission=PUBLIC, read_only=True, cacheable=True)
 def lasertime_route() -> List[Tuple[str, int]]:
     return lasertime()
 
 
-@service.route("/shop/statistics", method=GET, permission=PUBLIC)
+@service.route(
+    "/shop/statistics", method=GET, permission=PUBLIC, read_only=True, cacheable=True, response_cache=STATISTICS_CACHE
+)
 def shop_route() -> ShopStatistics:
     return shop_statistics()
 
@@ -51,18 +53,32 @@ def parse_limits() -> Tuple[Optional[datetime], Optional[datetime]]:
     return parse_date("start"), parse_date("end")
 
 
-@service.route("/retention_graph", method=GET, permission=PUBLIC)
-def retention_graph_route() -> RetentionGraph:
-    return retention_graph(date(2020, 1, 1), date(2030, 12, 31))
+@service.route("/retention_graph", method=GET, permission=PUBLIC, read_only=True, cacheable=True)
+def retention_graph_route() -> Dict[str, List[Any]]:
+    return retention_graph_statistics()
 
 
-@service.route("/retention/<spantype>", method=GET, permission=MEMBER_VIEW)
+@service.route(
+    "/retention/<spantype>",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
+)
 def retention_table_route(spantype: Span.ACCESS_TYPE) -> RetentionTable:
     start, end = parse_limits()
     return retention_table(start, end, spantype=spantype)
 
 
-@service.route("/members_of_interest", method=GET, permission=MEMBER_VIEW)
+@service.route(
+    "/members_of_interest",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
+)
 def members_of_interest_route() -> Dict[str, Any]:
     start, end = parse_limits()
     return members_of_interest(start, end).to_dict()
@@ -78,7 +94,14 @@ def parse_date(param: str) -> Optional[datetime]:
         )
 
 
-@service.route("/physical_access_log/activity/by_<grouping_str>", method=GET, permission=MEMBER_VIEW)
+@service.route(
+    "/physical_access_log/activity/by_<grouping_str>",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
+)
 def activity_by_date_route(grouping_str: str) -> Dict[Any, Any]:
     start, end = parse_limits()
     try:
@@ -90,7 +113,12 @@ def activity_by_date_route(grouping_str: str) -> Dict[Any, Any]:
 
 
 @service.route(
-    "/physical_access_log/activity/by_<grouping_str>/member/<int:member_id>", method=GET, permission=MEMBER_VIEW
+    "/physical_access_log/activity/by_<grouping_str>/member/<int:member_id>",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
 )
 def activity_by_date_member_route(grouping_str: str, member_id: int) -> Dict[Any, Any]:
     start, end = parse_limits()
@@ -102,14 +130,26 @@ def activity_by_date_member_route(grouping_str: str, member_id: int) -> Dict[Any
     return activity_by_date(start, end, grouping, member_id=member_id).to_dict()
 
 
-@service.route("/physical_access_log/activity/by_day_of_week", method=GET, permission=MEMBER_VIEW)
+@service.route(
+    "/physical_access_log/activity/by_day_of_week",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
+)
 def activity_by_day_of_week_route() -> Dict[Any, Any]:
     start, end = parse_limits()
     return activity_by_day_of_week(start, end).to_dict()
 
 
 @service.route(
-    "/physical_access_log/activity/by_day_of_week/member/<int:member_id>", method=GET, permission=MEMBER_VIEW
+    "/physical_access_log/activity/by_day_of_week/member/<int:member_id>",
+    method=GET,
+    permission=MEMBER_VIEW,
+    read_only=True,
+    cacheable=True,
+    response_cache=STATISTICS_CACHE,
 )
 def activity_by_day_of_week_member_route(member_id: int) -> Dict[Any, Any]:
     start, end = parse_limits()
@@ -203,6 +203,60 @@ class Test(ApiTest):
             code=200, data=[], page=3, page_size=3, last_page=2, total=4
         )
 
+    def test_cursor_pagination_and_sort(self):
+        firstname = random_str(12)
+        entity1_id = self.api.create_member(firstname=firstname, lastname="d")["member_id"]
+        entity2_id = self.api.create_member(firstname=firstname, lastname="c")["member_id"]
+        entity3_id = self.api.create_member(firstname=firstname, lastname="a")["member_id"]
+        entity4_id = self.api.create_member(firstname=firstname, lastname="b")["member_id"]
+        entity5_id = self.api.create_member(firstname=firstname, lastname="b")["member_id"]
+
+        url = f"/membership/member?search={firstname}&sort_by=lastname&sort_order=asc&page_size=2"
+
+        result = self.get(url + "&cursor=").expect(code=200, page_size=2)
+        self.assertEqual([entity3_id, entity4_id], [e["member_id"] for e in result.data])
+        self.assertIsNone(result.get("total"))
+
+        result = self.get(url + f"&cursor={result.get('next_cursor')}").expect(code=200, page_size=2)
+        self.assertEqual([entity5_id, entity2_id], [e["member_id"] for e in result.data])
+
+        result = self.get(url + f"&cursor={result.get('next_cursor')}").expect(code=200, page_size=2, next_cursor=None)
+        self.assertEqual([entity1_id], [e["member_id"] for e in result.data])
+
+        url = f"/membership/member?search={firstname}&sort_by=lastname&sort_order=desc&page_size=3"
+
+        result = self.get(url + "&cursor=").expect(code=200)
+        self.assertEqual([entity1_id, entity2_id, entity5_id], [e["member_id"] for e in result.data])
+
+        next_cursor = result.get("next_cursor")
+        result = self.get(url + f"&cursor={next_cursor}").expect(code=200, next_cursor=None)
+        self.assertEqual([entity4_id, entity3_id], [e["member_id"] for e in result.data])
+
+        self.get(f"/membership/member?sort_by=firstname&cursor={next_cursor}").expect(code=422, fields="cursor")
+        self.get(f"/membership/member?cursor=not-a-cursor").expect(code=422, fields="cursor")
+
+    def test_fields_limits_columns_in_list_and_read(self):
+        entity = self.api.create_group()
+        entity_id = entity["group_id"]
+
+        (result,) = self.get(f"/membership/group?search={entity['title']}&fields=group_id,title").expect(code=200).data
+        self.assertEqual(dict(group_id=entity_id, title=entity["title"]), result)
+
+        self.get(f"/membership/group/{entity_id}?fields=name").expect(code=200, data=dict(name=entity["name"]))
+
+        self.get(f"/membership/group?fields=group_id,not_a_column").expect(code=422, fields="fields")
+
+    def test_deferred_columns_are_only_listed_when_requested(self):
+        name = random_str()
+        image_id = self.post("/webshop/product_image", dict(name=name, type="image/png")).get("data__id")
+
+        (result,) = self.get(f"/webshop/product_image?search={name}").expect(code=200).data
+        self.assertEqual(image_id, result["id"])
+        self.assertNotIn("data", result)
+
+        (result,) = self.get(f"/webshop/product_image?search={name}&fields=id,data").expect(code=200).data
+        self.assertEqual(dict(id=image_id, data=None), result)
+
     def test_expand_includes_data_in_list(self):
         member = self.db.create_member()
         span = self.db.create_span()
@@ -214,3 +268,70 @@ class Test(ApiTest):
         self.assertEqual(member.member_number, entity["member_number"])
         self.assertEqual(member.firstname, entity["firstname"])
         self.assertEqual(member.lastname, entity["lastname"])
+
+    def test_bulk_create_update_and_delete(self):
+        member_id = self.api.create_member()["member_id"]
+        span = dict(
+            member_id=member_id,
+            type="labaccess",
+            startdate=self.date(0).isoformat(),
+            enddate=self.date(10).isoformat(),
+            creation_reason=random_str(),
+        )
+
+        created = self.post("/membership/span/bulk", dict(items=[span, span])).expect(code=201, status="created").data
+        self.assertEqual([span["enddate"]] * 2, [e["enddate"] for e in created])
+        span1_id, span2_id = (e["span_id"] for e in created)
+
+        updated = (
+            self.put(
+                "/membership/span/bulk",
+                dict(
+                    items=[
+                        dict(span_id=span1_id, enddate=self.date(20).isoformat()),
+                        dict(span_id=span2_id, type="membership"),
+                    ]
+                ),
+            )
+            .expect(code=200, status="updated")
+            .data
+        )
+        self.assertEqual([span1_id, span2_id], [e["span_id"] for e in updated])
+        self.assertEqual([self.date(20).isoformat(), span["enddate"]], [e["enddate"] for e in updated])
+        self.assertEqual(["labaccess", "membership"], [e["type"] for e in updated])
+
+        self.delete("/membership/span/bulk", dict(ids=[span1_id, span2_id])).expect(code=200, status="deleted")
+        self.assertIsNotNone(self.get(f"/membership/span/{span1_id}").data["deleted_at"])
+        self.assertIsNotNone(self.get(f"/membership/span/{span2_id}").data["deleted_at"])
+
+    def test_bulk_returns_errors_per_item_and_saves_nothing(self):
+        member_id = self.db.create_member().member_id
+        span_id = self.db.create_span(enddate=self.date(10)).span_id
+
+        errors = (
+            self.put(
+                "/membership/span/bulk",
+                dict(
+                    items=[
+                        dict(span_id=span_id, enddate=self.date(20).isoformat()),
+                        dict(span_id=span_id, enddate="not-a-date"),
+                        dict(enddate=self.date(20).isoformat()),
+                    ]
+                ),
+            )
+            .expect(code=422, status="error")
+            .get("errors")
+        )
+        self.assertEqual([(1, "enddate"), (2, "span_id")], [(e["index"], e["fields"]) for e in errors])
+        self.get(f"/membership/span/{span_id}").expect(code=200, data__enddate=self.date(10).isoformat())
+
+        errors = (
+            self.post("/membership/span/bulk", dict(items=[dict(member_id=member_id), dict()]))
+            .expect(code=422, status="error")
+            .get("errors")
+        )
+        self.assertEqual([1], [e["index"] for e in errors])
+
+        errors = self.delete("/membership/span/bulk", dict(ids=[span_id, 0])).expect(code=422).get("errors")
+        self.assertEqual([dict(index=1, code=404)], [dict(index=e["index"], code=e["code"]) for e in errors])
+        self.get(f"/membership/span/{span_id}").expect(code=200, data__deleted_at=None)
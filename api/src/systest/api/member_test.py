@@ -1,3 +1,7 @@
+import csv
+import json
+from io import StringIO
+
 from test_aid.systest_base import ApiTest
 from test_aid.test_util import random_str
 
@@ -45,3 +49,22 @@ class Test(ApiTest):
         self.post("/oauth/token", {"grant_type": "password", "username": member.email, "password": pwd}).expect(
             code=200
         )
+
+    def test_all_with_membership_export_formats(self):
+        member_id = self.api.create_member()["member_id"]
+
+        data = self.get("/membership/member/all_with_membership").expect(code=200, status="ok").data
+        (member,) = (m for m in data if m["member_id"] == member_id)
+        self.assertFalse(member["membership"]["membership_active"])
+
+        lines = self.get("/membership/member/all_with_membership", params=dict(format="ndjson")).is_ok()
+        members = [json.loads(line) for line in lines.response.text.splitlines()]
+        self.assertIn(member, members)
+
+        response = self.get("/membership/member/all_with_membership", params=dict(format="csv")).is_ok().response
+        rows = list(csv.DictReader(StringIO(response.text)))
+        (row,) = (r for r in rows if r["member_id"] == str(member_id))
+        self.assertEqual(member["email"], row["email"])
+        self.assertEqual("False", row["membership_active"])
+
+        self.get("/membership/member/all_with_membership", params=dict(format="xml")).expect(code=422)
@@ -47,3 +47,22 @@ class Test(ApiTest):
         self.post(
             f"/membership/group/{related_entity_id}/members/remove", {"members": [randint(int(1e8), int(9e8))]}
         ).expect(code=200)
+
+    def test_adding_and_removing_many_with_duplicates_and_existing_entities(self):
+        related_entity_id = self.api.create_group()["group_id"]
+        entity_ids = [self.api.create_member()["member_id"] for _ in range(3)]
+
+        self.post(f"/membership/group/{related_entity_id}/members/add", {"members": entity_ids[:1]}).expect(code=200)
+        self.post(
+            f"/membership/group/{related_entity_id}/members/add", {"members": entity_ids + entity_ids[1:]}
+        ).expect(code=200)
+
+        data = self.get(f"/membership/group/{related_entity_id}/members").expect(code=200, total=3).get("data")
+        self.assertCountEqual(entity_ids, [m["member_id"] for m in data])
+
+        self.post(
+            f"/membership/group/{related_entity_id}/members/remove", {"members": entity_ids[1:] + entity_ids[1:]}
+        ).expect(code=200)
+
+        data = self.get(f"/membership/group/{related_entity_id}/members").expect(code=200, total=1).get("data")
+        self.assertEqual(entity_ids[:1], [m["member_id"] for m in data])
@@ -6,6 +6,7 @@ from typing import Optional, cast, get_args
 
 from flask import request
 from membership.models import Member
+from redis_cache import redis_connection
 from serde import from_dict, serde
 from serde.json import from_json, to_json
 from service.api_definition import GET, MEMBER_VIEW, POST, PUBLIC
@@ -51,9 +52,7 @@ from tasks.models import MemberPreference, MemberPreferenceQuestionType, TaskDel
 
 logger = getLogger("task-delegator")
 
-# Event deduplication cache: stores processed event_ids with their timestamp
-# Format: {event_id: timestamp}
-_processed_events: dict[str, datetime] = {}
+# Event deduplication: processed event_ids are stored in redis, shared by all workers and threads.
 _PROCESSED_EVENTS_TTL = timedelta(hours=1)  # Keep event IDs for 1 hour
 
 
@@ -134,7 +133,7 @@ def get_member_task_info(member_id: int) -> dict:
     }
 
 
-@service.route("/statistics", method=GET, permission=MEMBER_VIEW)
+@service.route("/statistics", method=GET, permission=MEMBER_VIEW, read_only=True)
 def get_global_task_statistics() -> dict:
     """Get global task delegation statistics.
 
@@ -286,7 +285,7 @@ def get_global_task_statistics() -> dict:
     }
 
 
-@service.route("/statistics/member_preferences", method=GET, permission=MEMBER_VIEW)
+@service.route("/statistics/member_preferences", method=GET, permission=MEMBER_VIEW, read_only=True)
 def get_member_preference_statistics() -> dict:
     """Get statistics about member preferences/survey responses."""
     from sqlalchemy import distinct, func
@@ -371,21 +370,13 @@ def slack_events() -> dict:
     if data.get("type") == "event_callback":
         # Check for duplicate events using event_id
         event_id = data.get("event_id")
-        now = datetime.now()
 
         if event_id:
-            # Clean up old event IDs (older than TTL)
-            global _processed_events
-            _processed_events = {eid: ts for eid, ts in _processed_events.items() if now - ts < _PROCESSED_EVENTS_TTL}
-
-            # Check if we've already processed this event
-            if event_id in _processed_events:
+            # Mark this event as processed, atomically so that a retry handled concurrently is ignored
+            if not redis_connection.set(f"slack_event:{event_id}", 1, nx=True, ex=_PROCESSED_EVENTS_TTL):
                 logger.info(f"Ignoring duplicate event {event_id}")
                 return {"ok": True}
 
-            # Mark this event as processed
-            _processed_events[event_id] = now
-
         event = data.get("event", {})
         event_type = event.get("type")
 
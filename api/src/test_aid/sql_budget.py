@@ -0,0 +1,111 @@
+import os
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ContextDecorator
+from dataclasses import dataclass
+from threading import get_ident
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Identical statement templates executed more than this many times in a budget is reported as a possible N+1.
+DEFAULT_MAX_REPEATS = 3
+
+# Number of application frames shown for each call site.
+STACK_DEPTH = 6
+
+PARAMETER_LIST_RE = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s)\s*,)+\s*(?:\?|%s|%\(\w+\)s)\s*\)")
+
+
+def statement_template(statement: str) -> str:
+    """Normalize statement so that statements that only differ in the length of parameter lists are considered equal."""
+    return PARAMETER_LIST_RE.sub("(...)", " ".join(statement.split()))
+
+
+def application_stack() -> List[traceback.FrameSummary]:
+    """Stack frames in makeradmin code (not in libraries or this module), innermost last."""
+    return [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(SRC_DIR)
+        and "site-packages" not in frame.filename
+        and frame.filename != os.path.abspath(__file__)
+    ][-STACK_DEPTH:]
+
+
+@dataclass
+class Statement:
+    template: str
+    stack: List[traceback.FrameSummary]
+
+
+class sql_budget(ContextDecorator):
+    """
+    Context manager or decorator that fails the test if the code inside executes more sql statements than the
+    budget, or executes the same statement template more than max_repeats times (a typical N+1 pattern like calling
+    db_session.get in a loop). Only statements executed in the current thread are counted. The assertion error lists
+    the statements together with the call sites that executed them.
+
+        with sql_budget(max_queries=5):
+            list_members()
+
+    :param max_queries max number of statements, None for no limit
+    :param max_repeats max number of executions of the same statement template, None for no limit
+    """
+
+    def __init__(self, max_queries: Optional[int] = None, max_repeats: Optional[int] = DEFAULT_MAX_REPEATS) -> None:
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.statements: List[Statement] = []
+        self._thread = None
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if get_ident() == self._thread:
+            self.statements.append(Statement(statement_template(statement), application_stack()))
+
+    def __enter__(self) -> "sql_budget":
+        self.statements = []
+        self._thread = get_ident()
+        event.listen(Engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        event.remove(Engine, "before_cursor_execute", self._record)
+        if exc_type is None:
+            self.check()
+
+    @staticmethod
+    def format_call_sites(statements: List[Statement]) -> str:
+        stacks = {tuple((f.filename, f.lineno) for f in s.stack): s.stack for s in statements}
+        return "\n".join(
+            "    call site:\n" + "".join("      " + line for line in traceback.format_list(stack))
+            for stack in stacks.values()
+        )
+
+    def check(self) -> None:
+        problems = []
+
+        if self.max_queries is not None and len(self.statements) > self.max_queries:
+            problems.append(
+                f"{len(self.statements)} sql statements executed, budget is {self.max_queries}:\n"
+                + "\n".join(f"  {i + 1}. {s.template}" for i, s in enumerate(self.statements))
+            )
+
+        if self.max_repeats is not None:
+            by_template = defaultdict(list)
+            for statement in self.statements:
+                by_template[statement.template].append(statement)
+
+            for template, statements in by_template.items():
+                if len(statements) > self.max_repeats:
+                    problems.append(
+                        f"possible N+1, statement executed {len(statements)} times (max {self.max_repeats}):\n"
+                        f"  {template}\n" + self.format_call_sites(statements)
+                    )
+
+        if problems:
+            raise AssertionError("\n\n".join(problems))